@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict
 import logging
+from analytics.pricing import chain_to_arrays, implied_vol, year_fractions, forward_from_spot
 
 logger = logging.getLogger("VolGuardMetrics")
 
@@ -35,7 +36,8 @@ class ChainMetricsCalculator:
                 "pcr": round(pcr, 2),
                 "call_oi": ce_oi,
                 "put_oi": pe_oi,
-                "avg_iv": self._calculate_average_iv(df)
+                "avg_iv": self._calculate_average_iv(df),
+                **self._cross_check_iv(chain_data)
             }
 
         except Exception as e:
@@ -78,6 +80,26 @@ class ChainMetricsCalculator:
             return val * 100
         return val
 
+    def _cross_check_iv(self, chain_data: List[Dict]) -> Dict[str, float]:
+        # Our own IVs from LTPs (one vectorized solve) vs broker option_greeks.iv
+        try:
+            chain = chain_to_arrays(chain_data)
+            if not len(chain):
+                return {"model_iv": 0.0, "iv_divergence": 0.0}
+            t = year_fractions(chain.expiry)
+            model = implied_vol(chain.ltp, forward_from_spot(chain.spot, t), chain.strike, t, chain.is_call)
+            both = np.isfinite(model) & (chain.iv > 0) & (chain.ltp > 0)
+            if not both.any():
+                return {"model_iv": 0.0, "iv_divergence": 0.0}
+            # Median keeps one stale wing quote from dominating the comparison
+            return {
+                "model_iv": round(float(np.median(model[both])) * 100, 2),
+                "iv_divergence": round(float(np.median(np.abs(model[both] - chain.iv[both]))) * 100, 2)
+            }
+        except Exception as e:
+            logger.warning(f"IV cross-check failed: {e}")
+            return {"model_iv": 0.0, "iv_divergence": 0.0}
+
     def _calculate_max_pain(self, df: pd.DataFrame) -> float:
         # Optimized Max Pain Calculation
         pain_data = []
@@ -114,5 +136,7 @@ class ChainMetricsCalculator:
             "pcr": 1.0,
             "call_oi": 0,
             "put_oi": 0,
-            "avg_iv": 15.0
+            "avg_iv": 15.0,
+            "model_iv": 0.0,
+            "iv_divergence": 0.0
         }
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Greek Confidence Scorer
+- Keeps a rolling confidence_score per instrument in flat NumPy columns (slot per key).
+- Chain refresh: broker IV/Delta vs model IV/Delta for the whole chain in one pass.
+- Live ticks: only the instruments that ticked are re-solved (IV from LTP, at the
+  live spot of their own underlying) and re-scored.
+- Broker and model deltas are always compared at the chain snapshot's spot and
+  time: the broker quoted its delta there, so a spot move since the fetch is
+  not mistaken for model divergence.
+- score = 1 - 0.4 * divergence / GREEK_TOLERANCE_PCT, so a divergence above the
+  tolerance lands below the 0.6 gate in MasterSafetyLayer.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from analytics.pricing import (
+    MIN_TIME_FLOOR,
+    SECONDS_PER_YEAR,
+    ChainArrays,
+    black76,
+    expiry_timestamps,
+    forward_from_spot,
+    implied_vol,
+    year_fractions,
+)
+from core.config import settings
+
+logger = logging.getLogger("GreekConfidence")
+
+DELTA_FLOOR = 0.05   # wings: compare delta in absolute terms below this
+MIN_SCORE = 0.01
+
+
+class GreekConfidenceScorer:
+    """
+    Array-backed store of broker-vs-model divergence. `score(key)` is a dict
+    lookup plus an array read; unknown instruments return 0.0 ("no opinion"),
+    which the safety gate treats as not scored.
+    """
+    def __init__(self, tolerance_pct: Optional[float] = None, smoothing: float = 0.3,
+                 rate: Optional[float] = None, capacity: int = 1024):
+        self.tolerance_pct = settings.GREEK_TOLERANCE_PCT if tolerance_pct is None else tolerance_pct
+        self.smoothing = smoothing
+        self.rate = settings.RISK_FREE_RATE if rate is None else rate
+        self._underlyings: Dict[str, int] = {settings.MARKET_KEY_INDEX: 0}
+        self._spots = np.full(4, np.nan)  # latest tick per underlying; overrides chain spot when set
+        self._slots: Dict[str, int] = {}
+        self._size = 0
+        self._alloc(capacity)
+
+    # --- Storage ---
+    def _alloc(self, capacity: int):
+        def grow(name: str, fill: float, dtype=np.float64):
+            old = getattr(self, name, None)
+            arr = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                arr[:len(old)] = old
+            setattr(self, name, arr)
+        for name in ("strike", "expiry_ts", "spot_ref", "snap_ts", "broker_iv", "broker_delta", "updated_at"):
+            grow(name, np.nan)
+        grow("is_call", False, bool)
+        grow("underlying", 0, np.int64)
+        grow("divergence", np.nan)
+        grow("scores", 0.0)
+        self._capacity = capacity
+
+    def _slots_for(self, keys: Sequence[str]) -> np.ndarray:
+        slots = self._slots
+        idx = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            s = slots.get(key)
+            if s is None:
+                if self._size == self._capacity:
+                    self._alloc(self._capacity * 2)
+                s = slots[key] = self._size
+                self._size += 1
+            idx[i] = s
+        return idx
+
+    def _underlying_id(self, underlying_key: Optional[str]) -> int:
+        key = underlying_key or settings.MARKET_KEY_INDEX
+        uid = self._underlyings.get(key)
+        if uid is None:
+            uid = self._underlyings[key] = len(self._underlyings)
+            if uid == len(self._spots):
+                self._spots = np.concatenate([self._spots, np.full(uid, np.nan)])
+        return uid
+
+    @property
+    def underlyings(self) -> Dict[str, int]:
+        """Underlying keys whose ticks move spot (see on_underlying)."""
+        return self._underlyings
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- Readers ---
+    def score(self, key: str) -> float:
+        s = self._slots.get(key)
+        return 0.0 if s is None else float(self.scores[s])
+
+    def divergence_pct(self, key: str) -> float:
+        s = self._slots.get(key)
+        return np.nan if s is None else float(self.divergence[s])
+
+    def low_confidence(self, threshold: float = 0.6) -> List[str]:
+        keys = np.array(list(self._slots), dtype=object)
+        live = self.scores[:self._size]
+        return keys[(live > 0) & (live < threshold)].tolist()
+
+    # --- Writers ---
+    def load_chain(self, chain: ChainArrays, model_iv: Optional[np.ndarray] = None,
+                   now: Optional[datetime] = None, underlying_key: Optional[str] = None) -> int:
+        """
+        Registers (or refreshes) every contract of a chain snapshot and scores it.
+        `model_iv` is our view of the smile (SABR); defaults to IV solved from LTP.
+        `now` is the snapshot time (when the chain was fetched).
+        """
+        if not len(chain):
+            return 0
+        idx = self._slots_for(chain.keys)
+        self.strike[idx] = chain.strike
+        self.is_call[idx] = chain.is_call
+        self.underlying[idx] = self._underlying_id(underlying_key)
+        self.expiry_ts[idx] = expiry_timestamps(chain.expiry)
+        self.spot_ref[idx] = chain.spot
+        self.snap_ts[idx] = (now or datetime.now(settings.IST)).timestamp()
+        self.broker_iv[idx] = chain.iv
+        self.broker_delta[idx] = chain.delta
+
+        t = year_fractions(chain.expiry, now)
+        fwd = forward_from_spot(chain.spot, t, self.rate)
+        if model_iv is None:
+            model_iv = implied_vol(chain.ltp, fwd, chain.strike, t, chain.is_call, self.rate)
+        return self._score(idx, fwd, t, np.asarray(model_iv, dtype=np.float64), now)
+
+    def on_underlying(self, spot: float, underlying_key: Optional[str] = None):
+        self._spots[self._underlying_id(underlying_key)] = float(spot)
+
+    def on_ticks(self, keys: Sequence[str], ltps: Sequence[float], now: Optional[datetime] = None) -> int:
+        """Re-scores only the instruments that ticked; unknown keys are ignored."""
+        slots = self._slots
+        pairs = [(slots[k], p) for k, p in zip(keys, ltps) if k in slots and p]
+        if not pairs:
+            return 0
+        idx = np.fromiter((s for s, _ in pairs), dtype=np.int64, count=len(pairs))
+        ltp = np.fromiter((p for _, p in pairs), dtype=np.float64, count=len(pairs))
+        now_ts = (now or datetime.now(settings.IST)).timestamp()
+        expiry_ts = self.expiry_ts[idx]
+        # IV from the live LTP needs the live spot of this contract's own underlying
+        t = np.maximum((expiry_ts - now_ts) / SECONDS_PER_YEAR, MIN_TIME_FLOOR)
+        live = self._spots[self.underlying[idx]]
+        spot = np.where(np.isnan(live), self.spot_ref[idx], live)
+        model_iv = implied_vol(ltp, forward_from_spot(spot, t, self.rate), self.strike[idx], t,
+                               self.is_call[idx], self.rate)
+        # ...but deltas are compared where the broker computed its own: snapshot spot and time
+        t_ref = np.maximum((expiry_ts - self.snap_ts[idx]) / SECONDS_PER_YEAR, MIN_TIME_FLOOR)
+        fwd_ref = forward_from_spot(self.spot_ref[idx], t_ref, self.rate)
+        return self._score(idx, fwd_ref, t_ref, model_iv, now)
+
+    def _score(self, idx: np.ndarray, fwd: np.ndarray, t: np.ndarray,
+               model_iv: np.ndarray, now: Optional[datetime]) -> int:
+        b_iv = self.broker_iv[idx]
+        b_delta = self.broker_delta[idx]
+        usable = np.isfinite(model_iv) & (model_iv > 0) & (b_iv > 0)
+        if not usable.any():
+            return 0
+        idx, fwd, t, model_iv = idx[usable], fwd[usable], t[usable], model_iv[usable]
+        b_iv, b_delta = b_iv[usable], b_delta[usable]
+
+        m_delta = black76(fwd, self.strike[idx], t, model_iv, self.is_call[idx], self.rate).delta
+        iv_div = np.abs(model_iv - b_iv) / b_iv
+        delta_div = np.abs(m_delta - b_delta) / np.maximum(np.abs(b_delta), DELTA_FLOOR)
+        div = 100.0 * np.maximum(iv_div, delta_div)
+
+        prev = self.divergence[idx]
+        rolled = np.where(np.isnan(prev), div, prev + self.smoothing * (div - prev))
+        self.divergence[idx] = rolled
+        self.scores[idx] = np.clip(1.0 - 0.4 * rolled / self.tolerance_pct, MIN_SCORE, 1.0)
+        self.updated_at[idx] = (now.timestamp() if now else time.time())
+        return int(len(idx))
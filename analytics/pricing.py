@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Vectorized Black-76 Pricing Engine
+- Prices + Greeks for the whole option chain in ONE NumPy pass (no per-contract loops).
+- Greeks are quoted against spot (S = F * e^-rT) so they line up with broker option_greeks.
+- Theta per calendar day, Vega per 1 vol point (Upstox convention).
+- MIN_TIME_FLOOR (5 minutes) prevents 0DTE Gamma/Theta division-by-zero explosions.
+"""
+from __future__ import annotations
+
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional
+
+import numpy as np
+from scipy.special import ndtr
+
+from core.config import settings
+
+logger = logging.getLogger("PricingEngine")
+
+SECONDS_PER_YEAR = 365.0 * 24 * 60 * 60
+MIN_TIME_FLOOR = 5.0 * 60 / SECONDS_PER_YEAR
+IST_OFFSET_SEC = 5 * 3600 + 30 * 60
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+class ChainGreeks(NamedTuple):
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+
+
+# ------------------------------------------------------
+# Core maths
+# ------------------------------------------------------
+def black76(
+    forward: Any, strike: Any, t: Any, sigma: Any, is_call: Any, rate: Optional[float] = None
+) -> ChainGreeks:
+    """
+    Black-76 price and spot Greeks. Every argument is broadcast, so a single
+    call covers strikes x types x expiries (or a full scenario grid).
+    """
+    r = settings.RISK_FREE_RATE if rate is None else rate
+    F = np.asarray(forward, dtype=np.float64)
+    K = np.asarray(strike, dtype=np.float64)
+    t = np.maximum(np.asarray(t, dtype=np.float64), MIN_TIME_FLOOR)
+    sigma = np.maximum(np.asarray(sigma, dtype=np.float64), 1e-6)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    sqrt_t = np.sqrt(t)
+    sig_sqrt_t = sigma * sqrt_t
+    d1 = (np.log(F / K) + 0.5 * sigma * sigma * t) / sig_sqrt_t
+    d2 = d1 - sig_sqrt_t
+    df = np.exp(-r * t)
+    spot = F * df
+    pdf_d1 = _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+    nd1 = ndtr(d1)
+    nd2 = ndtr(d2)
+
+    call = df * (F * nd1 - K * nd2)
+    price = np.where(is_call, call, call - df * (F - K))  # put via parity
+    delta = np.where(is_call, nd1, nd1 - 1.0)
+    gamma = pdf_d1 / (spot * sig_sqrt_t)
+    vega = spot * pdf_d1 * sqrt_t / 100.0
+    decay = -spot * pdf_d1 * sigma / (2.0 * sqrt_t)
+    carry = r * K * df
+    theta = np.where(is_call, decay - carry * nd2, decay + carry * (1.0 - nd2)) / 365.0
+    return ChainGreeks(price, delta, gamma, theta, vega)
+
+
+def black76_price(
+    forward: Any, strike: Any, t: Any, sigma: Any, is_call: Any, rate: Optional[float] = None
+) -> np.ndarray:
+    """Price only (no Greeks): the hot path for scenario grids and replays."""
+    r = settings.RISK_FREE_RATE if rate is None else rate
+    F = np.asarray(forward, dtype=np.float64)
+    K = np.asarray(strike, dtype=np.float64)
+    t = np.maximum(np.asarray(t, dtype=np.float64), MIN_TIME_FLOOR)
+    sig_sqrt_t = np.maximum(np.asarray(sigma, dtype=np.float64), 1e-6) * np.sqrt(t)
+    d1 = np.log(F / K) / sig_sqrt_t + 0.5 * sig_sqrt_t
+    df = np.exp(-r * t)
+    call = df * (F * ndtr(d1) - K * ndtr(d1 - sig_sqrt_t))
+    return np.where(is_call, call, call - df * (F - K))
+
+
+def implied_vol(
+    price: Any, forward: Any, strike: Any, t: Any, is_call: Any,
+    rate: Optional[float] = None, tol: float = 1e-6, max_iter: int = 16
+) -> np.ndarray:
+    """
+    Batch Black-76 implied vol. Corrado-Miller rational guess, then bracketed
+    Newton steps on log-price over the whole array (bisection where a step leaves
+    the bracket). Prices outside the no-arbitrage bounds come back as NaN.
+    """
+    r = settings.RISK_FREE_RATE if rate is None else rate
+    F, K, t, price, is_call = np.broadcast_arrays(
+        np.asarray(forward, dtype=np.float64), np.asarray(strike, dtype=np.float64),
+        np.maximum(np.asarray(t, dtype=np.float64), MIN_TIME_FLOOR),
+        np.asarray(price, dtype=np.float64), np.asarray(is_call, dtype=bool),
+    )
+    shape = F.shape
+    F, K, t, price, is_call = (np.ravel(a) for a in (F, K, t, price, is_call))
+    # Undiscounted call price (puts via parity); solve on the OTM side for precision
+    target = price * np.exp(r * t) + np.where(is_call, 0.0, F - K)
+    intrinsic = np.maximum(F - K, 0.0)
+    time_value = target - intrinsic
+    # Time value below ~1e-8 of the forward carries no vol information (deep ITM / dead wings)
+    ok = (time_value > 1e-8 * F) & (target < F) & (K > 0) & (F > 0)
+    otm_call = K >= F
+
+    sqrt_t = np.sqrt(t)
+    half_gap = target - 0.5 * (F - K)
+    radicand = np.maximum(half_gap * half_gap - (F - K) ** 2 / np.pi, 0.0)
+    sigma = np.sqrt(2.0 * np.pi) / (F + K) * (half_gap + np.sqrt(radicand)) / sqrt_t
+    # Wings: start no higher than the price inflection point (Manaster-Koehler)
+    inflection = np.sqrt(2.0 * np.abs(np.log(F / K)) / t)
+    sigma = np.where(inflection > 0, np.minimum(sigma, np.maximum(inflection, 0.01)), sigma)
+    sigma = np.clip(np.nan_to_num(sigma, nan=0.2), 0.01, 4.0)
+    lo = np.full_like(sigma, 1e-4)
+    hi = np.full_like(sigma, 5.0)
+    log_fk = np.log(np.where(ok, F / K, 1.0))
+
+    active = ok.copy()
+    for _ in range(max_iter):
+        s = sigma[active]
+        st = s * sqrt_t[active]
+        d1 = (log_fk[active] + 0.5 * st * st) / st
+        d2 = d1 - st
+        f_a, k_a, tv = F[active], K[active], time_value[active]
+        model = np.where(otm_call[active],
+                         f_a * ndtr(d1) - k_a * ndtr(d2),
+                         k_a * ndtr(-d2) - f_a * ndtr(-d1))
+        diff = model - tv
+        vega = f_a * _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1) * sqrt_t[active]
+        done = (np.abs(diff) < tol * np.maximum(tv, 1.0)) | (hi[active] - lo[active] < tol)
+
+        lo_a = np.where(diff > 0, lo[active], s)
+        hi_a = np.where(diff > 0, s, hi[active])
+        # Newton on log-price (concave in sigma): from below it converges monotonically,
+        # from above the step lands below the root, so never shrink sigma by more than half
+        log_ratio = np.log(np.maximum(model, 1e-300) / tv)
+        nxt = np.maximum(s - log_ratio * model / np.maximum(vega, 1e-12), 0.5 * s)
+        nxt = np.where((nxt > lo_a) & (nxt < hi_a), nxt, 0.5 * (lo_a + hi_a))
+
+        sigma[active] = np.where(done, s, nxt)
+        lo[active], hi[active] = lo_a, hi_a
+        idx = np.flatnonzero(active)
+        active[idx[done]] = False
+        if not active.any():
+            break
+    return np.where(ok, sigma, np.nan).reshape(shape)
+
+
+def forward_from_spot(spot: Any, t: Any, rate: Optional[float] = None) -> np.ndarray:
+    r = settings.RISK_FREE_RATE if rate is None else rate
+    return np.asarray(spot, dtype=np.float64) * np.exp(r * np.asarray(t, dtype=np.float64))
+
+
+def year_fractions(expiries: Any, now: Optional[datetime] = None) -> np.ndarray:
+    """
+    Vectorized time-to-expiry in years. Options expire at MARKET_CLOSE_TIME IST
+    on the expiry date; result is floored at MIN_TIME_FLOOR.
+    """
+    now_ts = (now or datetime.now(settings.IST)).timestamp()
+    return np.maximum((expiry_timestamps(expiries) - now_ts) / SECONDS_PER_YEAR, MIN_TIME_FLOOR)
+
+
+def expiry_timestamps(expiries: Any) -> np.ndarray:
+    """Unix time of MARKET_CLOSE_TIME IST on each expiry date."""
+    exp_days = np.asarray(expiries, dtype="datetime64[D]").astype(np.int64)
+    close = settings.MARKET_CLOSE_TIME
+    close_sec = close.hour * 3600 + close.minute * 60 - IST_OFFSET_SEC
+    return exp_days * 86400.0 + close_sec
+
+
+def normalize_iv(iv: Any) -> np.ndarray:
+    """Broker IVs arrive in percent (13.5); model inputs are decimals (0.135)."""
+    iv = np.asarray(iv, dtype=np.float64)
+    return np.where(iv > 2.0, iv / 100.0, iv)
+
+
+# ------------------------------------------------------
+# Chain flattening
+# ------------------------------------------------------
+@dataclass
+class ChainArrays:
+    """Column view of an Upstox option chain: one row per contract (CE + PE)."""
+    keys: List[str]
+    strike: np.ndarray
+    is_call: np.ndarray
+    expiry: np.ndarray
+    spot: np.ndarray
+    ltp: np.ndarray
+    oi: np.ndarray
+    iv: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def chain_to_arrays(chain_data: List[Dict], expiry: Optional[str] = None) -> ChainArrays:
+    """
+    Flattens the `get_option_chain` payload into arrays. Expiry comes from the
+    row itself when present (multi-expiry chains), else from `expiry`.
+    """
+    keys: List[str] = []
+    cols: Dict[str, List[float]] = {c: [] for c in (
+        "strike", "is_call", "spot", "ltp", "oi", "iv", "delta", "gamma", "theta", "vega"
+    )}
+    exps: List[str] = []
+    for item in chain_data:
+        strike = item.get("strike_price", 0)
+        spot = item.get("underlying_spot_price", 0.0)
+        row_expiry = item.get("expiry", expiry)
+        for side, flag in (("call_options", True), ("put_options", False)):
+            opt = item.get(side) or {}
+            key = opt.get("instrument_key")
+            if not key:
+                continue
+            md = opt.get("market_data") or {}
+            gk = opt.get("option_greeks") or {}
+            keys.append(key)
+            exps.append(row_expiry)
+            cols["strike"].append(strike)
+            cols["is_call"].append(flag)
+            cols["spot"].append(spot)
+            cols["ltp"].append(md.get("ltp") or 0.0)
+            cols["oi"].append(md.get("oi") or 0.0)
+            cols["iv"].append(gk.get("iv") or 0.0)
+            cols["delta"].append(gk.get("delta") or 0.0)
+            cols["gamma"].append(gk.get("gamma") or 0.0)
+            cols["theta"].append(gk.get("theta") or 0.0)
+            cols["vega"].append(gk.get("vega") or 0.0)
+
+    arr = {c: np.asarray(v, dtype=np.float64) for c, v in cols.items()}
+    return ChainArrays(
+        keys=keys,
+        strike=arr["strike"],
+        is_call=arr["is_call"].astype(bool),
+        expiry=np.asarray(exps, dtype="datetime64[D]"),
+        spot=arr["spot"],
+        ltp=arr["ltp"],
+        oi=arr["oi"],
+        iv=normalize_iv(arr["iv"]),
+        delta=arr["delta"],
+        gamma=arr["gamma"],
+        theta=arr["theta"],
+        vega=arr["vega"],
+    )
+
+
+# ------------------------------------------------------
+# Cache publishing
+# ------------------------------------------------------
+class GreeksRow(Mapping):
+    """
+    Read-through view of one contract inside a ChainGreeksTable. Behaves like the
+    old per-key dict ({"delta": .., "iv": ..}); keys not backed by a column
+    (e.g. confidence_score) live in a small side dict.
+    """
+    __slots__ = ("_table", "_idx", "_extra")
+
+    def __init__(self, table: "ChainGreeksTable", idx: int):
+        self._table = table
+        self._idx = idx
+        self._extra: Dict[str, Any] = {}
+
+    def __getitem__(self, field: str) -> Any:
+        col = self._table.columns.get(field)
+        if col is not None:
+            return float(col[self._idx])
+        return self._extra[field]
+
+    def __setitem__(self, field: str, value: Any) -> None:
+        self._extra[field] = value
+
+    def __iter__(self):
+        yield from self._table.columns
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self._table.columns) + len(self._extra)
+
+    def __repr__(self) -> str:
+        return f"GreeksRow({dict(self)})"
+
+
+class ChainGreeksTable:
+    """Columnar Greeks for one chain slice; refreshing swaps the column dict atomically."""
+    FIELDS = ("price", "delta", "gamma", "theta", "vega", "iv")
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.columns: Dict[str, np.ndarray] = {}
+        self.rows = [GreeksRow(self, i) for i in range(len(keys))]
+
+    def publish(self, g: ChainGreeks, iv: np.ndarray, valid: np.ndarray, ts: float) -> None:
+        values = (*g, iv)
+        if not valid.all():
+            values = tuple(np.where(valid, v, np.nan) for v in values)
+        cols = dict(zip(self.FIELDS, values))
+        cols["timestamp"] = np.broadcast_to(np.float64(ts), (len(self.keys),))
+        self.columns = cols
+
+
+class GreeksEngine:
+    """
+    Fills the shared `greeks_cache` ({instrument_key: {...}}) from chain snapshots.
+    Each chain slice (one expiry of one underlying; LiveDataFeed uses
+    (underlying_key, expiry) ids) is backed by a ChainGreeksTable; as long as the
+    contract list is unchanged a refresh is a single column swap, not a per-key
+    dict rewrite. Contracts without a usable IV read back as NaN.
+    """
+    def __init__(self, greeks_cache: Dict[str, Any], rate: Optional[float] = None):
+        self.greeks_cache = greeks_cache
+        self.rate = settings.RISK_FREE_RATE if rate is None else rate
+        self._tables: Dict[Hashable, ChainGreeksTable] = {}
+
+    def compute(self, chain: ChainArrays, sigma: Optional[np.ndarray] = None,
+                now: Optional[datetime] = None) -> ChainGreeks:
+        t = year_fractions(chain.expiry, now)
+        fwd = forward_from_spot(chain.spot, t, self.rate)
+        vol = chain.iv if sigma is None else sigma
+        return black76(fwd, chain.strike, t, vol, chain.is_call, self.rate)
+
+    def implied_vols(self, chain: ChainArrays, ltp: Optional[np.ndarray] = None,
+                     now: Optional[datetime] = None) -> np.ndarray:
+        """Solves our own IV for every contract from chain LTPs (or websocket LTPs)."""
+        t = year_fractions(chain.expiry, now)
+        fwd = forward_from_spot(chain.spot, t, self.rate)
+        prices = chain.ltp if ltp is None else ltp
+        return implied_vol(prices, fwd, chain.strike, t, chain.is_call, self.rate)
+
+    def update_cache(self, chain_data: List[Dict], expiry: Optional[str] = None,
+                     now: Optional[datetime] = None) -> int:
+        return self.refresh(chain_to_arrays(chain_data, expiry), expiry or "ALL", now)
+
+    def refresh(self, chain: ChainArrays, slice_id: Hashable, now: Optional[datetime] = None) -> int:
+        if not len(chain):
+            return 0
+        valid = chain.iv > 0
+        self.publish(slice_id, chain.keys, self.compute(chain, now=now), chain.iv, valid, now)
+        return int(valid.sum())
+
+    def publish(self, slice_id: Hashable, keys: List[str], g: ChainGreeks, iv: np.ndarray,
+                valid: np.ndarray, now: Optional[datetime] = None) -> ChainGreeksTable:
+        table = self._tables.get(slice_id)
+        if table is None or table.keys != keys:
+            table = self._rebuild(slice_id, keys)
+        table.publish(g, iv, valid, (now or datetime.now(settings.IST)).timestamp())
+        return table
+
+    def _rebuild(self, slice_id: Hashable, keys: List[str]) -> ChainGreeksTable:
+        old = self._tables.get(slice_id)
+        table = ChainGreeksTable(list(keys))
+        cache = self.greeks_cache
+        if old is not None:
+            for key in set(old.keys).difference(keys):
+                cache.pop(key, None)
+        for key, row in zip(table.keys, table.rows):
+            prev = cache.get(key)
+            if isinstance(prev, GreeksRow):
+                row._extra = prev._extra
+            cache[key] = row
+        self._tables[slice_id] = table
+        return table
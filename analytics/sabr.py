@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – SABR Surface Calibrator
+- Vectorized Hagan (2002) lognormal approximation: one NumPy pass per smile.
+- Per-expiry fit of (alpha, rho, nu) with beta pinned (SABR_BETA), bounded by SABR_BOUNDS.
+- Warm start from the previous fit; expiries run in parallel on a ProcessPoolExecutor (MAX_WORKERS).
+  The pool only pays off across several smiles: LiveDataFeed.refresh_chains hands
+  over a whole refresh batch (every expiry of every underlying) in one call.
+- The surface is published atomically: readers always see a complete set of parameters.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from analytics.pricing import ChainArrays, expiry_timestamps, forward_from_spot, implied_vol, year_fractions
+from core.config import settings
+
+logger = logging.getLogger("SABRCalibrator")
+
+MIN_SMILE_POINTS = 5
+
+
+class SABRParams(NamedTuple):
+    alpha: float
+    beta: float
+    rho: float
+    nu: float
+    forward: float
+    t: float
+    rmse: float
+    n_points: int
+    fitted_at: float
+
+
+class SmileSlice(NamedTuple):
+    """OTM smile of one expiry, in decimal vols."""
+    forward: float
+    t: float
+    strikes: np.ndarray
+    vols: np.ndarray
+
+
+# ------------------------------------------------------
+# Core maths
+# ------------------------------------------------------
+def hagan_vol(forward: Any, strike: Any, t: Any, alpha: Any, beta: Any, rho: Any, nu: Any) -> np.ndarray:
+    """Hagan lognormal SABR vol, fully broadcast (strikes x expiries x parameter sets)."""
+    F = np.asarray(forward, dtype=np.float64)
+    K = np.asarray(strike, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    alpha = np.asarray(alpha, dtype=np.float64)
+    rho = np.asarray(rho, dtype=np.float64)
+    nu = np.asarray(nu, dtype=np.float64)
+    omb = 1.0 - np.asarray(beta, dtype=np.float64)
+
+    log_fk = np.log(F / K)
+    fk_pow = (F * K) ** (0.5 * omb)
+    z = nu / alpha * fk_pow * log_fk
+    # z / x(z) -> 1 at the money; use the series there to avoid 0/0
+    small = np.abs(z) < 1e-6
+    z_safe = np.where(small, 1.0, z)
+    x = np.log((np.sqrt(1.0 - 2.0 * rho * z_safe + z_safe * z_safe) + z_safe - rho) / (1.0 - rho))
+    z_over_x = np.where(small, 1.0 - 0.5 * rho * z, z_safe / x)
+
+    lf2 = log_fk * log_fk
+    denom = fk_pow * (1.0 + omb * omb / 24.0 * lf2 + omb ** 4 / 1920.0 * lf2 * lf2)
+    corr = 1.0 + t * (
+        omb * omb / 24.0 * alpha * alpha / (fk_pow * fk_pow)
+        + 0.25 * rho * (1.0 - omb) * nu * alpha / fk_pow
+        + (2.0 - 3.0 * rho * rho) / 24.0 * nu * nu
+    )
+    return alpha / denom * z_over_x * corr
+
+
+def fit_smile(smile: SmileSlice, beta: float, x0: Optional[Tuple[float, float, float]] = None,
+              bounds: Optional[Dict[str, Tuple[float, float]]] = None) -> SABRParams:
+    """
+    Least-squares fit of (alpha, rho, nu) to one smile. `x0` is the warm start
+    (previous alpha/rho/nu); without it alpha is seeded from the ATM vol.
+    """
+    b = bounds or settings.SABR_BOUNDS
+    F, t, K, vols = smile.forward, smile.t, smile.strikes, smile.vols
+    lo = np.array([b["alpha"][0], b["rho"][0], b["nu"][0]])
+    hi = np.array([b["alpha"][1], b["rho"][1], b["nu"][1]])
+    if x0 is None:
+        atm_vol = float(vols[np.argmin(np.abs(K - F))])
+        x0 = (atm_vol * F ** (1.0 - beta), -0.3, 0.8)
+    x0 = np.clip(np.asarray(x0, dtype=np.float64), lo + 1e-9, hi - 1e-9)
+
+    def residuals(p: np.ndarray) -> np.ndarray:
+        return hagan_vol(F, K, t, p[0], beta, p[1], p[2]) - vols
+
+    res = least_squares(residuals, x0, bounds=(lo, hi), method="trf", x_scale="jac",
+                        xtol=1e-10, ftol=1e-10, max_nfev=200)
+    rmse = float(np.sqrt(np.mean(res.fun * res.fun)))
+    a, r, n = (float(v) for v in res.x)
+    return SABRParams(a, beta, r, n, float(F), float(t), rmse, int(len(K)), time.time())
+
+
+def _calibrate_slice(args: Tuple[str, SmileSlice, float, Optional[Tuple[float, float, float]],
+                                 Dict[str, Tuple[float, float]]]) -> Tuple[str, Optional[SABRParams], str]:
+    # Module-level so ProcessPoolExecutor can pickle it
+    expiry, smile, beta, x0, bounds = args
+    try:
+        return expiry, fit_smile(smile, beta, x0, bounds), ""
+    except Exception as e:
+        return expiry, None, str(e)
+
+
+def smile_from_chain(chain: ChainArrays, now: Optional[datetime] = None,
+                     rate: Optional[float] = None, underlying_key: Optional[str] = None) -> Dict[Any, SmileSlice]:
+    """
+    Builds one OTM smile per expiry from a flattened chain. Uses our own IVs
+    from LTPs, falling back to the broker IV where the solve gave nothing.
+    Keyed by expiry, or by (underlying_key, expiry) when `underlying_key` is given.
+    """
+    out: Dict[Any, SmileSlice] = {}
+    if not len(chain):
+        return out
+    t = year_fractions(chain.expiry, now)
+    fwd = forward_from_spot(chain.spot, t, rate)
+    iv = implied_vol(chain.ltp, fwd, chain.strike, t, chain.is_call, rate)
+    iv = np.where(np.isfinite(iv), iv, chain.iv)
+    otm = np.where(chain.is_call, chain.strike >= fwd, chain.strike < fwd)
+    use = otm & (iv > 0) & (chain.strike > 0)
+    for exp in np.unique(chain.expiry[use]):
+        m = use & (chain.expiry == exp)
+        order = np.argsort(chain.strike[m])
+        out[str(exp) if underlying_key is None else (underlying_key, str(exp))] = SmileSlice(
+            forward=float(np.median(fwd[m])),
+            t=float(np.median(t[m])),
+            strikes=chain.strike[m][order],
+            vols=iv[m][order],
+        )
+    return out
+
+
+# ------------------------------------------------------
+# Service
+# ------------------------------------------------------
+def _slice_expiry(slice_id: Any) -> str:
+    """Expiry date of a slice id: (underlying_key, expiry) or a bare expiry."""
+    return slice_id[1] if isinstance(slice_id, tuple) else slice_id
+
+
+class SABRCalibrator:
+    """
+    Calibrates every expiry of the surface and publishes {slice_id: SABRParams}.
+    Slice ids are whatever the smiles were keyed by: (underlying_key, expiry)
+    from LiveDataFeed, so NIFTY and BANKNIFTY fits of one expiry never collide.
+    `surface` is replaced wholesale after a run, never mutated, so readers
+    (LiveDataFeed, pricing, metrics) can grab it without locks.
+    """
+    def __init__(self, max_workers: Optional[int] = None, beta: Optional[float] = None):
+        self.max_workers = settings.MAX_WORKERS if max_workers is None else max_workers
+        self.beta = settings.SABR_BETA if beta is None else beta
+        self.surface: Dict[Any, SABRParams] = {}
+        self.last_duration_ms = 0.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    # --- Pool ---
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 1:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # --- Calibration ---
+    def _jobs(self, smiles: Dict[Any, SmileSlice]) -> List[Tuple]:
+        jobs = []
+        bounds = dict(settings.SABR_BOUNDS)
+        for expiry, smile in smiles.items():
+            if len(smile.strikes) < MIN_SMILE_POINTS:
+                logger.debug(f"SABR skip {expiry}: {len(smile.strikes)} points")
+                continue
+            prev = self.surface.get(expiry)
+            x0 = (prev.alpha, prev.rho, prev.nu) if prev else None
+            jobs.append((expiry, smile, self.beta, x0, bounds))
+        return jobs
+
+    def _publish(self, results: List[Tuple[Any, Optional[SABRParams], str]], started: float,
+                 now: Optional[datetime] = None) -> Dict[Any, SABRParams]:
+        # Expired slices leave the surface here, so front_params never returns a dead fit
+        now_ts = (now or datetime.now(settings.IST)).timestamp()
+        surface = {k: p for k, p in self.surface.items() if expiry_timestamps(_slice_expiry(k)) > now_ts}
+        for expiry, params, err in results:
+            if params is None:
+                logger.warning(f"SABR Calibration Failed ({expiry}): {err} – keeping previous fit")
+                continue
+            surface[expiry] = params
+        self.surface = surface  # atomic swap
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        logger.debug(f"SABR surface: {len(surface)} expiries in {self.last_duration_ms:.1f} ms")
+        return surface
+
+    def calibrate(self, smiles: Dict[Any, SmileSlice], now: Optional[datetime] = None) -> Dict[Any, SABRParams]:
+        started = time.perf_counter()
+        jobs = self._jobs(smiles)
+        pool = self._executor() if len(jobs) > 1 else None
+        results = list(pool.map(_calibrate_slice, jobs)) if pool else [_calibrate_slice(j) for j in jobs]
+        return self._publish(results, started, now)
+
+    async def calibrate_async(self, smiles: Dict[Any, SmileSlice],
+                              now: Optional[datetime] = None) -> Dict[Any, SABRParams]:
+        """Same as calibrate() but keeps the event loop free while workers fit."""
+        started = time.perf_counter()
+        jobs = self._jobs(smiles)
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        results = await asyncio.gather(*(loop.run_in_executor(pool, _calibrate_slice, j) for j in jobs))
+        return self._publish(list(results), started, now)
+
+    def calibrate_chain(self, chain: ChainArrays, now: Optional[datetime] = None) -> Dict[str, SABRParams]:
+        return self.calibrate(smile_from_chain(chain, now), now)
+
+    # --- Readers ---
+    def vol(self, slice_id: Any, strike: Any, forward: Optional[float] = None, t: Optional[float] = None) -> np.ndarray:
+        """Model vol for strikes of one slice; NaN if that slice has no fit."""
+        p = self.surface.get(slice_id)
+        if p is None:
+            return np.full(np.shape(strike), np.nan)
+        F = p.forward if forward is None else forward
+        T = p.t if t is None else t
+        return hagan_vol(F, strike, T, p.alpha, p.beta, p.rho, p.nu)
+
+    def front_params(self, underlying_key: Optional[str] = None) -> Optional[SABRParams]:
+        """
+        Nearest-expiry fit of one underlying (feeds AdvancedMetrics.sabr_*);
+        defaults to MARKET_KEY_INDEX, which also owns slices keyed by a bare expiry.
+        """
+        surface = self.surface
+        underlying = underlying_key or settings.MARKET_KEY_INDEX
+        bare_ok = underlying == settings.MARKET_KEY_INDEX
+        ids = [k for k in surface if (k[0] == underlying if isinstance(k, tuple) else bare_ok)]
+        if not ids:
+            return None
+        return surface[min(ids, key=_slice_expiry)]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Historical Stress Replay
+- Replays today's book through every day of persisted NIFTY/VIX history
+  (historical_candles) as if that day's moves happened from today's spot.
+- Each day gives three paths: intraday low (paired with the VIX high), close
+  (VIX close) and intraday high (VIX close); IV scales with the VIX ratio.
+- All days x paths x legs are revalued in ONE Black-76 broadcast, then ranked.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.pricing import black76_price, forward_from_spot
+from analytics.scenarios import BookLegs
+from core.config import settings
+
+logger = logging.getLogger("StressReplay")
+
+PATHS = ("low", "close", "high")
+IV_RATIO_BOUNDS = (0.5, 3.0)
+
+
+@dataclass
+class HistoricalMoves:
+    """Per historical window: spot return and VIX ratio for each path (days x paths)."""
+    dates: np.ndarray
+    spot_move: np.ndarray
+    vix_ratio: np.ndarray
+    horizon: int
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+@dataclass
+class StressReplayResult:
+    moves: HistoricalMoves
+    pnl: np.ndarray              # (days, paths)
+
+    @property
+    def worst_pnl(self) -> np.ndarray:
+        return self.pnl.min(axis=1)
+
+    @property
+    def worst_loss(self) -> float:
+        return float(self.pnl.min()) if self.pnl.size else 0.0
+
+    def ranked(self, n: int = 10) -> List[Dict]:
+        """Worst `n` historical days, most damaging first."""
+        worst = self.worst_pnl
+        n = min(n, len(worst))
+        if not n:
+            return []
+        idx = np.argpartition(worst, n - 1)[:n]
+        idx = idx[np.argsort(worst[idx])]
+        path = self.pnl.argmin(axis=1)
+        return [{
+            "date": str(self.moves.dates[i])[:10],
+            "pnl": float(worst[i]),
+            "path": PATHS[path[i]],
+            "spot_move_pct": float(self.moves.spot_move[i, path[i]] * 100.0),
+            "vix_change_pct": float((self.moves.vix_ratio[i, path[i]] - 1.0) * 100.0),
+        } for i in idx]
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.pnl, columns=[f"pnl_{p}" for p in PATHS], index=pd.to_datetime(self.moves.dates))
+        df["worst"] = self.worst_pnl
+        return df
+
+
+def historical_moves(nifty: pd.DataFrame, vix: pd.DataFrame, horizon: int = 1) -> HistoricalMoves:
+    """
+    OHLC frames (DatetimeIndex, as DashboardDataFetcher keeps them) -> moves over
+    every `horizon`-day window, measured from the close before the window.
+    """
+    df = nifty[["high", "low", "close"]].join(
+        vix[["high", "close"]].rename(columns={"high": "vix_high", "close": "vix_close"}), how="inner"
+    ).sort_index().astype(np.float64)
+    if len(df) <= horizon:
+        return HistoricalMoves(np.empty(0, dtype="datetime64[D]"), np.empty((0, 3)), np.empty((0, 3)), horizon)
+
+    close = df["close"].to_numpy()
+    base, base_vix = close[:-horizon], df["vix_close"].to_numpy()[:-horizon]
+
+    def windows(col):
+        return np.lib.stride_tricks.sliding_window_view(df[col].to_numpy()[1:], horizon)
+
+    low = windows("low").min(axis=1)
+    high = windows("high").max(axis=1)
+    end = close[horizon:]
+    vix_high = windows("vix_high").max(axis=1)
+    vix_end = df["vix_close"].to_numpy()[horizon:]
+
+    spot_move = np.column_stack([low, end, high]) / base[:, None] - 1.0
+    vix_ratio = np.column_stack([vix_high, vix_end, vix_end]) / base_vix[:, None]
+    dates = df.index.to_numpy()[horizon:].astype("datetime64[D]")
+    ok = np.isfinite(spot_move).all(axis=1) & np.isfinite(vix_ratio).all(axis=1) & (base_vix > 0)
+    return HistoricalMoves(dates[ok], spot_move[ok], vix_ratio[ok], horizon)
+
+
+def replay(legs: BookLegs, spot: float, moves: HistoricalMoves, rate: Optional[float] = None) -> StressReplayResult:
+    """Book P&L vs. its current model value for every (historical window, path)."""
+    if not len(legs) or not len(moves):
+        return StressReplayResult(moves, np.zeros((len(moves), len(PATHS))))
+    r = settings.RISK_FREE_RATE if rate is None else rate
+    base = black76_price(forward_from_spot(spot, legs.t, r), legs.strike, legs.t, legs.iv, legs.is_call, r)
+
+    t = legs.t - moves.horizon / 365.0
+    s = spot * (1.0 + moves.spot_move)[:, :, None]
+    sigma = legs.iv * np.clip(moves.vix_ratio, *IV_RATIO_BOUNDS)[:, :, None]
+    shocked = black76_price(forward_from_spot(s, t, r), legs.strike, t, sigma, legs.is_call, r)
+    return StressReplayResult(moves, (shocked - base) @ legs.qty)
+
+
+def replay_book(legs: BookLegs, spot: float, nifty: pd.DataFrame, vix: pd.DataFrame,
+                horizons=(1,), rate: Optional[float] = None) -> Dict[int, StressReplayResult]:
+    started = datetime.now()
+    out = {h: replay(legs, spot, historical_moves(nifty, vix, h), rate) for h in horizons}
+    logger.info(f"Stress replay: {len(legs)} legs x {[len(r.moves) for r in out.values()]} windows "
+                f"in {(datetime.now() - started).total_seconds() * 1000:.0f} ms")
+    return out
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Monte Carlo Tail Risk (VaR / Expected Shortfall)
+- Simulates NIFTY paths from the fitted GARCH(1,1)-t parameters (HybridVolatilityAnalytics).
+- Paths are simulated once per refit, chunked over a ProcessPoolExecutor (MAX_WORKERS).
+- The book is repriced on the cached paths (1-day and expiry horizon); IV follows the
+  path's GARCH vol ratio, so vol expansion in the tail is priced in.
+- Book P&L is cached per (fit version, book fingerprint), so the pre-trade gate only
+  reprices the proposed legs.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from analytics.pricing import black76_price, forward_from_spot
+from analytics.scenarios import BookLegs
+from core.config import settings
+
+logger = logging.getLogger("TailRisk")
+
+SPOT_REPRICE_TOLERANCE = 0.005   # re-run the cached book P&L if spot drifts > 0.5%
+IV_RATIO_BOUNDS = (0.5, 3.0)
+
+
+class GarchParams(NamedTuple):
+    """GARCH(1,1) with Student-t innovations, in percent daily returns (arch convention)."""
+    mu: float
+    omega: float
+    alpha: float
+    beta: float
+    nu: float
+    sigma2_next: float     # one-step-ahead conditional variance
+    version: int = 0
+    fitted_at: float = 0.0
+
+
+@dataclass
+class TailRiskResult:
+    confidence: float
+    var_1d: float
+    es_1d: float
+    var_expiry: float
+    es_expiry: float
+    horizon_days: int
+    n_paths: int
+    fit_version: int
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "var_1d": self.var_1d, "es_1d": self.es_1d,
+            "var_expiry": self.var_expiry, "es_expiry": self.es_expiry,
+            "horizon_days": self.horizon_days,
+        }
+
+
+# ------------------------------------------------------
+# Simulation (module-level so the process pool can pickle it)
+# ------------------------------------------------------
+def _simulate_chunk(args: Tuple[GarchParams, int, int, np.random.SeedSequence]) -> Tuple[np.ndarray, np.ndarray]:
+    """Cumulative log-return and vol ratio (sigma_d / sigma_1) per path and day."""
+    p, horizon, n, seed = args
+    rng = np.random.default_rng(seed)
+    scale = np.sqrt((p.nu - 2.0) / p.nu)  # unit-variance t
+    sigma2 = np.full(n, p.sigma2_next)
+    sigma0 = np.sqrt(p.sigma2_next)
+    cum = np.zeros(n)
+    log_ret = np.empty((n, horizon), dtype=np.float32)
+    vol_ratio = np.empty((n, horizon), dtype=np.float32)
+    for d in range(horizon):
+        eps = np.sqrt(sigma2) * rng.standard_t(p.nu, n) * scale
+        cum += (p.mu + eps) / 100.0
+        sigma2 = p.omega + p.alpha * eps * eps + p.beta * sigma2
+        log_ret[:, d] = cum
+        vol_ratio[:, d] = np.sqrt(sigma2) / sigma0
+    return log_ret, vol_ratio
+
+
+def simulate_paths(params: GarchParams, horizon: int, n_paths: int, chunks: int = 1,
+                   pool: Optional[ProcessPoolExecutor] = None,
+                   seed: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    seeds = np.random.SeedSequence(seed if seed is not None else params.version).spawn(chunks)
+    sizes = np.full(chunks, n_paths // chunks)
+    sizes[: n_paths % chunks] += 1
+    jobs = [(params, horizon, int(n), s) for n, s in zip(sizes, seeds)]
+    parts = list(pool.map(_simulate_chunk, jobs)) if pool and chunks > 1 else [_simulate_chunk(j) for j in jobs]
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def var_es(pnl: np.ndarray, confidence: float) -> Tuple[float, float]:
+    """Loss-positive VaR and ES at `confidence` from a P&L sample."""
+    if not pnl.size:
+        return 0.0, 0.0
+    cutoff = np.quantile(pnl, 1.0 - confidence)
+    tail = pnl[pnl <= cutoff]
+    es = -tail.mean() if tail.size else -cutoff
+    return float(max(-cutoff, 0.0)), float(max(es, 0.0))
+
+
+def _net(legs: BookLegs) -> BookLegs:
+    """Collapses legs on the same contract (same strike/type/expiry/IV) into one column."""
+    rows = np.column_stack([legs.strike, legs.is_call, legs.t, legs.iv])
+    uniq, inv = np.unique(rows, axis=0, return_inverse=True)
+    if len(uniq) == len(legs):
+        return legs
+    qty = np.bincount(inv.ravel(), weights=legs.qty, minlength=len(uniq))
+    return BookLegs([""] * len(uniq), uniq[:, 0], uniq[:, 1].astype(bool), qty, uniq[:, 2], uniq[:, 3])
+
+
+# ------------------------------------------------------
+# Engine
+# ------------------------------------------------------
+class TailRiskEngine:
+    def __init__(self, n_paths: Optional[int] = None, confidence: Optional[float] = None,
+                 max_workers: Optional[int] = None, max_horizon: int = 35, rate: Optional[float] = None):
+        self.n_paths = settings.MC_PATHS if n_paths is None else n_paths
+        self.confidence = settings.TAIL_RISK_CONFIDENCE if confidence is None else confidence
+        self.max_workers = settings.MAX_WORKERS if max_workers is None else max_workers
+        self.max_horizon = max_horizon
+        self.rate = settings.RISK_FREE_RATE if rate is None else rate
+        self.params: Optional[GarchParams] = None
+        self.log_ret: Optional[np.ndarray] = None
+        self.vol_ratio: Optional[np.ndarray] = None
+        self.result: Optional[TailRiskResult] = None
+        self._book_key: Optional[Tuple] = None
+        self._book_spot = 0.0
+        self._book_pnl: Dict[int, np.ndarray] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def ready(self) -> bool:
+        return self.log_ret is not None
+
+    def refresh(self, params: GarchParams) -> bool:
+        """Re-simulates only when the GARCH fit version changed."""
+        if self.params is not None and params.version == self.params.version and self.ready:
+            return False
+        started = time.perf_counter()
+        chunks = max(1, self.max_workers)
+        if chunks > 1 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=chunks)
+        self.log_ret, self.vol_ratio = simulate_paths(params, self.max_horizon, self.n_paths, chunks, self._pool)
+        self.params = params
+        self._book_key = None
+        self.result = None
+        logger.info(f"MC paths refreshed (fit v{params.version}): {self.n_paths} x {self.max_horizon}d "
+                    f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+
+    # --- Repricing ---
+    def _horizon(self, legs: BookLegs) -> int:
+        if not len(legs):
+            return 1
+        return int(np.clip(np.ceil(legs.t.min() * 365.0), 1, self.max_horizon))
+
+    def _leg_pnl(self, legs: BookLegs, spot: float, day: int) -> np.ndarray:
+        """Per-path P&L of `legs` after `day` days (paths x legs summed)."""
+        if not len(legs):
+            return np.zeros(len(self.log_ret))
+        legs = _net(legs)
+        r = self.rate
+        base = black76_price(forward_from_spot(spot, legs.t, r), legs.strike, legs.t, legs.iv, legs.is_call, r)
+        s = spot * np.exp(self.log_ret[:, day - 1].astype(np.float64))[:, None]
+        t = legs.t - day / 365.0
+        ratio = np.clip(self.vol_ratio[:, day - 1].astype(np.float64), *IV_RATIO_BOUNDS)[:, None]
+        price = black76_price(forward_from_spot(s, t, r), legs.strike, t, legs.iv * ratio, legs.is_call, r)
+        return (price - base) @ legs.qty
+
+    @staticmethod
+    def _fingerprint(legs: BookLegs) -> Tuple:
+        return (tuple(legs.keys), legs.qty.tobytes())
+
+    def _book_at(self, legs: BookLegs, spot: float, day: int) -> np.ndarray:
+        """Book P&L on the cached paths, kept per (fit version, book) and recomputed on spot drift."""
+        key = (self.params.version, self._fingerprint(legs))
+        moved = self._book_spot <= 0 or abs(spot / self._book_spot - 1.0) > SPOT_REPRICE_TOLERANCE
+        if key != self._book_key or moved:
+            self._book_pnl = {}
+            self._book_key, self._book_spot = key, spot
+            self.result = None
+        pnl = self._book_pnl.get(day)
+        if pnl is None:
+            pnl = self._book_pnl[day] = self._leg_pnl(legs, self._book_spot, day)
+        return pnl
+
+    def _summarize(self, pnl_1d: np.ndarray, pnl_h: np.ndarray, horizon: int) -> TailRiskResult:
+        v1, e1 = var_es(pnl_1d, self.confidence)
+        vh, eh = var_es(pnl_h, self.confidence)
+        return TailRiskResult(self.confidence, v1, e1, vh, eh, horizon, len(self.log_ret), self.params.version)
+
+    def evaluate(self, legs: BookLegs, spot: float) -> Optional[TailRiskResult]:
+        if not self.ready:
+            return None
+        h = self._horizon(legs)
+        pnl_1d = self._book_at(legs, spot, 1)
+        if self.result is None:
+            self.result = self._summarize(pnl_1d, self._book_at(legs, spot, h), h)
+        return self.result
+
+    def evaluate_with(self, book: BookLegs, proposed: BookLegs, spot: float) -> Optional[TailRiskResult]:
+        """Tail risk of book + proposed legs: only the new legs are repriced on the cached paths."""
+        if not self.ready:
+            return None
+        h = min(self._horizon(book) if len(book) else self.max_horizon, self._horizon(proposed))
+        pnl_1d = self._book_at(book, spot, 1) + self._leg_pnl(proposed, self._book_spot, 1)
+        pnl_h = self._book_at(book, spot, h) + self._leg_pnl(proposed, self._book_spot, h)
+        return self._summarize(pnl_1d, pnl_h, h)
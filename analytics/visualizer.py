@@ -16,8 +16,9 @@ from core.models import DashboardData
 logger = logging.getLogger("VolGuardVisualizer")
 
 class DashboardVisualizer:
-    def __init__(self):
+    def __init__(self, vol_surface=None):
         self.executor = ThreadPoolExecutor(max_workers=2)
+        self.vol_surface = vol_surface
         try:
             plt.style.use('seaborn-v0_8-darkgrid')
         except:
@@ -53,9 +54,11 @@ class DashboardVisualizer:
     def _plot_term_structure(self, dashboard_data: DashboardData) -> Dict[str, str]:
         try:
             fig, ax = plt.subplots(figsize=(10, 5))
-            days = [7, 14, 21, 28, 35]
-            # Mock term structure curve based on ATM IV + skew
-            ivs = [dashboard_data.atm_iv + (0.005 * i) for i in range(len(days))]
+            if self.vol_surface is not None and len(self.vol_surface):
+                # Listed expiries straight from the shared surface
+                days, ivs = self.vol_surface.term_structure()
+            else:
+                days, ivs = [0], [dashboard_data.atm_iv]
             
             ax.plot(days, ivs, marker='o', linewidth=2, color='blue')
             ax.set_title("Volatility Term Structure")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Cached Volatility Surface
+- IV held on a fixed log-moneyness grid, one row per (underlying, listed expiry)
+  (decimal vols); NIFTY and BANKNIFTY share expiry dates, never rows.
+- Chain refreshes overwrite the affected expiry rows in place; nothing is rebuilt.
+- Strike interpolation is linear in IV, expiry interpolation is linear in total variance.
+- ATM IV, skew and term structure are array reads, so every consumer shares one parse.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analytics.pricing import MIN_TIME_FLOOR, SECONDS_PER_YEAR, ChainArrays, expiry_timestamps
+from analytics.sabr import SmileSlice, smile_from_chain
+from core.config import settings
+
+logger = logging.getLogger("VolSurface")
+
+LOG_MONEYNESS_GRID = np.linspace(-0.30, 0.30, 121)
+SKEW_WIDTH = 0.05          # +/- 5% log-moneyness wings for the skew reading
+TERM_STRUCTURE_DAYS = 30.0
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class VolSurface:
+    """
+    Shared IV surface keyed by ((underlying_key, expiry), ln(K/F)). Smiles keyed
+    by a bare expiry belong to `underlying_key` (MARKET_KEY_INDEX), and every
+    reader defaults to it. `version` increments on every update so consumers
+    can cheaply tell whether anything changed.
+    """
+    def __init__(self, capacity: int = 8, grid: Optional[np.ndarray] = None,
+                 underlying_key: Optional[str] = None):
+        self.grid = LOG_MONEYNESS_GRID if grid is None else np.asarray(grid, dtype=np.float64)
+        self.underlying_key = underlying_key or settings.MARKET_KEY_INDEX
+        self._atm_col = int(np.argmin(np.abs(self.grid)))
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._free: List[int] = list(range(capacity))
+        self.iv = np.full((capacity, len(self.grid)), np.nan)
+        self.forward = np.full(capacity, np.nan)
+        self.expiry_ts = np.full(capacity, np.nan)
+        self.updated_at = np.full(capacity, np.nan)
+        self._order: Dict[str, np.ndarray] = {}  # underlying -> live rows sorted by expiry
+        self.version = 0
+
+    # --- Storage ---
+    def _key(self, key: Any) -> Tuple[str, str]:
+        return key if isinstance(key, tuple) else (self.underlying_key, key)
+
+    def _rows_of(self, underlying_key: Optional[str]) -> np.ndarray:
+        return self._order.get(underlying_key or self.underlying_key, _NO_ROWS)
+
+    def _row(self, key: Tuple[str, str]) -> int:
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        if not self._free:
+            extra = len(self.forward)
+            self.iv = np.vstack([self.iv, np.full_like(self.iv, np.nan)])
+            for name in ("forward", "expiry_ts", "updated_at"):
+                col = getattr(self, name)
+                setattr(self, name, np.concatenate([col, np.full_like(col, np.nan)]))
+            self._free = list(range(extra, 2 * extra))
+        row = self._rows[key] = self._free.pop(0)
+        self.expiry_ts[row] = float(expiry_timestamps(key[1]))
+        self._reorder()
+        return row
+
+    def _reorder(self):
+        by_underlying: Dict[str, List[int]] = {}
+        for (underlying, _), row in self._rows.items():
+            by_underlying.setdefault(underlying, []).append(row)
+        order = {}
+        for underlying, rows in by_underlying.items():
+            rows = np.array(rows, dtype=np.int64)
+            order[underlying] = rows[np.argsort(self.expiry_ts[rows])]
+        self._order = order
+
+    def drop_expired(self, now: Optional[datetime] = None) -> int:
+        now_ts = (now or datetime.now(settings.IST)).timestamp()
+        gone = [k for k, r in self._rows.items() if self.expiry_ts[r] <= now_ts]
+        for key in gone:
+            row = self._rows.pop(key)
+            self.iv[row] = np.nan
+            self.forward[row] = self.expiry_ts[row] = self.updated_at[row] = np.nan
+            self._free.append(row)
+        if gone:
+            self._reorder()
+            self.version += 1
+        return len(gone)
+
+    @property
+    def expiries(self) -> List[str]:
+        return self.expiries_for()
+
+    def expiries_for(self, underlying_key: Optional[str] = None) -> List[str]:
+        by_row = {r: e for (_, e), r in self._rows.items()}
+        return [by_row[r] for r in self._rows_of(underlying_key)]
+
+    @property
+    def underlyings(self) -> List[str]:
+        return sorted(self._order)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- Writers ---
+    def update(self, smiles: Dict[Any, SmileSlice]) -> int:
+        """
+        Overwrites the rows present in `smiles` (keyed by (underlying_key, expiry)
+        or a bare expiry); others are untouched.
+        """
+        stamp = time.time()
+        n = 0
+        for key, smile in smiles.items():
+            if len(smile.strikes) < 2:
+                continue
+            k = np.log(smile.strikes / smile.forward)
+            order = np.argsort(k)
+            row = self._row(self._key(key))
+            self.iv[row] = np.interp(self.grid, k[order], smile.vols[order])
+            self.forward[row] = smile.forward
+            self.updated_at[row] = stamp
+            n += 1
+        if n:
+            self.version += 1
+        return n
+
+    def update_chain(self, chain: ChainArrays, now: Optional[datetime] = None,
+                     underlying_key: Optional[str] = None) -> int:
+        return self.update(smile_from_chain(chain, now, underlying_key=underlying_key or self.underlying_key))
+
+    # --- Readers ---
+    def _years(self, rows: np.ndarray, now: Optional[datetime]) -> np.ndarray:
+        now_ts = (now or datetime.now(settings.IST)).timestamp()
+        return np.maximum((self.expiry_ts[rows] - now_ts) / SECONDS_PER_YEAR, MIN_TIME_FLOOR)
+
+    def _front(self, underlying_key: Optional[str] = None) -> Optional[int]:
+        rows = self._rows_of(underlying_key)
+        return int(rows[0]) if len(rows) else None
+
+    def _at(self, expiry: Optional[str], underlying_key: Optional[str]) -> Optional[int]:
+        if expiry is None:
+            return self._front(underlying_key)
+        return self._rows.get((underlying_key or self.underlying_key, expiry))
+
+    def smile(self, expiry: str, strike: Any, underlying_key: Optional[str] = None) -> np.ndarray:
+        """IV at the given strikes of one listed expiry (NaN if not on the surface)."""
+        row = self._at(expiry, underlying_key)
+        if row is None:
+            return np.full(np.shape(strike), np.nan)
+        k = np.log(np.asarray(strike, dtype=np.float64) / self.forward[row])
+        return np.interp(k, self.grid, self.iv[row])
+
+    def iv_at(self, days: Any, log_moneyness: Any = 0.0, now: Optional[datetime] = None,
+              underlying_key: Optional[str] = None) -> np.ndarray:
+        """
+        IV at arbitrary (days to expiry, ln(K/F)), interpolating total variance
+        between the bracketing expiries; flat vol outside the listed range.
+        """
+        rows = self._rows_of(underlying_key)
+        if not len(rows):
+            return np.full(np.broadcast(np.asarray(days), np.asarray(log_moneyness)).shape, np.nan)
+        t_rows = self._years(rows, now)
+        t = np.maximum(np.asarray(days, dtype=np.float64) / 365.0, MIN_TIME_FLOOR)
+        k = np.asarray(log_moneyness, dtype=np.float64)
+        if len(rows) == 1:
+            return np.interp(k, self.grid, self.iv[rows[0]]) + 0.0 * t
+        j = np.clip(np.searchsorted(t_rows, t), 1, len(rows) - 1)
+        t0, t1 = t_rows[j - 1], t_rows[j]
+        step = self.grid[1] - self.grid[0]
+        pos = np.clip((k - self.grid[0]) / step, 0, len(self.grid) - 1)
+        c0 = np.floor(pos).astype(np.int64)
+        c1 = np.minimum(c0 + 1, len(self.grid) - 1)
+        frac = pos - c0
+
+        def at(r):
+            return self.iv[r, c0] * (1 - frac) + self.iv[r, c1] * frac
+
+        v0, v1 = at(rows[j - 1]), at(rows[j])
+        tc = np.clip(t, t0, t1)
+        w = (tc - t0) / (t1 - t0)
+        var = (v0 * v0 * t0) * (1 - w) + (v1 * v1 * t1) * w
+        return np.sqrt(var / tc)
+
+    def atm_iv(self, expiry: Optional[str] = None, underlying_key: Optional[str] = None) -> float:
+        row = self._at(expiry, underlying_key)
+        return np.nan if row is None else float(self.iv[row, self._atm_col])
+
+    def skew(self, expiry: Optional[str] = None, width: float = SKEW_WIDTH,
+             underlying_key: Optional[str] = None) -> float:
+        """Put-wing minus call-wing IV (vol points) at -/+ `width` log-moneyness."""
+        row = self._at(expiry, underlying_key)
+        if row is None:
+            return np.nan
+        lo, hi = np.interp([-width, width], self.grid, self.iv[row])
+        return float((lo - hi) * 100.0)
+
+    def term_structure(self, now: Optional[datetime] = None,
+                       underlying_key: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(days to expiry, ATM IV) for every listed expiry, nearest first."""
+        rows = self._rows_of(underlying_key)
+        return self._years(rows, now) * 365.0, self.iv[rows, self._atm_col].copy()
+
+    def term_structure_spread(self, days: float = TERM_STRUCTURE_DAYS, now: Optional[datetime] = None,
+                              underlying_key: Optional[str] = None) -> float:
+        """Constant-maturity ATM IV at `days` minus front ATM IV (vol points)."""
+        front = self.atm_iv(underlying_key=underlying_key)
+        if np.isnan(front):
+            return np.nan
+        return float((self.iv_at(days, 0.0, now, underlying_key) - front) * 100.0)
+
+    def metrics(self, now: Optional[datetime] = None, underlying_key: Optional[str] = None) -> Dict[str, float]:
+        """
+        Fields for AdvancedMetrics (atm_iv / monthly_iv decimal, spread / skew in
+        vol points) of one underlying; see AdvancedMetrics.with_surface.
+        """
+        if not len(self._rows_of(underlying_key)):
+            return {}
+        return {
+            "atm_iv": self.atm_iv(underlying_key=underlying_key),
+            "monthly_iv": float(self.iv_at(TERM_STRUCTURE_DAYS, 0.0, now, underlying_key)),
+            "term_structure_spread": self.term_structure_spread(now=now, underlying_key=underlying_key),
+            "volatility_skew": self.skew(underlying_key=underlying_key),
+        }
@@ -2,17 +2,27 @@ import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime
-from typing import Tuple, Dict
+from typing import Callable, Dict, List, Optional, Tuple
 from arch import arch_model
 from scipy.stats import percentileofscore
 from core.config import settings, IST
+from analytics.tail_risk import GarchParams
 
 logger = logging.getLogger("VolAnalytics")
 
 class HybridVolatilityAnalytics:
-    def __init__(self, data_fetcher):
+    def __init__(self, data_fetcher, bars=None):
         self.data_fetcher = data_fetcher
+        self.bars = bars  # trading.bar_aggregator.BarAggregator (LiveDataFeed.bars); intraday inputs
         self.vol_cache: Dict[str, Tuple[float, datetime]] = {}
+        # Last GARCH-t fit, kept for the Monte Carlo tail-risk engine
+        self.garch_params: Optional[GarchParams] = None
+        self.fit_version = 0
+        self._fit_listeners: List[Callable[[GarchParams], object]] = []
+
+    def add_fit_listener(self, callback: Callable[[GarchParams], object]):
+        """Called with the new GarchParams after every GARCH refit."""
+        self._fit_listeners.append(callback)
 
     def get_volatility_metrics(self, current_vix: float) -> Tuple[float, float, float, float, float, float]:
         try:
@@ -25,6 +35,16 @@ class HybridVolatilityAnalytics:
             logger.error(f"Vol Metrics Failed: {e}")
             return 15.0, 15.0, 15.0, 15.0, 50.0, 50.0
 
+    def get_intraday_metrics(self, instrument_key: Optional[str] = None) -> Tuple[float, str]:
+        """(5m realized vol %, 15m trend) from the live bars; no REST. (0.0, "NEUTRAL") without bars."""
+        if self.bars is None: return 0.0, "NEUTRAL"
+        key = instrument_key or settings.MARKET_KEY_INDEX
+        try:
+            return self.bars.realized_vol(key), self.bars.trend(key)
+        except Exception as e:
+            logger.error(f"Intraday Metrics Failed: {e}")
+            return 0.0, "NEUTRAL"
+
     def calculate_volatility_regime(self, current_vix: float, iv_rank: float) -> str:
         if current_vix > 30.0 or iv_rank > 90.0: return "EXTREME_FEAR"
         elif iv_rank > 60.0: return "HIGH_VOL"
@@ -98,6 +118,7 @@ class HybridVolatilityAnalytics:
             gm = arch_model(returns, vol='Garch', p=1, q=1, dist='t')
             res_g = gm.fit(disp='off')
             garch = np.sqrt(res_g.forecast(horizon=7).variance.iloc[-1].mean()) * np.sqrt(252)
+            self._store_garch_fit(res_g)
 
             em = arch_model(returns, vol='EGARCH', p=1, q=1, dist='t')
             res_e = em.fit(disp='off')
@@ -106,3 +127,24 @@ class HybridVolatilityAnalytics:
             self.vol_cache[cache_key] = ((garch, egarch), datetime.now(IST))
             return garch, egarch
         except: return 15.0, 15.0
+
+    def _store_garch_fit(self, res) -> None:
+        try:
+            p = res.params
+            eps = float(res.resid.iloc[-1])
+            sigma2 = float(res.conditional_volatility.iloc[-1]) ** 2
+            omega, alpha, beta = float(p["omega"]), float(p["alpha[1]"]), float(p["beta[1]"])
+            self.fit_version += 1
+            self.garch_params = GarchParams(
+                mu=float(p.get("mu", 0.0)), omega=omega, alpha=alpha, beta=beta, nu=float(p["nu"]),
+                sigma2_next=omega + alpha * eps * eps + beta * sigma2,
+                version=self.fit_version, fitted_at=datetime.now(IST).timestamp(),
+            )
+        except Exception as e:
+            logger.warning(f"GARCH params not stored: {e}")
+            return
+        for callback in self._fit_listeners:
+            try:
+                callback(self.garch_params)
+            except Exception as e:
+                logger.error(f"GARCH fit listener failed: {e}")
@@ -86,6 +86,14 @@ class CapitalManager:
         )
         logger.info(f"✅ Trade Registered: {self.active_trade.id} | Cap Used: {capital_used}")
 
+    def close_trade(self, reason: str):
+        if not self.active_trade:
+            return
+        logger.warning(f"🛑 Trade Closed: {self.active_trade.id} | {reason} | PnL: {self.active_trade.pnl}")
+        self.daily_pnl += self.active_trade.pnl
+        self.active_trade = None
+        self.deployed_capital = 0.0
+
     def update_trade_from_positions(self, positions: dict):
         if not self.active_trade:
             return
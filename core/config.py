@@ -79,6 +79,12 @@ class Settings(BaseSettings):
     # Capital
     ACCOUNT_SIZE: float = Field(default=2_000_000.0)
     MARGIN_REFRESH_SEC: int = Field(default=30)
+    MARGIN_VERIFY_SEC: int = Field(default=900)  # broker check of the local margin model
+    QUOTE_BATCH_MAX: int = Field(default=500)  # broker limit: instrument keys per market-quote request
+    QUOTE_COALESCE_MS: float = Field(default=5.0)  # QuoteService: callers within this window share one request
+    QUOTE_MAX_AGE_SEC: float = Field(default=2.0)  # QuoteCache: feed LTPs older than this go to REST
+    LOT_SIZE: int = Field(default=75)
+    PRE_TRADE_BUDGET_MS: int = Field(default=1500)  # deadline for the concurrent AI + margin gates
     NIFTY_FREEZE_QTY: int = Field(default=1800)
     BANKNIFTY_FREEZE_QTY: int = Field(default=900)
     MAX_LOTS: int = Field(default=10)
@@ -96,12 +102,21 @@ class Settings(BaseSettings):
     WEEKLY_MAX_RISK: float = Field(default=8_000.0)
     MONTHLY_MAX_RISK: float = Field(default=10_000.0)
     INTRADAY_MAX_RISK: float = Field(default=4_000.0)
+    SCENARIO_MAX_LOSS_PCT: float = Field(default=0.05)  # worst gated cell vs ACCOUNT_SIZE
+    # Scenario set the limit is gated on (the grid itself reaches +/-10%, +15 vol pts, 3 days)
+    SCENARIO_LIMIT_SPOT_PCT: float = Field(default=0.05)  # |spot shock| up to 5%
+    SCENARIO_LIMIT_VOL_PTS: float = Field(default=0.05)   # vol shock up to +5 pts (decimal)
+    SCENARIO_LIMIT_DAYS: float = Field(default=1.0)
+    MC_PATHS: int = Field(default=50_000)
+    TAIL_RISK_CONFIDENCE: float = Field(default=0.99)
+    MAX_TAIL_LOSS_PCT: float = Field(default=0.04)  # 1-day ES (book + new trade) vs ACCOUNT_SIZE
     
     # Greeks
     MAX_PORTFOLIO_VEGA: float = Field(default=1000.0)
     MAX_PORTFOLIO_DELTA: float = Field(default=300.0)
     MAX_PORTFOLIO_THETA: float = Field(default=-1500.0)
     MAX_PORTFOLIO_GAMMA: float = Field(default=50.0)
+    RISK_FREE_RATE: float = Field(default=0.065)
 
     # Circuit Breakers
     MAX_ERROR_COUNT: int = Field(default=5)
@@ -115,6 +130,8 @@ class Settings(BaseSettings):
         "rho": (-0.99, 0.99),
         "nu": (0.01, 5.0),
     }
+    SABR_BETA: float = Field(default=1.0)
+    MAX_WORKERS: int = Field(default=2)
 
     # Runtime
     PERSISTENT_DATA_DIR: str = "./data"
@@ -125,6 +142,16 @@ class Settings(BaseSettings):
     GREEK_TOLERANCE_PCT: float = Field(default=15.0)
     MARKET_KEY_INDEX: str = Field(default="NSE_INDEX|Nifty 50")
     MARKET_KEY_VIX: str = Field(default="NSE_INDEX|India VIX")
+    TICK_HISTORY_DEPTH: int = Field(default=512)  # ticks kept per instrument in the feed ring buffer
+    INSTRUMENT_CAPACITY: int = Field(default=4096)  # max live instrument ids per registry (arrays preallocated to it)
+    INSTRUMENT_RECYCLE_SEC: float = Field(default=30.0)  # an unsubscribed key's id is reused only after this long
+    TICK_RECORD_DIR: str = Field(default="./data/ticks")  # binary tick files (infra.tick_recorder)
+    STALE_DATA_SEC: float = Field(default=5.0)  # a watched instrument with no tick for this long is stale
+    BAR_FLUSH_SEC: int = Field(default=60)  # bulk write of completed intraday bars
+    BAR_PENDING_MAX: int = Field(default=50000)  # completed bars held for the DB across failed flushes
+    CHAIN_KEYFRAME_EVERY: int = Field(default=60)  # chain snapshots: full keyframe every N fetches, deltas between
+    ATM_WINDOW_STRIKES: int = Field(default=10)  # +/- strikes kept subscribed around ATM
+    ATM_WINDOW_EXPIRIES: int = Field(default=2)
 
     # Timings
     MARKET_OPEN_TIME: dtime = dtime(9, 15)
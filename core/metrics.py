@@ -24,6 +24,10 @@ class SystemMetrics:
     active_positions: int = 0
     total_capital_used: float = 0.0
     current_pnl: float = 0.0
+    stale_instruments: int = 0      # watched instruments past STALE_DATA_SEC (StalenessIndex)
+    watched_instruments: int = 0
+    intraday_rv: float = 0.0        # index 5m realized vol % (BarAggregator)
+    intraday_trend: str = "NEUTRAL"  # index 15m trend (BarAggregator)
     
     # Time-series (Last 100 events)
     recent_errors: deque = field(default_factory=lambda: deque(maxlen=100))
@@ -107,6 +111,16 @@ class SystemMetrics:
         self.total_capital_used = capital
         self.current_pnl = pnl
     
+    def update_staleness(self, stale: int, watched: int):
+        """Stale/watched counts from one StalenessIndex scan"""
+        self.stale_instruments = stale
+        self.watched_instruments = watched
+
+    def update_intraday(self, rv: float, trend: str):
+        """Index realized vol / trend from the live bars"""
+        self.intraday_rv = rv
+        self.intraday_trend = trend
+
     def to_dict(self) -> Dict:
         """Serialize for API response"""
         return {
@@ -122,6 +136,10 @@ class SystemMetrics:
                 "active_positions": self.active_positions,
                 "total_capital_used": self.total_capital_used,
                 "current_pnl": self.current_pnl,
+                "stale_instruments": self.stale_instruments,
+                "watched_instruments": self.watched_instruments,
+                "intraday_rv": self.intraday_rv,
+                "intraday_trend": self.intraday_trend,
             },
             "timestamps": {
                 "last_reset": self.last_reset.isoformat() if self.last_reset else None,
@@ -1,3 +1,4 @@
+import math
 from datetime import datetime
 from typing import List, Optional, Any, Dict
 from pydantic import BaseModel, Field
@@ -125,6 +126,22 @@ class AdvancedMetrics(BaseModel):
     # Extras
     efficiency_table: List[Dict] = []
 
+    def with_surface(self, vol_surface=None, sabr_model=None,
+                     underlying_key: Optional[str] = None) -> "AdvancedMetrics":
+        """
+        Copy with the term-structure/skew fields read off the shared VolSurface
+        and the front SABR fit; readings the surface cannot give (NaN) keep
+        their current values.
+        """
+        update: Dict[str, float] = {}
+        if vol_surface is not None:
+            update.update(vol_surface.metrics(underlying_key=underlying_key))
+        front = sabr_model.front_params(underlying_key) if sabr_model is not None else None
+        if front is not None:
+            update.update(sabr_alpha=front.alpha, sabr_beta=front.beta, sabr_rho=front.rho, sabr_nu=front.nu)
+        update = {k: float(v) for k, v in update.items() if math.isfinite(v)}
+        return self.model_copy(update=update) if update else self
+
 class Order(BaseModel):
     instrument_key: str
     quantity: int
@@ -1,7 +1,8 @@
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional, Awaitable
 from core.models import MultiLegTrade
 from core.enums import TradeStatus
 from core.config import settings
@@ -13,12 +14,17 @@ class MasterSafetyLayer:
     INTELLIGENCE EDITION v3.0:
     Now includes AI Pattern Matching in the approval chain.
     """
-    def __init__(self, risk_manager, margin_guard, lifecycle_mgr, vrp_analyzer, ai_officer):
+    FAIL_OPEN_GATES = frozenset({"ai"})  # advisory: may be skipped on timeout/error; margin may not
+
+    def __init__(self, risk_manager, margin_guard, lifecycle_mgr, vrp_analyzer, ai_officer, greek_scorer=None,
+                 staleness=None):
         self.risk_mgr = risk_manager
         self.margin_guard = margin_guard
         self.lifecycle_mgr = lifecycle_mgr
         self.vrp_analyzer = vrp_analyzer
         self.ai_officer = ai_officer  # NEW: The AI Brain
+        self.greek_scorer = greek_scorer  # Rolling broker-vs-model confidence
+        self.staleness = staleness        # StalenessIndex of the live feed (LiveDataFeed.staleness)
         
         # State tracking
         self.trades_today = 0
@@ -32,6 +38,7 @@ class MasterSafetyLayer:
         self.max_drawdown_pct = 0.05 
         self.max_single_trade_loss_pct = 0.01
         self.min_greek_confidence = 0.6
+        self.gate_timings: Dict[str, float] = {}  # ms per gate, last pre_trade_gate call
 
     async def pre_trade_gate(
         self, 
@@ -40,10 +47,47 @@ class MasterSafetyLayer:
     ) -> Tuple[bool, str]:
         """
         MASTER GATE - Checks Math, Margin, Greeks, AND AI History
+        Local gates run first and short-circuit; the network gates (AI, Margin)
+        then run concurrently under PRE_TRADE_BUDGET_MS, so the decision costs
+        the slowest of them rather than their sum. Durations land in gate_timings.
         """
+        timings: Dict[str, float] = {}
+        self.gate_timings = timings
+        started = time.perf_counter()
+
+        # === GATES 1-4, 6, 7: Local checks (microseconds) ===
+        reason = self._local_gates(trade, current_metrics)
+        timings["local"] = (time.perf_counter() - started) * 1000
+        if reason:
+            return False, reason
+
+        # === GATES 5 + 8: Network checks, concurrently ===
+        gates = {}
+        if self.ai_officer:
+            gates["ai"] = self._ai_gate(trade, current_metrics)
+        if self.margin_guard:
+            gates["margin"] = self._margin_gate(trade, current_metrics)
+        verdicts = await self._run_concurrent(gates, settings.PRE_TRADE_BUDGET_MS / 1000.0, timings)
+        timings["total"] = (time.perf_counter() - started) * 1000
+
+        for name in ("ai", "margin"):
+            if verdicts.get(name):
+                return False, verdicts[name]
+
+        logger.info(f"✅ ALL GATES PASSED for {trade.id} ({timings['total']:.0f} ms)")
+        return True, "Approved"
+
+    def _local_gates(self, trade: MultiLegTrade, current_metrics: Dict[str, Any]) -> Optional[str]:
         # === GATE 1: System Halted ===
         if self.is_halted:
-            return False, "🛑 SYSTEM HALTED: Trading suspended"
+            return "🛑 SYSTEM HALTED: Trading suspended"
+
+        # === GATE 1b: Data Freshness (index + legs, one array comparison) ===
+        if self.staleness is not None:
+            keys = [settings.MARKET_KEY_INDEX] + [leg.instrument_key for leg in trade.legs]
+            stale = self.staleness.stale(settings.STALE_DATA_SEC, keys)
+            if stale:
+                return f"Stale data: {len(stale)} instrument(s) silent > {settings.STALE_DATA_SEC:g}s ({stale[0]})"
 
         # === GATE 2: Drawdown ===
         daily_pnl = getattr(self.risk_mgr, 'daily_pnl', 0.0)
@@ -58,68 +102,119 @@ class MasterSafetyLayer:
         if drawdown_pct > self.max_drawdown_pct:
             self.is_halted = True
             logger.critical(f"🚨 DRAWDOWN HALT: {drawdown_pct*100:.1f}%")
-            return False, f"Drawdown breached: {drawdown_pct*100:.1f}%"
+            return f"Drawdown breached: {drawdown_pct*100:.1f}%"
 
         # === GATE 3: Limits ===
         if self.trades_today >= self.max_trades_per_day:
-            return False, "Daily trade limit reached"
+            return "Daily trade limit reached"
 
         # === GATE 4: Cooldown ===
         time_since_last = datetime.now().timestamp() - self.last_trade_time
         if self.last_trade_time > 0 and time_since_last < self.min_time_between_trades:
-            return False, f"Cooldown: {int(self.min_time_between_trades - time_since_last)}s remaining"
-
-        # === GATE 5: AI Pattern Recognition (BAYESIAN) ===
-        if self.ai_officer:
-            try:
-                market_ctx = {
-                    "vix": current_metrics.get("vix", 0),
-                    "ivp": current_metrics.get("ivp", 0),
-                    "regime": current_metrics.get("regime", "NEUTRAL"),
-                    "atm_iv": current_metrics.get("atm_iv", 0.20),
-                    "realized_vol_7d": current_metrics.get("realized_vol_7d", 15),
-                    "term_structure_spread": current_metrics.get("term_structure_spread", 0),
-                    "volatility_skew": current_metrics.get("volatility_skew", 0),
-                    "atm_theta": current_metrics.get("atm_theta", 0),
-                    "atm_vega": current_metrics.get("atm_vega", 0),
-                }
-                approved, matches, warning = await self.ai_officer.validate_trade(trade, market_ctx)
-                if not approved:
-                    # Require ≥ 3 high-severity patterns AND ≥ 70% confidence before hard veto
-                    high_severity = [m for m in matches if m.get('win_rate', 1) < 0.35 and m.get('n_trades', 0) >= 15]
-                    if len(high_severity) >= 3:
-                        logger.warning(f"🤖 AI HARD VETO: {warning}")
-                        return False, f"AI BLOCK: {warning}"
-                    else:
-                        logger.warning(f"🤖 AI SOFT WARNING: {warning}")  # log but allow
-            except Exception as e:
-                logger.error(f"AI Check Failed: {e}")
-                # Do not block on AI failure – proceed to math checks
+            return f"Cooldown: {int(self.min_time_between_trades - time_since_last)}s remaining"
 
         # === GATE 6: Lifecycle ===
         allowed, reason = self.lifecycle_mgr.can_enter_new_trade(trade.expiry_date, trade.expiry_type)
         if not allowed:
-            return False, f"Lifecycle: {reason}"
+            return f"Lifecycle: {reason}"
+
+        # === GATE 7: Greeks, GATE 7b: Tail Risk (cached Monte Carlo ES) ===
+        return self._greek_confidence_gate(trade, current_metrics) or self._tail_risk_gate(trade, current_metrics)
 
-        # === GATE 7: Greeks ===
+    def _greek_confidence_gate(self, trade: MultiLegTrade, current_metrics: Dict[str, Any]) -> Optional[str]:
         for leg in trade.legs:
-            greeks = current_metrics.get("greeks_cache", {}).get(leg.instrument_key, {})
-            confidence = greeks.get("confidence_score", 0.0)
+            if self.greek_scorer is not None:
+                confidence = self.greek_scorer.score(leg.instrument_key)
+            else:
+                greeks = current_metrics.get("greeks_cache", {}).get(leg.instrument_key, {})
+                confidence = greeks.get("confidence_score", 0.0)
             if confidence > 0 and confidence < self.min_greek_confidence:
-                return False, f"Low Greek Confidence: {confidence}"
+                return f"Low Greek Confidence: {confidence}"
+        return None
+
+    def _tail_risk_gate(self, trade: MultiLegTrade, current_metrics: Dict[str, Any]) -> Optional[str]:
+        spot = current_metrics.get("spot_price", 0.0)
+        if not spot or not hasattr(self.risk_mgr, "check_tail_risk"):
+            return None
+        try:
+            ok, reason = self.risk_mgr.check_tail_risk(trade, spot)
+            if not ok:
+                return f"Tail Risk: {reason}"
+        except Exception as e:
+            logger.error(f"Tail Risk Check Failed: {e}")
+        return None
+
+    async def _run_concurrent(self, gates: Dict[str, Awaitable], budget_sec: float,
+                              timings: Dict[str, float]) -> Dict[str, Optional[str]]:
+        """
+        Runs gates side by side; anything still pending at the deadline is cancelled.
+        A late gate counts as passed only if it is in FAIL_OPEN_GATES (advisory AI);
+        any other (margin) rejects the trade.
+        """
+        if not gates:
+            return {}
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(self._timed(name, coro, timings)): name for name, coro in gates.items()}
+        done, pending = await asyncio.wait(tasks, timeout=budget_sec)
+        verdicts = {tasks[t]: t.result() for t in done}
+        for task in pending:
+            task.cancel()
+            name = tasks[task]
+            timings[name] = (time.perf_counter() - started) * 1000
+            if name in self.FAIL_OPEN_GATES:
+                logger.warning(f"⏱️ Gate '{name}' exceeded {budget_sec*1000:.0f} ms budget – skipped")
+            else:
+                logger.error(f"⏱️ Gate '{name}' exceeded {budget_sec*1000:.0f} ms budget – rejecting")
+                verdicts[name] = f"{name.title()} check timed out ({budget_sec*1000:.0f} ms)"
+        return verdicts
 
+    @staticmethod
+    async def _timed(name: str, coro: Awaitable, timings: Dict[str, float]) -> Optional[str]:
+        t0 = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = (time.perf_counter() - t0) * 1000
+
+    async def _ai_gate(self, trade: MultiLegTrade, current_metrics: Dict[str, Any]) -> Optional[str]:
+        # === GATE 5: AI Pattern Recognition (BAYESIAN) ===
+        try:
+            market_ctx = {
+                "vix": current_metrics.get("vix", 0),
+                "ivp": current_metrics.get("ivp", 0),
+                "regime": current_metrics.get("regime", "NEUTRAL"),
+                "atm_iv": current_metrics.get("atm_iv", 0.20),
+                "realized_vol_7d": current_metrics.get("realized_vol_7d", 15),
+                "term_structure_spread": current_metrics.get("term_structure_spread", 0),
+                "volatility_skew": current_metrics.get("volatility_skew", 0),
+                "atm_theta": current_metrics.get("atm_theta", 0),
+                "atm_vega": current_metrics.get("atm_vega", 0),
+            }
+            approved, matches, warning = await self.ai_officer.validate_trade(trade, market_ctx)
+            if not approved:
+                # Require ≥ 3 high-severity patterns AND ≥ 70% confidence before hard veto
+                high_severity = [m for m in matches if m.get('win_rate', 1) < 0.35 and m.get('n_trades', 0) >= 15]
+                if len(high_severity) >= 3:
+                    logger.warning(f"🤖 AI HARD VETO: {warning}")
+                    return f"AI BLOCK: {warning}"
+                else:
+                    logger.warning(f"🤖 AI SOFT WARNING: {warning}")  # log but allow
+        except Exception as e:
+            logger.error(f"AI Check Failed: {e}")
+            # Do not block on AI failure – proceed to math checks
+        return None
+
+    async def _margin_gate(self, trade: MultiLegTrade, current_metrics: Dict[str, Any]) -> Optional[str]:
         # === GATE 8: Margin ===
-        if self.margin_guard:
-            try:
-                vix = current_metrics.get("vix", 20.0)
-                ok, req = await self.margin_guard.is_margin_ok(trade, vix)
-                if not ok:
-                    return False, f"Insufficient Margin: Need {req:,.0f}"
-            except Exception:
-                pass
-
-        logger.info(f"✅ ALL GATES PASSED for {trade.id}")
-        return True, "Approved"
+        try:
+            vix = current_metrics.get("vix", 20.0)
+            ok, req = await self.margin_guard.is_margin_ok(trade, vix, current_metrics.get("spot_price"))
+            if not ok:
+                return f"Insufficient Margin: Need {req:,.0f}"
+        except Exception as e:
+            logger.error(f"Margin Check Failed: {e}")
+            return f"Margin check failed: {e}"
+        return None
 
     def post_trade_update(self, trade_executed: bool):
         if trade_executed:
@@ -11,15 +11,21 @@ class Settings(BaseSettings):
     # TRADING CONFIG
     ALGO_TAG: str = "VOLGUARD_PROD"
     MARKET_KEYS: list[str] = ["NSE_INDEX|Nifty 50", "NSE_INDEX|India VIX"]
+    MARKET_KEY_INDEX: str = "NSE_INDEX|Nifty 50"  # index the monitor's move trigger and health follow
     ACCOUNT_SIZE: float = 2000000.0  # 20 Lakhs
     
     # LIMITS
     MAX_CAPITAL_PER_TRADE: float = 500000.0
     DAILY_LOSS_LIMIT: float = 50000.0  # Hard stop at 50k loss
+    MAX_TRADE_LOSS: float = 25000.0  # Per-trade stop, checked on every triggering tick
     
     # TIMING (Seconds)
     ANALYTICS_INTERVAL: int = 60
     MONITOR_INTERVAL: int = 5
+    MONITOR_LEG_TRIGGER_PCT: float = 0.02     # re-run risk when a leg moves 2%
+    MONITOR_INDEX_TRIGGER_PCT: float = 0.001  # ...or the index moves 0.1%
+    STALE_DATA_SEC: float = 5.0               # no tick for this long = stale (market health)
+    TICK_RECORD: bool = False                 # record raw ticks to TICK_RECORD_DIR (infra.tick_recorder)
 
     class Config:
         env_file = ".env"
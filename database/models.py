@@ -5,12 +5,14 @@ VolGuard 20.0 – Database Models (Fortress Edition)
 - Includes Margin History for Sanity Checks
 - Includes Market Snapshot for Quant Dashboard
 - Includes Historical Candles for Data Persistence (NEW)
+- Includes Intraday Candles aggregated from the live feed
+- Includes Option Chain Snapshots (keyframe + XOR delta, binary payload)
 """
 from __future__ import annotations
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from sqlalchemy import (
-    Integer, String, Float, DateTime, ForeignKey, JSON, Date, Boolean,
+    Integer, String, Float, DateTime, ForeignKey, JSON, Date, Boolean, LargeBinary,
     UniqueConstraint, Index,
 )
 from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
@@ -89,6 +91,7 @@ class DbMarginHistory(Base):
     strategy_type: Mapped[str] = mapped_column(String, nullable=False)
     lots: Mapped[int] = mapped_column(Integer, default=1)
     required_margin: Mapped[float] = mapped_column(Float, nullable=False)
+    estimated_margin: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # local model, per lot
     vix_at_calc: Mapped[float] = mapped_column(Float)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
@@ -135,6 +138,29 @@ class DbHistoricalCandle(Base):
     # Metadata
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+class DbIntradayCandle(Base):
+    """
+    Intraday bars built from the live feed (BarAggregator), flushed in bulk.
+    bar_start is naive IST, like the rest of the intraday timestamps.
+    """
+    __tablename__ = "intraday_candles"
+    __table_args__ = (
+        UniqueConstraint("instrument_key", "interval_min", "bar_start", name="uq_intraday_bar"),
+        Index("ix_intraday_instrument_interval_start", "instrument_key", "interval_min", "bar_start"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    instrument_key: Mapped[str] = mapped_column(String, nullable=False)
+    interval_min: Mapped[int] = mapped_column(Integer, nullable=False)
+    bar_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    open: Mapped[float] = mapped_column(Float)
+    high: Mapped[float] = mapped_column(Float)
+    low: Mapped[float] = mapped_column(Float)
+    close: Mapped[float] = mapped_column(Float)
+    volume: Mapped[float] = mapped_column(Float, default=0.0)
+    oi: Mapped[float] = mapped_column(Float, default=0.0)
+    ticks: Mapped[int] = mapped_column(Integer, default=0)
+
 # --- PROCESS COMMUNICATION ---
 class DbRiskState(Base):
     __tablename__ = "risk_state"
@@ -179,4 +205,27 @@ class DbMarketSnapshot(Base):
     straddle_cost_monthly: Mapped[float] = mapped_column(Float)
     breakeven_lower: Mapped[float] = mapped_column(Float)
     breakeven_upper: Mapped[float] = mapped_column(Float)
-    chain_json: Mapped[List[Dict[str, Any]]] = mapped_column(JSON)
+    # Legacy full-chain copy; intraday chain history lives in chain_snapshots
+    chain_json: Mapped[Optional[List[Dict[str, Any]]]] = mapped_column(JSON, nullable=True)
+
+class DbChainSnapshot(Base):
+    """
+    One option chain fetch (trading.chain_store). Keyframes carry the contract
+    universe and the full value matrix; deltas carry only the XOR against the
+    previous fetch. timestamp is naive IST.
+    """
+    __tablename__ = "chain_snapshots"
+    __table_args__ = (
+        Index("ix_chain_snapshot_stream_ts", "underlying_key", "expiry", "timestamp"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    underlying_key: Mapped[str] = mapped_column(String, nullable=False)
+    expiry: Mapped[str] = mapped_column(String, nullable=False)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    seq: Mapped[int] = mapped_column(Integer, default=0)  # fetches since the keyframe (0 = keyframe)
+    is_keyframe: Mapped[bool] = mapped_column(Boolean, default=False)
+    spot_price: Mapped[float] = mapped_column(Float, default=0.0)
+    n_contracts: Mapped[int] = mapped_column(Integer, default=0)
+    universe: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Binary Tick Recorder
+- Every decoded tick becomes one fixed 44-byte record (RECORD_DTYPE) in
+  ticks_YYYYMMDD.bin, one file per IST trading day.
+- The callback thread only copies the tick into a preallocated batch; full
+  batches go to a writer thread (recycled buffers, no per-tick allocation).
+- Instrument ids are per file; ticks_YYYYMMDD.keys.json maps id -> key.
+- TickFile memory-maps a day as a NumPy structured array (zero parse).
+- A restart mid-day first trims a torn trailing record (crash mid-write), so
+  appends stay aligned to RECORD_DTYPE.itemsize.
+- Opt-in: startup.py only builds a recorder when TICK_RECORD is set.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger("TickRecorder")
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),       # local receive time (epoch seconds)
+    ("iid", "<u4"),      # instrument id within the file
+    ("ltp", "<f8"),
+    ("ltt", "<i8"),      # exchange last-trade time (epoch ms)
+    ("volume", "<i8"),
+    ("oi", "<f8"),
+])  # packed: 44 bytes
+
+BATCH_SIZE = 4096
+SECONDS_PER_DAY = 86400
+
+
+class TickRecorder:
+    def __init__(self, directory: Optional[str] = None, batch_size: int = BATCH_SIZE,
+                 flush_sec: float = 1.0):
+        self.dir = Path(directory or settings.TICK_RECORD_DIR)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self._lock = threading.Lock()
+        self._free: "queue.SimpleQueue[np.ndarray]" = queue.SimpleQueue()
+        self._full: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._buf = np.zeros(batch_size, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._day = ""
+        self._day_end = 0.0
+        self._ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._meta_written: Dict[str, int] = {}
+        self._aligned_days: set = set()
+        self.records_written = 0
+        self.dropped = 0
+
+    # --- Callback thread ---
+    def _roll_day(self, ts: float):
+        if self._n:
+            self._hand_off()
+        local = datetime.fromtimestamp(ts, settings.IST)
+        self._day = local.strftime("%Y%m%d")
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        self._day_end = midnight + SECONDS_PER_DAY
+        self._ids, self._keys = {}, []
+        path = self._keys_path(self._day)
+        if path.exists():
+            # Restart mid-day: keep appending with the same ids
+            self._keys = json.loads(path.read_text())["keys"]
+            self._ids = {k: i for i, k in enumerate(self._keys)}
+
+    def _hand_off(self):
+        self._full.put((self._buf, self._n, self._day, self._keys, len(self._keys)))
+        try:
+            self._buf = self._free.get_nowait()
+        except queue.Empty:
+            self._buf = np.zeros(self.batch_size, dtype=RECORD_DTYPE)
+        self._n = 0
+
+    def record(self, key: str, ts: float, ltp: float, ltt: int = 0, volume: int = 0, oi: float = 0.0):
+        with self._lock:
+            if ts >= self._day_end:
+                self._roll_day(ts)
+            iid = self._ids.get(key)
+            if iid is None:
+                iid = self._ids[key] = len(self._keys)
+                self._keys.append(key)
+            self._buf[self._n] = (ts, iid, ltp, ltt, volume, oi)
+            self._n += 1
+            if self._n == self.batch_size:
+                self._hand_off()
+
+    def record_many(self, ticks: Dict[str, float], ts: Optional[float] = None):
+        """{key: ltp} as MarketWebSocket delivers it."""
+        now = time.time() if ts is None else ts
+        for key, ltp in ticks.items():
+            try:
+                self.record(key, now, float(ltp))
+            except (TypeError, ValueError):
+                self.dropped += 1
+
+    # --- Writer thread ---
+    def _bin_path(self, day: str) -> Path:
+        return self.dir / f"ticks_{day}.bin"
+
+    def _keys_path(self, day: str) -> Path:
+        return self.dir / f"ticks_{day}.keys.json"
+
+    @staticmethod
+    def _align(path: Path):
+        """Drops a partial trailing record left by a crash, before anything is appended."""
+        if not path.exists():
+            return
+        size = path.stat().st_size
+        whole = size // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+        if whole != size:
+            os.truncate(path, whole)
+            logger.warning(f"Trimmed {size - whole} torn bytes from {path.name}")
+
+    def _write(self, item):
+        buf, n, day, keys, n_keys = item
+        try:
+            if day not in self._aligned_days:
+                # Writer thread is the only one touching the files: no race with appends
+                self._align(self._bin_path(day))
+                self._aligned_days.add(day)
+            if self._meta_written.get(day) != n_keys:
+                # Key map first: a reader never sees an id it cannot resolve
+                meta = self._keys_path(day)
+                tmp = meta.with_suffix(".tmp")
+                tmp.write_text(json.dumps({"dtype": RECORD_DTYPE.descr, "keys": keys[:n_keys]}))
+                os.replace(tmp, meta)
+                self._meta_written[day] = n_keys
+            with open(self._bin_path(day), "ab") as f:
+                f.write(buf[:n].tobytes())
+            self.records_written += n
+        except Exception as e:
+            self.dropped += n
+            logger.error(f"Tick write failed ({n} records): {e}")
+        finally:
+            if len(buf) == self.batch_size:
+                self._free.put(buf)
+
+    def _run(self):
+        while True:
+            try:
+                self._write(self._full.get(timeout=self.flush_sec))
+                continue
+            except queue.Empty:
+                pass
+            # Quiet period: push the partial batch so files trail live by <= flush_sec
+            with self._lock:
+                if self._n:
+                    self._hand_off()
+            if self._stop.is_set() and self._full.empty():
+                return
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="TickRecorder")
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._lock:
+            if self._n:
+                self._hand_off()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        while not self._full.empty():
+            self._write(self._full.get_nowait())
+
+
+class TickFile:
+    """
+    Read-only view of one recorded day. `data` is an np.memmap over the file;
+    a torn trailing record (crash mid-write) is ignored.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        meta = self.path.with_name(self.path.name.replace(".bin", ".keys.json"))
+        self.keys: List[str] = json.loads(meta.read_text())["keys"] if meta.exists() else []
+        n = self.path.stat().st_size // RECORD_DTYPE.itemsize
+        self.data = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", shape=(n,)) if n else \
+            np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def id_of(self, key: str) -> Optional[int]:
+        try:
+            return self.keys.index(key)
+        except ValueError:
+            return None
+
+    def ticks(self, key: str) -> np.ndarray:
+        """All records of one instrument (a copy; the mask selects rows)."""
+        iid = self.id_of(key)
+        if iid is None:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return self.data[self.data["iid"] == iid]
+
+    def between(self, start_ts: float, end_ts: float) -> np.ndarray:
+        """Zero-copy slice by receive time (records are appended in time order)."""
+        ts = self.data["ts"]
+        lo, hi = np.searchsorted(ts, [start_ts, end_ts])
+        return self.data[lo:hi]
+
+
+def recorded_days(directory: Optional[str] = None) -> List[str]:
+    d = Path(directory or settings.TICK_RECORD_DIR)
+    return sorted(p.stem.split("_")[1] for p in d.glob("ticks_*.bin"))
+
+
+def open_days(start: str, end: str, directory: Optional[str] = None) -> Iterator[TickFile]:
+    """TickFile per recorded day in [start, end] (YYYYMMDD)."""
+    d = Path(directory or settings.TICK_RECORD_DIR)
+    for day in recorded_days(directory):
+        if start <= day <= end:
+            yield TickFile(str(d / f"ticks_{day}.bin"))
@@ -1,2 +1,127 @@
-def pnl_attribution(prev, curr, greeks):
-    return {"residual": curr.get("pnl", 0)} # Placeholder for complex attribution
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+COMPONENTS = ("delta", "gamma", "vega", "theta", "residual")
+SECONDS_PER_DAY = 86400.0
+
+@dataclass
+class LegState:
+    """
+    One snapshot of every leg as columns (signed qty, short < 0).
+    Greeks follow the pricing conventions: against spot, theta per day,
+    vega per vol point; iv is decimal (0.14). `keys` names the legs in
+    column order, so a swapped leg is told apart from an unchanged book.
+    """
+    qty: np.ndarray
+    price: np.ndarray
+    iv: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    theta: np.ndarray
+    spot: float
+    ts: float  # epoch seconds
+    keys: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_arrays(cls, qty: ArrayLike, price: ArrayLike, iv: ArrayLike, delta: ArrayLike, gamma: ArrayLike,
+                    vega: ArrayLike, theta: ArrayLike, spot: float, ts: float,
+                    keys: Optional[Sequence[str]] = None) -> "LegState":
+        def col(v):
+            return np.atleast_1d(np.asarray(v, dtype=np.float64))
+        return cls(col(qty), col(price), col(iv), col(delta), col(gamma), col(vega), col(theta),
+                   float(spot), float(ts), None if keys is None else tuple(keys))
+
+    def same_legs(self, other: "LegState") -> bool:
+        """Same legs (keys when both snapshots carry them) with the same quantities."""
+        if len(self.qty) != len(other.qty) or self.keys != other.keys:
+            return False
+        return bool(np.array_equal(self.qty, other.qty))
+
+
+def attribute_legs(prev: LegState, curr: LegState) -> Dict[str, np.ndarray]:
+    """
+    PURE LOGIC: Per-leg P&L between two snapshots, split by first-order Greeks
+    taken at `prev` (Taylor explain). Residual = actual - explained, so the
+    components always sum to the leg's real P&L.
+    """
+    qty = prev.qty
+    ds = curr.spot - prev.spot
+    dt_days = (curr.ts - prev.ts) / SECONDS_PER_DAY
+    out = {
+        "delta": qty * prev.delta * ds,
+        "gamma": qty * 0.5 * prev.gamma * ds * ds,
+        "vega": qty * prev.vega * (curr.iv - prev.iv) * 100.0,
+        "theta": qty * prev.theta * dt_days,
+    }
+    total = qty * (curr.price - prev.price)
+    out["residual"] = total - (out["delta"] + out["gamma"] + out["vega"] + out["theta"])
+    out["total"] = total
+    return out
+
+
+def pnl_attribution(prev: Dict, curr: Dict, greeks: Dict) -> Dict[str, float]:
+    """
+    Book-level attribution from two dict snapshots ({'spot', 'price', 'iv', 'ts'})
+    and the Greeks at `prev` ({'qty', 'delta', 'gamma', 'vega', 'theta'}).
+    Snapshots without leg prices fall back to an unexplained P&L change.
+    """
+    if "price" not in curr or "price" not in prev:
+        residual = float(curr.get("pnl", 0)) - float(prev.get("pnl", 0))
+        return {**{c: 0.0 for c in COMPONENTS[:-1]}, "residual": residual, "total": residual}
+    a = LegState.from_arrays(greeks.get("qty", 1.0), prev["price"], prev.get("iv", 0.0), greeks.get("delta", 0.0),
+                             greeks.get("gamma", 0.0), greeks.get("vega", 0.0), greeks.get("theta", 0.0),
+                             prev.get("spot", 0.0), prev.get("ts", 0.0))
+    b = LegState.from_arrays(a.qty, curr["price"], curr.get("iv", prev.get("iv", 0.0)), a.delta, a.gamma,
+                             a.vega, a.theta, curr.get("spot", a.spot), curr.get("ts", a.ts))
+    return {k: float(v.sum()) for k, v in attribute_legs(a, b).items()}
+
+
+class IntradayAttribution:
+    """
+    Cumulative attribution for the session. Only the last LegState is kept;
+    each step appends one row of book-level increments to a growing array,
+    so the series costs 6 floats per step regardless of leg count.
+    """
+    def __init__(self, capacity: int = 4096):
+        self._rows = np.zeros((capacity, len(COMPONENTS) + 1))  # ts + components
+        self._n = 0
+        self.last: Optional[LegState] = None
+        self.totals = np.zeros(len(COMPONENTS))
+
+    def reset(self, state: Optional[LegState] = None):
+        self._n = 0
+        self.totals[:] = 0.0
+        self.last = state
+
+    def step(self, state: LegState) -> Dict[str, float]:
+        """Attributes last -> state. A leg set or quantity change just re-bases."""
+        prev, self.last = self.last, state
+        if prev is None or not prev.same_legs(state):
+            return {}
+        legs = attribute_legs(prev, state)
+        inc = np.array([legs[c].sum() for c in COMPONENTS])
+        self.totals += inc
+        if self._n == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.zeros_like(self._rows)])
+        self._rows[self._n, 0] = state.ts
+        self._rows[self._n, 1:] = inc
+        self._n += 1
+        return dict(zip(COMPONENTS, inc.tolist()))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def series(self) -> Dict[str, np.ndarray]:
+        """{'ts': ..., 'delta': cumulative, ...} over the session."""
+        rows = self._rows[:self._n]
+        cum = np.cumsum(rows[:, 1:], axis=0)
+        out = {"ts": rows[:, 0].copy()}
+        out.update({c: cum[:, i] for i, c in enumerate(COMPONENTS)})
+        return out
+
+    def summary(self) -> Dict[str, float]:
+        return dict(zip(COMPONENTS, self.totals.tolist()))
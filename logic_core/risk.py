@@ -1,4 +1,5 @@
-from typing import Optional, Dict
+import numpy as np
+from typing import Optional, Dict, List, Tuple, Union, Sequence
 
 class RiskValidator:
     """PURE LOGIC: Validates a proposed trade against constraints."""
@@ -15,3 +16,46 @@ class RiskValidator:
             return f"DELTA_BREACH: {net_delta:.1f} > {max_delta:.1f}"
             
         return None # Safe
+
+    @staticmethod
+    def greeks_arrays(proposals: Sequence[Dict]) -> Dict[str, np.ndarray]:
+        """[{'greeks': {...}}, ...] -> {'delta': array} (a missing delta counts as 0)."""
+        return {
+            'delta': np.fromiter((p.get('greeks', {}).get('delta', 0) for p in proposals),
+                                 dtype=np.float64, count=len(proposals))
+        }
+
+    @staticmethod
+    def check_batch_limits(trade_greeks: Dict[str, Union[np.ndarray, List[float]]], portfolio_greeks: Dict,
+                           limits: Dict, regime_allowance: float) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """
+        Vectorized check_trade_limits for N proposals (strategy search): same net
+        delta rule and messages. Returns an allow vector and the breach per
+        proposal (None where allowed). All columns must have the same length.
+        """
+        lengths = {k: len(v) for k, v in trade_greeks.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"Greek columns differ in length: {lengths}")
+        n = next(iter(lengths.values()), 0)
+        deltas = np.asarray(trade_greeks.get('delta', np.zeros(n)), dtype=np.float64)
+        net_delta = np.abs(portfolio_greeks.get('delta', 0) + deltas)
+        max_delta = limits.get('MAX_DELTA', 100) * regime_allowance
+
+        allowed = ~(net_delta > max_delta)
+        reasons: List[Optional[str]] = [None] * n
+        for i in np.flatnonzero(~allowed):
+            reasons[i] = f"DELTA_BREACH: {net_delta[i]:.1f} > {max_delta:.1f}"
+        return allowed, reasons
+
+def evaluate_trade_risk(trade_state, max_loss: Optional[float] = None,
+                        max_drawdown: Optional[float] = None) -> Optional[str]:
+    """PURE LOGIC: Exit reason for the live trade, or None while it is inside its limits."""
+    if trade_state is None:
+        return None
+    pnl = float(getattr(trade_state, "pnl", 0.0) or 0.0)
+    if max_loss is not None and pnl < -max_loss:
+        return f"MAX_LOSS: {pnl:.0f} < {-max_loss:.0f}"
+    drawdown = float(getattr(trade_state, "max_drawdown", 0.0) or 0.0)
+    if max_drawdown is not None and drawdown > max_drawdown:
+        return f"MAX_DRAWDOWN: {drawdown:.0f} > {max_drawdown:.0f}"
+    return None
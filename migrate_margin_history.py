@@ -0,0 +1,28 @@
+import asyncio
+import os
+import sys
+
+from sqlalchemy import inspect, text
+
+sys.path.append(os.getcwd())
+from database.manager import HybridDatabaseManager
+
+# margin_history.estimated_margin (local estimator, per lot) was added after the
+# table went live; create_all never alters an existing table.
+COLUMN = "estimated_margin"
+
+def _has_column(conn) -> bool:
+    return any(c["name"] == COLUMN for c in inspect(conn).get_columns("margin_history"))
+
+async def migrate():
+    print("Migrating margin_history...")
+    db = HybridDatabaseManager()
+    await db.init_db()
+    async with db.engine.begin() as conn:
+        if await conn.run_sync(_has_column):
+            print(f"✅ margin_history.{COLUMN} already present.")
+            return
+        await conn.execute(text(f"ALTER TABLE margin_history ADD COLUMN {COLUMN} DOUBLE PRECISION"))
+    print(f"✅ margin_history.{COLUMN} added.")
+
+if __name__ == "__main__": asyncio.run(migrate())
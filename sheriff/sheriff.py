@@ -1,5 +1,6 @@
 import logging
-from typing import Tuple, Dict, Any
+import numpy as np
+from typing import Tuple, Dict, Any, List, Union, Sequence
 from logic_core.analytics import MarketState
 from logic_core.regime import RegimeDecision, RegimeClassifier
 from logic_core.risk import RiskValidator
@@ -35,6 +36,30 @@ class Sheriff:
             
         return True, "AUTHORIZED", regime
 
+    def assess_trades(self, market_state: MarketState, portfolio_state: Dict,
+                      proposals: Union[Sequence[Dict], Dict[str, np.ndarray]]
+                      ) -> Tuple[np.ndarray, List[str], RegimeDecision]:
+        """
+        Batch assess_trade for strategy search: the regime is classified once and
+        all N proposals are checked as arrays. `proposals` is either a list of
+        proposal dicts or column arrays {'delta': [...]}.
+        """
+        regime = RegimeClassifier.classify(market_state)
+        greeks = proposals if isinstance(proposals, dict) else RiskValidator.greeks_arrays(proposals)
+        n = max((len(v) for v in greeks.values()), default=0)
+
+        if regime.name == "CASH":
+            return np.zeros(n, dtype=bool), [f"REGIME_BLOCK: {regime.reasons}"] * n, regime
+
+        allowed, errors = RiskValidator.check_batch_limits(
+            trade_greeks=greeks,
+            portfolio_greeks=portfolio_state.get('greeks', {}),
+            limits=self.config.get('RISK_LIMITS', {}),
+            regime_allowance=regime.allowed_exposure_pct
+        )
+        reasons = [err or "AUTHORIZED" for err in errors]
+        return allowed, reasons, regime
+
     def check_system_health(self, heartbeat_age: float, error_count: int) -> bool:
         if heartbeat_age > 30: 
             logger.critical("SHERIFF: System Heartbeat Lost")
@@ -29,12 +29,23 @@ class VolGuardStartup:
         orchestrator = ExecutionOrchestrator(rest_client, sheriff, settings.ALGO_TAG)
 
         # 3. WebSockets
-        market_ws = MarketWebSocket(settings.UPSTOX_ACCESS_TOKEN, settings.MARKET_KEYS, ws_state)
+        recorder = None
+        if settings.TICK_RECORD:
+            from infra.tick_recorder import TickRecorder
+            recorder = TickRecorder()
+        market_ws = MarketWebSocket(settings.UPSTOX_ACCESS_TOKEN, settings.MARKET_KEYS, ws_state, recorder=recorder)
         market_ws.start()
 
         # 4. Workers
         analytics = AnalyticsWorker(fetcher, orchestrator, ws_state, capital, sheriff)
-        monitor = MonitoringWorker(ws_state, orchestrator, capital)
+        monitor = MonitoringWorker(
+            ws_state, orchestrator, capital,
+            poll_interval=settings.MONITOR_INTERVAL,
+            leg_trigger_pct=settings.MONITOR_LEG_TRIGGER_PCT,
+            index_trigger_pct=settings.MONITOR_INDEX_TRIGGER_PCT,
+            index_key=settings.MARKET_KEY_INDEX,
+            stale_after=settings.STALE_DATA_SEC
+        )
         
         # 5. Launch Threads
         threading.Thread(target=analytics.run, daemon=True).start()
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from trading.api_client import EnhancedUpstoxAPI, TokenExpiredError
+
+
+def _api(chain):
+    api = EnhancedUpstoxAPI("token")
+    api.get_option_chain = chain
+    return api
+
+
+@pytest.mark.asyncio
+async def test_chain_batch_runs_concurrently_and_keeps_partial_failures():
+    running, peak = 0, 0
+
+    async def chain(key, expiry):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        if expiry == "2030-01-09":
+            raise ConnectionError("reset by peer")
+        if key == "BANK":
+            return {"status": "error", "message": "no data"}
+        return {"status": "success", "data": [{"strike_price": 24000, "expiry": expiry}]}
+
+    api = _api(chain)
+    wanted = [("NIFTY", "2030-01-02"), ("NIFTY", "2030-01-09"), ("BANK", "2030-01-02"), ("NIFTY", "2030-01-02")]
+    batch = await api.get_option_chains(wanted)
+
+    assert peak == 3                                         # one call per unique chain, all in flight together
+    assert len(batch.fetches) == 3
+    ok = batch.fetches[("NIFTY", "2030-01-02")]
+    assert ok.ok and ok.data == [{"strike_price": 24000, "expiry": "2030-01-02"}] and ok.latency_ms > 0
+    failed = {(f.instrument_key, f.expiry_date): f.error for f in batch.failed}
+    assert failed == {("NIFTY", "2030-01-09"): "reset by peer", ("BANK", "2030-01-02"): "no data"}
+    assert not batch.complete and batch.get("NIFTY", "2030-01-09") == []
+    assert batch.started_at <= batch.finished_at
+
+
+@pytest.mark.asyncio
+async def test_token_expiry_propagates_out_of_the_batch():
+    async def chain(key, expiry):
+        if key == "BANK":
+            raise TokenExpiredError("Access Token Invalid")
+        return {"status": "success", "data": []}
+
+    with pytest.raises(TokenExpiredError):
+        await _api(chain).get_option_chains([("NIFTY", "2030-01-02"), ("BANK", "2030-01-02")])
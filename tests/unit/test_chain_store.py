@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from trading.chain_store import ChainFrame, ChainSnapshotStore
+
+EXPIRY = "2030-01-31"
+T0 = datetime(2030, 1, 2, 9, 15)
+
+def _chain(t):
+    rows = []
+    for strike in (24000.0, 24050.0, 24100.0):
+        row = {"expiry": EXPIRY, "strike_price": strike, "underlying_key": "NSE_INDEX|Nifty 50",
+               "underlying_spot_price": 24050.0 + t}
+        for side in ("call_options", "put_options"):
+            row[side] = {"instrument_key": f"NSE_FO|{int(strike)}{side[0]}",
+                         "market_data": {"ltp": 100.0 + t + strike / 1000, "oi": 5e4},
+                         "option_greeks": {"iv": 13.0 + 0.01 * t, "delta": 0.5}}
+        rows.append(row)
+    return rows
+
+class _Db:
+    """Captures inserted rows; `fail` makes the INSERT raise after yielding once."""
+    def __init__(self, fail=False):
+        self.fail, self.rows = fail, []
+
+    @asynccontextmanager
+    async def get_session(self):
+        db = self
+        class Session:
+            async def execute(self, stmt, rows):
+                await asyncio.sleep(0)
+                if db.fail:
+                    raise RuntimeError("db down")
+                db.rows.extend(rows)
+        yield Session()
+
+    async def safe_commit(self, session):
+        pass
+
+def _decode(rows):
+    return ChainSnapshotStore.decode([SimpleNamespace(**r) for r in rows])
+
+def test_round_trip_is_bit_exact():
+    store = ChainSnapshotStore(keyframe_every=4)
+    rows = [store.add(_chain(t), EXPIRY, T0 + timedelta(seconds=t)) for t in range(10)]
+    assert [r["seq"] for r in rows] == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+    for t, (ts, frame) in enumerate(_decode(rows)):
+        expected = ChainFrame.from_chain(_chain(t), EXPIRY)
+        assert frame.contracts == expected.contracts
+        assert np.array_equal(frame.values, expected.values, equal_nan=True)
+
+def test_lost_flush_never_decodes_onto_wrong_base():
+    store = ChainSnapshotStore(keyframe_every=100)
+    ok, down = _Db(), _Db(fail=True)
+    store.add(_chain(0), EXPIRY, T0)
+    asyncio.run(store.flush(ok))                       # keyframe persisted
+
+    async def failing_flush_with_concurrent_fetch():
+        store.add(_chain(1), EXPIRY, T0 + timedelta(seconds=1))
+        flush = asyncio.ensure_future(store.flush(down))
+        await asyncio.sleep(0)
+        store.add(_chain(2), EXPIRY, T0 + timedelta(seconds=2))   # encoded against the lost row
+        await flush
+    asyncio.run(failing_flush_with_concurrent_fetch())
+
+    store.add(_chain(3), EXPIRY, T0 + timedelta(seconds=3))
+    asyncio.run(store.flush(ok))
+    decoded = _decode(ok.rows)
+    for ts, frame in decoded:
+        t = int((ts - T0).total_seconds())
+        assert np.array_equal(frame.values, ChainFrame.from_chain(_chain(t), EXPIRY).values, equal_nan=True)
+    assert [int((ts - T0).total_seconds()) for ts, _ in decoded] == [0, 3]
+
+def test_decode_skips_deltas_after_a_gap():
+    store = ChainSnapshotStore(keyframe_every=100)
+    rows = [store.add(_chain(t), EXPIRY, T0 + timedelta(seconds=t)) for t in range(4)]
+    decoded = _decode(rows[:1] + rows[2:])            # row 1 missing
+    assert len(decoded) == 1
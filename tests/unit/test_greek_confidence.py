@@ -0,0 +1,50 @@
+import numpy as np
+
+from analytics.greek_confidence import GreekConfidenceScorer
+from analytics.pricing import black76, chain_to_arrays, forward_from_spot, year_fractions
+from tests.unit.test_pricing import _chain
+
+
+def _consistent_chain():
+    """Broker LTP/Delta generated from the same 14% vol the broker reports."""
+    chain = chain_to_arrays(_chain())
+    t = year_fractions(chain.expiry)
+    g = black76(forward_from_spot(chain.spot, t), chain.strike, t, chain.iv, chain.is_call)
+    chain.ltp, chain.delta = g.price, g.delta
+    return chain
+
+def test_divergent_tick_drops_below_gate_only_for_that_contract():
+    scorer = GreekConfidenceScorer(tolerance_pct=15.0, smoothing=1.0, capacity=4)
+    chain = _consistent_chain()
+    assert scorer.load_chain(chain) > 0
+    assert scorer.score("NSE_FO|24000CE") > 0.99
+    assert scorer.score("UNKNOWN") == 0.0
+
+    ce = chain.keys.index("NSE_FO|24000CE")
+    scorer.on_ticks(["NSE_FO|24000CE"], [chain.ltp[ce] * 1.4])  # LTP implies a much higher vol
+    assert scorer.score("NSE_FO|24000CE") < 0.6
+    assert scorer.score("NSE_FO|24000PE") > 0.99
+    assert scorer.low_confidence() == ["NSE_FO|24000CE"]
+
+def test_spot_is_tracked_per_underlying_and_deltas_compare_at_snapshot():
+    """A NIFTY rally re-solves NIFTY contracts at the new spot and leaves BANKNIFTY alone."""
+    nifty, bank = "NSE_INDEX|Nifty 50", "NSE_INDEX|Nifty Bank"
+    scorer = GreekConfidenceScorer(tolerance_pct=15.0, smoothing=1.0)
+    scorer.load_chain(_consistent_chain(), underlying_key=nifty)
+    bn = chain_to_arrays(_chain(spot=52000.0, strikes=range(51000, 53100, 100), prefix="NSE_FO|BN"))
+    t = year_fractions(bn.expiry)
+    g = black76(forward_from_spot(bn.spot, t), bn.strike, t, bn.iv, bn.is_call)
+    bn.ltp, bn.delta = g.price, g.delta
+    scorer.load_chain(bn, underlying_key=bank)
+    assert set(scorer.underlyings) == {nifty, bank}
+
+    # Spot +2%: the LTP moves with it at an unchanged 14% vol, so nothing diverged
+    spot = 24000.0 * 1.02
+    scorer.on_underlying(spot, nifty)
+    k = 24400.0
+    tk = year_fractions(bn.expiry[:1])
+    ltp = float(black76(forward_from_spot(spot, tk), k, tk, 0.14, True).price[0])
+    bn_ce = bn.keys.index("NSE_FO|BN52000CE")
+    assert scorer.on_ticks(["NSE_FO|24400CE", "NSE_FO|BN52000CE"], [ltp, bn.ltp[bn_ce]]) == 2
+    assert scorer.score("NSE_FO|24400CE") > 0.99
+    assert scorer.score("NSE_FO|BN52000CE") > 0.99
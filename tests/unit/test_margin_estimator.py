@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import numpy as np
+
+from analytics.pricing import black76_price, forward_from_spot, year_fractions
+from core.enums import CapitalBucket, ExpiryType, StrategyType, TradeStatus
+from core.models import GreeksSnapshot, MultiLegTrade, Position
+from trading.margin_estimator import (
+    EXPOSURE_PCT,
+    SCALE_BOUNDS,
+    SCALE_SMOOTHING,
+    SCAN_MOVES,
+    SCAN_VOLS,
+    SCAN_WEIGHTS,
+    VSR,
+    MarginEstimator,
+    price_scan_range,
+)
+
+RATE = 0.065
+SPOT, VIX = 24000.0, 15.0
+
+
+def _leg(key, strike, option_type, qty, iv):
+    return Position(
+        symbol="NIFTY", instrument_key=key, strike=strike, option_type=option_type, quantity=qty,
+        entry_price=100.0, current_price=100.0, entry_time=datetime.now(),
+        current_greeks=GreeksSnapshot(iv=iv),
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+
+def _trade(legs, strategy=StrategyType.IRON_CONDOR):
+    return MultiLegTrade(
+        id="T", legs=legs, strategy_type=strategy, status=TradeStatus.PENDING, entry_time=datetime.now(),
+        expiry_date="2030-01-01", expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+
+def _scan_reference(trade):
+    """Worst weighted loss over the 16 scans, leg by leg, plus exposure on short legs."""
+    t = float(year_fractions("2030-01-01"))
+    psr = price_scan_range(VIX)
+    worst = 0.0
+    for move, vol, weight in zip(SCAN_MOVES, SCAN_VOLS, SCAN_WEIGHTS):
+        loss = 0.0
+        for leg in trade.legs:
+            is_call = leg.option_type == "CE"
+            iv = leg.current_greeks.iv
+            base = black76_price(forward_from_spot(SPOT, t, RATE), leg.strike, t, iv, is_call, RATE)
+            shocked = black76_price(forward_from_spot(SPOT * (1 + psr * move), t, RATE), leg.strike, t,
+                                    iv + VSR * vol, is_call, RATE)
+            loss -= float(shocked - base) * leg.quantity * weight
+        worst = max(worst, loss)
+    short = sum(-leg.quantity for leg in trade.legs if leg.quantity < 0)
+    return worst + EXPOSURE_PCT * SPOT * short
+
+
+def test_raw_estimate_is_the_scan_maximum_plus_exposure():
+    strangle = _trade([_leg("C", 25000, "CE", -75, 0.13), _leg("P", 23000, "PE", -75, 0.16)])
+    condor = _trade([_leg("C", 25000, "CE", -75, 0.13), _leg("P", 23000, "PE", -75, 0.16),
+                     _leg("CW", 25500, "CE", 75, 0.13), _leg("PW", 22500, "PE", 75, 0.18)])
+    est = MarginEstimator(rate=RATE)
+    raw = est.raw_estimates([strangle, condor], SPOT, VIX)
+    assert np.allclose(raw, [_scan_reference(strangle), _scan_reference(condor)], rtol=1e-6)
+    assert raw[1] < raw[0]                                   # wings cap the scan loss
+    assert np.allclose(est.estimate(condor, SPOT, VIX), (raw[1], raw[1]))   # uncalibrated scale is 1
+    assert len(est.raw_estimates([], SPOT, VIX)) == 0
+
+
+def test_history_scales_each_strategy_by_log_ewma():
+    est = MarginEstimator(rate=RATE)
+    rows = [("IRON_CONDOR", 120.0, 100.0), ("IRON_CONDOR", 150.0, 100.0),
+            ("SHORT_STRANGLE", 1000.0, 100.0), ("SHORT_STRANGLE", 0.0, 100.0)]
+    assert est.load_history(rows) == 3                       # zero broker margin skipped
+    first, second = np.log(1.2), np.log(1.5)
+    assert abs(est.scale["IRON_CONDOR"] - np.exp(first + SCALE_SMOOTHING * (second - first))) < 1e-12
+    assert est.scale["SHORT_STRANGLE"] == SCALE_BOUNDS[1]    # 10x ratio clipped
+    assert abs(est.global_scale - np.sqrt(est.scale["IRON_CONDOR"] * SCALE_BOUNDS[1])) < 1e-12
+    assert est.scale_for("JADE_LIZARD") == est.global_scale
+
+    condor = _trade([_leg("C", 25000, "CE", -75, 0.13), _leg("CW", 25500, "CE", 75, 0.13)])
+    required, raw = est.estimate(condor, SPOT, VIX)
+    assert abs(required - raw * est.scale["IRON_CONDOR"]) < 1e-6
+    assert np.allclose(est.estimate_many([condor], SPOT, VIX), [required])
@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from core.enums import CapitalBucket, ExpiryType, StrategyType, TradeStatus
+from core.models import GreeksSnapshot, MultiLegTrade, Position
+from trading.margin_guard import MarginGuard
+
+
+class _FakeAPI:
+    def __init__(self, funds):
+        self.funds = funds
+        self.calls = []
+
+    async def _request_with_retry(self, method, endpoint, **kwargs):
+        self.calls.append(endpoint)
+        if endpoint == "funds_margin":
+            return {"status": "success", "data": {"SEC": {"available_margin": self.funds}}}
+        return {"status": "error"}
+
+def _trade():
+    leg = Position(
+        symbol="NIFTY", instrument_key="K1", strike=24000, option_type="CE", quantity=-75,
+        entry_price=100.0, current_price=100.0, entry_time=datetime.now(),
+        current_greeks=GreeksSnapshot(delta=0.5, gamma=0.001, theta=-5.0, vega=12.0, iv=0.14),
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+    return MultiLegTrade(
+        id="T", legs=[leg], strategy_type=StrategyType.IRON_CONDOR, status=TradeStatus.PENDING,
+        entry_time=datetime.now(), expiry_date="2030-01-01",
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+@pytest.mark.asyncio
+async def test_first_check_awaits_funds_and_refreshes_on_cadence(monkeypatch):
+    from core.config import settings
+    monkeypatch.setattr(settings, "MARGIN_REFRESH_SEC", 30)
+    api = _FakeAPI(funds=1.0)
+    mg = MarginGuard(api)
+    ok, _ = await mg.is_margin_ok(_trade(), 15.0, spot=24000.0)
+    # The decision used the broker's balance, not a default
+    assert not ok and mg.available_margin == 1.0 and api.calls[0] == "funds_margin"
+    assert len(mg._tasks) == 1                               # verify task held until it finishes
+
+    api.funds = 1e9
+    ok, _ = await mg.is_margin_ok(_trade(), 15.0, spot=24000.0)
+    assert not ok and api.calls.count("funds_margin") == 1   # within MARGIN_REFRESH_SEC
+
+    mg.last_funds_refresh -= 31
+    ok, _ = await mg.is_margin_ok(_trade(), 15.0, spot=24000.0)
+    assert ok and api.calls.count("funds_margin") == 2
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert not mg._tasks and "margin_calc" in api.calls
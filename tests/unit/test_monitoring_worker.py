@@ -0,0 +1,107 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from capital.capital_manager import CapitalManager, TradeState
+from core.config import settings
+from websocket.ws_state import WebSocketState
+from workers.monitoring_worker import MonitoringWorker
+
+INDEX_KEY = settings.MARKET_KEY_INDEX
+LEG = {"instrument_token": "NSE_FO|CE", "quantity": 75, "transaction_type": "SELL", "price": 100.0}
+
+
+def _worker():
+    ws_state = WebSocketState()
+    capital = CapitalManager(settings)
+    greeks = {"NSE_FO|CE": {"delta": 0.5, "gamma": 0.001, "vega": 10.0, "theta": -5.0, "iv": 0.14}}
+    return MonitoringWorker(ws_state, None, capital, greeks_cache=greeks), ws_state, capital
+
+def test_heartbeat_attributes_the_active_trade():
+    worker, ws_state, capital = _worker()
+    capital.active_trade = TradeState("T1", "AUTO", [
+        {"instrument_token": "NSE_FO|CE", "quantity": 75, "transaction_type": "SELL", "price": 100.0},
+    ], None)
+    ws_state.update_market({INDEX_KEY: 24000.0, "NSE_FO|CE": {"ltp": 100.0}})
+    worker._record_pnl(ws_state.snapshot())
+    ws_state.update_market({INDEX_KEY: 24010.0, "NSE_FO|CE": {"ltp": 105.0}})
+    worker._record_pnl(ws_state.snapshot())
+
+    summary = capital.system_health()["pnl_attribution"]
+    assert abs(summary["delta"] - (-75 * 0.5 * 10.0)) < 1e-9
+    assert abs(sum(summary.values()) - (-75 * 5.0)) < 1e-9        # components sum to the real P&L
+
+    # A new trade starts its own series
+    capital.active_trade = TradeState("T2", "AUTO", capital.active_trade.legs, None)
+    worker._record_pnl(ws_state.snapshot())
+    assert len(worker.attribution) == 0
+
+
+def _armed_worker(**kwargs):
+    ws_state = WebSocketState()
+    capital = CapitalManager(SimpleNamespace(MAX_TRADE_LOSS=1e9, MARKET_KEY_INDEX=INDEX_KEY))
+    capital.active_trade = TradeState("T1", "AUTO", [LEG], None)
+    worker = MonitoringWorker(ws_state, None, capital, **kwargs)
+    ws_state.update_market({INDEX_KEY: 24000.0, "NSE_FO|CE": {"ltp": 100.0}})
+    return worker, ws_state, capital
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return cond()
+
+def test_tick_wakes_the_worker_only_past_its_move_threshold():
+    worker, ws_state, capital = _armed_worker(leg_trigger_pct=0.02, index_trigger_pct=0.001)
+    assert worker.index_key == INDEX_KEY
+    worker.evaluate(ws_state.snapshot())
+    worker._wake.clear()
+
+    ws_state.update_market({INDEX_KEY: 24020.0})                # 0.08% < 0.1%
+    ws_state.update_market({"NSE_FO|CE": {"ltp": 101.9}})       # 1.9% < 2%
+    ws_state.update_market({"NSE_FO|OTHER": {"ltp": 1.0}})      # not watched
+    assert not worker._wake.is_set()
+
+    ws_state.update_market({INDEX_KEY: 24030.0})                # 0.125% from the armed price
+    assert worker._wake.is_set() and worker.ticks_conflated == 0
+    ws_state.update_market({"NSE_FO|CE": {"ltp": 110.0}})       # already awake: conflated
+    assert worker.ticks_conflated == 1
+
+    # Re-arming moves the reference; a closed trade re-arms on the next tick of any size
+    worker.evaluate(ws_state.snapshot())
+    worker._wake.clear()
+    ws_state.update_market({"NSE_FO|CE": {"ltp": 111.0}})
+    assert not worker._wake.is_set()
+    capital.active_trade = None
+    ws_state.update_market({INDEX_KEY: 24030.5})
+    assert worker._wake.is_set()
+
+def test_burst_during_an_evaluation_collapses_into_one_rerun():
+    worker, ws_state, capital = _armed_worker(poll_interval=60)
+    entered, release, calls = threading.Event(), threading.Event(), []
+
+    def update_positions(positions):
+        calls.append(positions)
+        if len(calls) == 2:                                     # hold the second pass open
+            entered.set()
+            release.wait(2.0)
+
+    capital.update_trade_from_positions = update_positions
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    try:
+        assert _wait_for(lambda: worker.evaluations == 1)
+        ws_state.update_market({"NSE_FO|CE": {"ltp": 103.0}})
+        assert entered.wait(2.0)
+        for ltp in (106.0, 109.0, 112.0):                       # burst while pass 2 runs
+            ws_state.update_market({"NSE_FO|CE": {"ltp": ltp}})
+        assert worker.ticks_conflated == 2
+        release.set()
+        assert _wait_for(lambda: worker.evaluations == 3)
+        time.sleep(0.05)
+        assert worker.evaluations == 3 and worker.last_latency_ms > 0
+    finally:
+        release.set()
+        worker.stop()
+        thread.join(2.0)
+    assert not thread.is_alive()
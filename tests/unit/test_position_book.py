@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from core.enums import CapitalBucket, ExpiryType, StrategyType, TradeStatus
+from core.models import GreeksSnapshot, MultiLegTrade, Position
+from trading.position_book import PositionBook
+
+
+def _leg(key, qty, delta, vega):
+    return Position(
+        symbol="NIFTY", instrument_key=key, strike=24000, option_type="CE", quantity=qty,
+        entry_price=100.0, current_price=100.0, entry_time=datetime.now(),
+        current_greeks=GreeksSnapshot(delta=delta, gamma=0.001, theta=-5.0, vega=vega, iv=14.0),
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+def _trade(tid, legs, status=TradeStatus.OPEN):
+    return MultiLegTrade(
+        id=tid, legs=legs, strategy_type=StrategyType.IRON_CONDOR, status=status,
+        entry_time=datetime.now(), expiry_date="2030-01-01",
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+def test_running_totals_match_full_recompute():
+    book = PositionBook(capacity=2)
+    trades = [_trade("A", [_leg("K1", -75, 0.5, 12.0), _leg("K2", 75, 0.2, 8.0)]),
+              _trade("B", [_leg("K1", -150, 0.5, 12.0)])]
+    book.sync(trades)
+    assert abs(book.delta - sum(t.trade_delta for t in trades)) < 1e-9
+    assert abs(book.vega - sum(t.trade_vega for t in trades)) < 1e-9
+
+    # One tick on K1 touches both trades holding it
+    assert book.update_greeks("K1", 0.6, 0.001, -5.0, 13.0) == 2
+    assert abs(book.delta - (-225 * 0.6 + 75 * 0.2)) < 1e-9
+
+    # Closing a trade releases its slots and its contribution
+    trades[1] = _trade("B", trades[1].legs, status=TradeStatus.CLOSED)
+    book.sync(trades)
+    assert "B" not in book and len(book) == 2
+    assert abs(book.vega - (-75 * 13.0 + 75 * 8.0)) < 1e-9     # A keeps the ticked K1 Greeks
+
+def test_non_finite_greeks_never_reach_totals():
+    """A NaN row (no usable IV) is dropped; the leg keeps its last finite Greeks."""
+    nan = float("nan")
+    book = PositionBook()
+    book.sync([_trade("A", [_leg("K1", -75, 0.5, 12.0), _leg("K2", 75, nan, 8.0)])])
+    assert abs(book.delta - (-75 * 0.5)) < 1e-9
+    assert book.update_greeks("K1", nan, nan, nan, nan, nan) == 0 and book.rejected == 1
+    assert book.update_greeks("K1", 0.6, 0.001, -5.0, float("inf")) == 0
+    assert abs(book.delta - (-75 * 0.5)) < 1e-9 and abs(book.vega - (-75 * 12.0 + 75 * 8.0)) < 1e-9
+    assert book.update_greeks("K2", 0.2, 0.001, -5.0, 8.0, nan) == 1
+    assert abs(book.delta - (-75 * 0.5 + 75 * 0.2)) < 1e-9 and book.iv[book._slots[("A", "K2")]] == 14.0
+
+def test_sync_only_changes_membership_and_feed_listeners_move_the_totals():
+    """Unchanged held legs are not re-read by sync; greeks refreshes and ticks from the feed update them."""
+    from trading.risk_manager import AdvancedRiskManager
+
+    class Feed:
+        def add_greeks_listener(self, cb): self.on_greeks = cb
+        def add_tick_listener(self, cb): self.on_ticks = cb
+
+    feed = Feed()
+    rm = AdvancedRiskManager(None, None).attach_feed(feed)
+    trade = _trade("A", [_leg("K1", -75, 0.5, 12.0)])
+    rm.update_portfolio_state([trade], 0.0)
+    trade.legs[0].current_greeks = GreeksSnapshot(delta=0.9, gamma=0.001, theta=-5.0, vega=12.0, iv=14.0)
+    rm.update_portfolio_state([trade], 0.0)
+    assert abs(rm.portfolio_delta - (-75 * 0.5)) < 1e-9       # sync left the held leg alone
+
+    cache = {"K1": {"delta": 0.6, "gamma": 0.001, "theta": -5.0, "vega": 13.0, "iv": 15.0}, "OTHER": {}}
+    assert feed.on_greeks(["K1", "OTHER", "K9"], cache) == 1
+    assert abs(rm.portfolio_delta - (-75 * 0.6)) < 1e-9 and abs(rm.portfolio_vega - (-75 * 13.0)) < 1e-9
+    feed.on_ticks(["K1", "K9"], [123.0, 1.0])
+    assert rm.book.ltp[rm.book._slots[("A", "K1")]] == 123.0
+
+def test_sync_applies_partial_exits_and_rolls():
+    """A held trade's legs are diffed on (instrument_key, quantity); unchanged legs keep their ticked Greeks."""
+    book = PositionBook()
+    trade = _trade("A", [_leg("K1", -75, 0.5, 12.0), _leg("K2", 75, 0.2, 8.0)])
+    book.sync([trade])
+    assert book.update_greeks("K2", 0.3, 0.001, -5.0, 8.0) == 1
+
+    # Partial exit: K1 goes from -75 to -25
+    trade.legs[0].quantity = -25
+    book.sync([trade])
+    assert abs(book.delta - (-25 * 0.5 + 75 * 0.3)) < 1e-9
+
+    # Roll: K2 is closed and replaced by K3 under the same trade id
+    trade.legs[1] = _leg("K3", 75, 0.1, 6.0)
+    book.sync([trade])
+    assert "K2" not in book.instruments and "K3" in book.instruments and len(book) == 2
+    assert abs(book.delta - (-25 * 0.5 + 75 * 0.1)) < 1e-9
+    assert abs(book.vega - (-25 * 12.0 + 75 * 6.0)) < 1e-9
+
+    # Closing the last quantity of a leg releases it
+    trade.legs[0].quantity = 0
+    book.sync([trade])
+    assert list(book.instruments) == ["K3"] and abs(book.delta - 75 * 0.1) < 1e-9
+    book.resum()
+    assert abs(book.delta - 75 * 0.1) < 1e-9
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from analytics.pricing import GreeksEngine, GreeksRow, black76, implied_vol
+
+RATE = 0.065
+
+def _chain(spot=24000.0, strikes=range(23000, 25050, 50), days=7, prefix="NSE_FO|"):
+    expiry = (date.today() + timedelta(days=days)).isoformat()
+    rows = []
+    for k in strikes:
+        def side(t, k=k):
+            return {
+                "instrument_key": f"{prefix}{k}{t}",
+                "market_data": {"ltp": 100.0, "oi": 1000},
+                "option_greeks": {"iv": 14.0, "delta": 0.5},
+            }
+        rows.append({"strike_price": k, "underlying_spot_price": spot, "expiry": expiry,
+                     "call_options": side("CE"), "put_options": side("PE")})
+    return rows
+
+def test_put_call_parity_and_greek_signs():
+    """C - P = df * (F - K) across the whole strike ladder."""
+    F, t = 24100.0, 0.05
+    K = np.arange(22000, 26050, 50, dtype=float)
+    call = black76(F, K, t, 0.15, True, RATE)
+    put = black76(F, K, t, 0.15, False, RATE)
+    assert np.allclose(call.price - put.price, np.exp(-RATE * t) * (F - K))
+    assert np.all((call.delta > 0) & (put.delta < 0))
+    assert np.allclose(call.gamma, put.gamma)
+    assert np.all(call.vega > 0) and np.all(call.theta < 0)
+
+def test_delta_matches_finite_difference():
+    """Spot delta/gamma must agree with a bumped reprice (broker convention)."""
+    S, K, t, vol = 24000.0, 24100.0, 0.04, 0.13
+
+    def price(s):
+        return black76(s * np.exp(RATE * t), K, t, vol, True, RATE).price
+
+    g = black76(S * np.exp(RATE * t), K, t, vol, True, RATE)
+    assert abs(g.delta - (price(S + 1) - price(S - 1)) / 2) < 1e-6
+    assert abs(g.gamma - (price(S + 1) - 2 * price(S) + price(S - 1))) < 1e-6
+
+def test_engine_fills_cache_and_keeps_foreign_fields():
+    """Refreshing a chain must not wipe fields owned by other components."""
+    cache = {}
+    engine = GreeksEngine(cache, rate=RATE)
+    chain = _chain()
+    assert engine.update_cache(chain, "W") == len(chain) * 2
+    row = cache["NSE_FO|24000CE"]
+    assert isinstance(row, GreeksRow)
+    assert 0.4 < row["delta"] < 0.7 and row["iv"] == 0.14
+    row["confidence_score"] = 0.9
+    before = row["delta"]
+    engine.update_cache(_chain(spot=24200.0), "W")
+    assert cache["NSE_FO|24000CE"]["confidence_score"] == 0.9
+    assert cache["NSE_FO|24000CE"]["delta"] > before
+
+def test_engine_keeps_two_underlyings_on_one_expiry():
+    """NIFTY and BANKNIFTY chains of the same expiry are separate slices."""
+    from analytics.pricing import chain_to_arrays
+    cache = {}
+    engine = GreeksEngine(cache, rate=RATE)
+    nifty = chain_to_arrays(_chain())
+    bank = chain_to_arrays(_chain(spot=52000.0, strikes=range(51000, 53100, 100), prefix="NSE_FO|BN"))
+    expiry = str(nifty.expiry[0])
+    engine.refresh(nifty, ("NSE_INDEX|Nifty 50", expiry))
+    engine.refresh(bank, ("NSE_INDEX|Nifty Bank", expiry))
+    engine.refresh(nifty, ("NSE_INDEX|Nifty 50", expiry))
+    assert set(nifty.keys) | set(bank.keys) == set(cache)
+    assert 0.4 < cache["NSE_FO|BN52000CE"]["delta"] < 0.7
+
+def test_implied_vol_round_trip_whole_ladder():
+    """Batch IV must recover the vol that priced each contract (both sides, two expiries)."""
+    F = 24000.0
+    K = np.repeat(np.arange(22000, 26050, 50, dtype=float), 4)
+    t = np.tile([3 / 365, 3 / 365, 30 / 365, 30 / 365], len(K) // 4)
+    is_call = np.tile([True, False], len(K) // 2)
+    vol = 0.13 + 2.0 * np.log(K / F) ** 2
+    price = black76(F, K, t, vol, is_call, RATE).price
+    iv = implied_vol(price, F, K, t, is_call, RATE)
+    ok = np.isfinite(iv)
+    assert ok.mean() > 0.75  # only deep-ITM 3-day legs (no time value) may drop out
+    assert np.max(np.abs(iv[ok] - vol[ok])) < 1e-4
+    assert np.isnan(implied_vol(1e6, F, 24000.0, 0.05, True, RATE))
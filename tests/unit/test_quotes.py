@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from trading.quote_cache import QuoteCache
+from trading.quote_service import QuoteService
+from trading.staleness import StalenessIndex
+
+
+class _Api:
+    """Echoes a price per requested key; `gate` holds every request until set."""
+    def __init__(self, gate=None):
+        self.gate, self.calls = gate, []
+
+    async def get_market_quote_ltp(self, keys):
+        self.calls.append(keys.split(","))
+        if self.gate is not None:
+            await self.gate.wait()
+        data = {k.replace("|", ":", 1): {"last_price": 100.0 + int(k.split("|")[1]), "instrument_token": k}
+                for k in self.calls[-1] if k != "NSE_FO|404"}
+        return {"status": "success", "data": data}
+
+def test_concurrent_callers_share_one_request():
+    async def run():
+        api = _Api()
+        svc = QuoteService(api, batch_max=500, coalesce_ms=5)
+        a, b = await asyncio.gather(svc.ltp(["NSE_FO|1", "NSE_FO|2"]), svc.ltp(["NSE_FO|2", "NSE_FO|3", "NSE_FO|404"]))
+        return api, svc, a, b
+
+    api, svc, a, b = asyncio.run(run())
+    assert a == {"NSE_FO|1": 101.0, "NSE_FO|2": 102.0}
+    assert b == {"NSE_FO|2": 102.0, "NSE_FO|3": 103.0}          # unknown key is simply absent
+    assert api.calls == [["NSE_FO|1", "NSE_FO|2", "NSE_FO|3", "NSE_FO|404"]]
+    assert svc.requests_sent == 1 and svc.keys_shared == 1 and not svc._inflight
+
+def test_requests_are_chunked_to_the_batch_limit():
+    async def run():
+        api = _Api()
+        svc = QuoteService(api, batch_max=2, coalesce_ms=0)
+        return api, await svc.ltp([f"NSE_FO|{i}" for i in range(5)])
+
+    api, quotes = asyncio.run(run())
+    assert [len(c) for c in api.calls] == [2, 2, 1] and len(quotes) == 5
+
+def test_cancelled_caller_does_not_cancel_the_shared_request():
+    async def run():
+        gate = asyncio.Event()
+        api = _Api(gate)
+        svc = QuoteService(api, coalesce_ms=0)
+        first = asyncio.ensure_future(svc.ltp(["NSE_FO|1"]))
+        second = asyncio.ensure_future(svc.ltp(["NSE_FO|1"]))
+        await asyncio.sleep(0.01)                 # request is in flight
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        gate.set()
+        return api, svc, await second
+
+    api, svc, quotes = asyncio.run(run())
+    assert quotes == {"NSE_FO|1": 101.0}
+    assert len(api.calls) == 1 and not svc._inflight
+
+def test_cancelled_flush_resolves_every_waiting_caller():
+    async def run():
+        api = _Api()
+        svc = QuoteService(api, coalesce_ms=50)
+        callers = [asyncio.ensure_future(svc.ltp(["NSE_FO|1"])),
+                   asyncio.ensure_future(svc.ltp(["NSE_FO|1", "NSE_FO|2"]))]
+        await asyncio.sleep(0.01)                 # flush is coalescing
+        svc._flusher.cancel()
+        done = await asyncio.wait_for(asyncio.gather(*callers), 1.0)
+        return api, svc, done
+
+    api, svc, done = asyncio.run(run())
+    assert done == [{}, {}] and not api.calls
+    assert not svc._inflight and not svc._pending and svc._flusher is None
+
+def test_token_expiry_reaches_every_waiting_caller():
+    from trading.api_client import TokenExpiredError
+
+    class ExpiredApi:
+        async def get_market_quote_ltp(self, keys):
+            raise TokenExpiredError("Access Token Invalid")
+
+    async def run():
+        svc = QuoteService(ExpiredApi(), coalesce_ms=5)
+        results = await asyncio.gather(svc.ltp(["NSE_FO|1"]), svc.ltp(["NSE_FO|1"]), return_exceptions=True)
+        return svc, results
+
+    svc, results = asyncio.run(run())
+    assert all(isinstance(r, TokenExpiredError) for r in results) and not svc._inflight
+
+def test_stale_and_unknown_keys_fall_back_to_rest():
+    clock = {"t": 100.0}
+    staleness = StalenessIndex(capacity=8, clock=lambda: clock["t"])
+    book = {"NSE_FO|1": 1.5, "NSE_FO|2": 2.5}
+    cache = QuoteCache(max_age=2.0).add_source("feed", staleness, book.get)
+    staleness.touch_keys(["NSE_FO|1"], now=99.5)
+    staleness.touch_keys(["NSE_FO|2"], now=90.0)
+
+    quotes, missing = cache.fresh(["NSE_FO|1", "NSE_FO|2", "NSE_FO|3"])
+    assert quotes == {"NSE_FO|1": 1.5}
+    assert missing == ["NSE_FO|2", "NSE_FO|3"]              # stale, never seen
+
+    clock["t"] = 102.0                                       # NSE_FO|1 ages out too
+    api = _Api()
+    quotes = asyncio.run(cache.ltp(["NSE_FO|1", "NSE_FO|2"], rest=QuoteService(api, coalesce_ms=0)))
+    assert quotes == {"NSE_FO|1": 101.0, "NSE_FO|2": 102.0}
+    assert api.calls == [["NSE_FO|1", "NSE_FO|2"]]
+    assert cache.hits == 1 and cache.misses == 4
+
+def test_executor_prices_from_its_live_sources_first():
+    from trading.live_order_executor import LiveOrderExecutor
+    from websocket.ws_state import WebSocketState
+    ws_state = WebSocketState()
+    ws_state.update_market({"NSE_FO|1": {"ltp": 1.5}})
+    api = _Api()
+    api.quotes = QuoteService(api, coalesce_ms=0)
+    executor = LiveOrderExecutor(api, None, ws_state=ws_state)
+    quotes = asyncio.run(executor._fetch_quotes(["NSE_FO|1", "NSE_FO|2"]))
+    assert quotes == {"NSE_FO|1": 1.5, "NSE_FO|2": 102.0}
+    assert api.calls == [["NSE_FO|2"]]
+    assert LiveOrderExecutor(api, None).quote_cache is None
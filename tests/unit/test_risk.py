@@ -51,3 +51,105 @@ async def test_sheriff_kill_switch_logic(mock_upstox):
     """Verify Sheriff logic for triggering flattening."""
     # Keeps the existing passing test
     assert True
+
+def test_trade_limits_empty_trade_checks_portfolio():
+    """No trade Greeks: an already over-limit portfolio is still a delta breach."""
+    from logic_core.risk import RiskValidator
+    reason = RiskValidator.check_trade_limits({}, {"delta": 150}, {}, 1.0)
+    assert reason == "DELTA_BREACH: 150.0 > 100.0"
+    assert RiskValidator.check_trade_limits({}, {}, {}, 1.0) is None
+
+def test_trade_limits_single_trade_is_delta_only():
+    """The single-trade path checks net delta only, whatever other limits are configured."""
+    from logic_core.risk import RiskValidator
+    limits = {"MAX_DELTA": 50, "MAX_VEGA": 1}
+    assert RiskValidator.check_trade_limits({"delta": 10, "vega": 1e6}, {"delta": 30}, limits, 1.0) is None
+    assert RiskValidator.check_trade_limits({"delta": 30}, {"delta": 30}, limits, 0.5) == "DELTA_BREACH: 60.0 > 25.0"
+
+@pytest.mark.asyncio
+async def test_margin_gate_timeout_rejects_ai_timeout_passes(monkeypatch):
+    """A margin check that misses the budget blocks the trade; a late AI check does not."""
+    import asyncio
+    from types import SimpleNamespace
+
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(5)
+
+    lifecycle_mgr = MagicMock()
+    lifecycle_mgr.can_enter_new_trade.return_value = (True, "OK")
+    monkeypatch.setattr(settings, "PRE_TRADE_BUDGET_MS", 20)
+    ai = SimpleNamespace(validate_trade=slow)
+    trade = MultiLegTrade(
+        id="TEST-2", legs=[], strategy_type=StrategyType.IRON_CONDOR,
+        status=TradeStatus.PENDING, entry_time=datetime.now(),
+        expiry_date="2024-01-01", expiry_type=ExpiryType.WEEKLY,
+        capital_bucket=CapitalBucket.WEEKLY
+    )
+
+    safety = MasterSafetyLayer(SimpleNamespace(daily_pnl=0.0), SimpleNamespace(is_margin_ok=slow),
+                               lifecycle_mgr, None, ai)
+    approved, reason = await safety.pre_trade_gate(trade, {})
+    assert approved is False and "timed out" in reason
+
+    safety = MasterSafetyLayer(SimpleNamespace(daily_pnl=0.0), None, lifecycle_mgr, None, ai)
+    approved, reason = await safety.pre_trade_gate(trade, {})
+    assert approved is True and safety.gate_timings["ai"] >= 20
+
+def test_scenario_limit_gates_requested_set_without_latching(monkeypatch):
+    """Only cells inside the gated set count, and a cleared book clears the breach."""
+    import numpy as np
+    from analytics.scenarios import ScenarioResult
+    from trading.risk_manager import AdvancedRiskManager
+    monkeypatch.setattr(settings, "ACCOUNT_SIZE", 1_000_000.0)
+    spot, vol, days = np.linspace(-0.10, 0.10, 5), np.array([0.0, 0.05, 0.15]), np.array([0.0, 1.0, 3.0])
+    pnl = np.zeros((5, 3, 3))
+    pnl[0, 2, 2] = -500_000.0            # extreme corner: -10%, +15 pts, 3 days
+    rm = AdvancedRiskManager(None, None)
+    rm.scenario = ScenarioResult(pnl, spot, vol, days)
+    assert rm.check_portfolio_limits() is False
+    assert rm.check_portfolio_limits(scenario_set=(0.10, 0.15, 3.0)) is True
+
+    pnl[1, 1, 1] = -60_000.0             # -5%, +5 pts, 1 day: inside the default set
+    assert rm.check_portfolio_limits() is True and rm.is_halted is False
+    rm.scenario = ScenarioResult(np.zeros((5, 3, 3)), spot, vol, days)
+    assert rm.check_portfolio_limits() is False
+
+def test_greeks_arrays_fills_missing_delta():
+    from logic_core.risk import RiskValidator
+    cols = RiskValidator.greeks_arrays([{"greeks": {"delta": 5.0}}, {}, {"greeks": {"vega": 3.0}}])
+    assert cols["delta"].tolist() == [5.0, 0.0, 0.0]
+
+def test_batch_limits_match_single_trade_check():
+    """check_batch_limits is check_trade_limits vectorized: same verdicts, same messages."""
+    from logic_core.risk import RiskValidator
+    limits, portfolio = {"MAX_DELTA": 50, "MAX_VEGA": 10, "MAX_GAMMA": 1}, {"delta": 30}
+    trades = [{"delta": 5, "vega": 100}, {"delta": 30}, {"delta": -90, "gamma": 5}, {}]
+    allowed, reasons = RiskValidator.check_batch_limits(
+        RiskValidator.greeks_arrays([{"greeks": t} for t in trades]), portfolio, limits, 0.6
+    )
+    expected = [RiskValidator.check_trade_limits(t, portfolio, limits, 0.6) for t in trades]
+    assert reasons == expected
+    assert allowed.tolist() == [r is None for r in expected]
+
+def test_batch_limits_reject_mismatched_columns():
+    from logic_core.risk import RiskValidator
+    with pytest.raises(ValueError):
+        RiskValidator.check_batch_limits({"delta": [1.0, 2.0, 3.0], "vega": [1.0]}, {}, {}, 1.0)
+
+def test_sheriff_assess_trades_matches_assess_trade():
+    from logic_core.analytics import MarketState
+    from sheriff.sheriff import Sheriff
+    sheriff = Sheriff({"RISK_LIMITS": {"MAX_DELTA": 50}})
+    state = MarketState(spot=24000, vix=15, rv7=12, rv28=13, ivp=50, vrp_score=1.0, pcr=1.0,
+                        max_pain=24000, trend="NEUTRAL", term_structure_slope=0.0)
+    portfolio = {"greeks": {"delta": 20}}
+    proposals = [{"greeks": {"delta": 5, "vega": 100}}, {"greeks": {"delta": 40}}]
+    allowed, reasons, regime = sheriff.assess_trades(state, portfolio, proposals)
+    single = [sheriff.assess_trade(state, portfolio, p) for p in proposals]
+    assert allowed.tolist() == [ok for ok, _, _ in single]
+    assert reasons == [reason for _, reason, _ in single]
+    assert regime.name == single[0][2].name
+
+    cash = MarketState(**{**state.__dict__, "vix": 30})
+    allowed, reasons, _ = sheriff.assess_trades(cash, portfolio, proposals)
+    assert not allowed.any() and all(r.startswith("REGIME_BLOCK") for r in reasons)
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import numpy as np
+
+from analytics.sabr import SABRCalibrator, SmileSlice, hagan_vol
+
+F = 24000.0
+STRIKES = np.arange(21500, 26550, 50, dtype=float)
+NOW = datetime(2026, 10, 16, 10, 0)
+
+def _smile(t, alpha, rho, nu):
+    return SmileSlice(F, t, STRIKES, hagan_vol(F, STRIKES, t, alpha, 1.0, rho, nu))
+
+def test_hagan_is_continuous_through_the_money():
+    """The z/x(z) series branch must join the closed form smoothly at K = F."""
+    K = F * np.array([1 - 1e-5, 1.0, 1 + 1e-5])
+    v = hagan_vol(F, K, 0.05, 0.14, 1.0, -0.3, 1.2)
+    assert np.all(np.isfinite(v)) and np.ptp(v) < 1e-5
+
+def test_calibrator_recovers_parameters_and_warm_starts():
+    cal = SABRCalibrator(max_workers=1, beta=1.0)
+    smiles = {"2026-10-22": _smile(6 / 365, 0.13, -0.35, 1.8),
+              "2026-11-26": _smile(41 / 365, 0.14, -0.25, 0.7)}
+    surface = cal.calibrate(smiles, NOW)
+    p = surface["2026-10-22"]
+    assert abs(p.rho + 0.35) < 1e-3 and abs(p.nu - 1.8) < 1e-2 and p.rmse < 1e-6
+    assert cal.front_params() is p
+    # Second run warm-starts from the published fit and replaces the dict wholesale
+    again = cal.calibrate(smiles, NOW)
+    assert again is cal.surface and again is not surface
+    assert abs(again["2026-11-26"].nu - 0.7) < 1e-2
+
+def test_front_params_filters_by_underlying_and_drops_expired_slices():
+    """Front slice is the nearest live expiry of the requested underlying, never a dead fit."""
+    nifty, bank = "NSE_INDEX|Nifty 50", "NSE_INDEX|Nifty Bank"
+    cal = SABRCalibrator(max_workers=1, beta=1.0)
+    cal.calibrate({(bank, "2026-10-20"): _smile(4 / 365, 0.18, -0.3, 1.5),
+                   (nifty, "2026-10-22"): _smile(6 / 365, 0.13, -0.35, 1.8),
+                   (nifty, "2026-11-26"): _smile(41 / 365, 0.14, -0.25, 0.7)}, NOW)
+    assert cal.front_params() is cal.surface[(nifty, "2026-10-22")]
+    assert cal.front_params(bank) is cal.surface[(bank, "2026-10-20")]
+    # After the weekly expiry only the monthly NIFTY slice is left on the next publish
+    cal.calibrate({}, datetime(2026, 10, 23, 10, 0))
+    assert set(cal.surface) == {(nifty, "2026-11-26")}
+    assert cal.front_params() is cal.surface[(nifty, "2026-11-26")] and cal.front_params(bank) is None
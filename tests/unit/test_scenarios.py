@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+
+from analytics.pricing import black76_price, forward_from_spot, year_fractions
+from analytics.scenarios import BookLegs, legs_from_trades, scenario_grid
+from core.enums import CapitalBucket, ExpiryType, StrategyType, TradeStatus
+from core.models import GreeksSnapshot, MultiLegTrade, Position
+
+RATE = 0.065
+NOW = datetime(2026, 10, 16, 10, 0)
+
+
+def _leg(key, strike, option_type, qty, iv, price=100.0):
+    return Position(
+        symbol="NIFTY", instrument_key=key, strike=strike, option_type=option_type, quantity=qty,
+        entry_price=price, current_price=price, entry_time=NOW,
+        current_greeks=GreeksSnapshot(iv=iv),
+        expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+
+def _trade(tid, legs, expiry="2026-10-22", status=TradeStatus.OPEN):
+    return MultiLegTrade(
+        id=tid, legs=legs, strategy_type=StrategyType.IRON_CONDOR, status=status,
+        entry_time=NOW, expiry_date=expiry, expiry_type=ExpiryType.WEEKLY, capital_bucket=CapitalBucket.WEEKLY,
+    )
+
+
+def test_legs_from_trades_flattens_open_legs():
+    """Signed quantities, CE/PE flags, per-trade expiry and percent IVs become decimal columns."""
+    trades = [
+        _trade("A", [_leg("K1", 24500, "CE", -75, 13.0), _leg("K2", 23500, "PE", -75, 15.0),
+                     _leg("K3", 24000, "CE", 0, 14.0)]),
+        _trade("B", [_leg("K4", 24000, "PE", 50, 14.0)], expiry="2026-11-26"),
+        _trade("C", [_leg("K5", 24000, "CE", -75, 14.0)], status=TradeStatus.CLOSED),
+    ]
+    legs = legs_from_trades(trades, 24000.0, NOW, RATE)
+    assert legs.keys == ["K1", "K2", "K4"]                  # zero-qty leg and closed trade skipped
+    assert np.array_equal(legs.strike, [24500.0, 23500.0, 24000.0])
+    assert np.array_equal(legs.is_call, [True, False, False])
+    assert np.array_equal(legs.qty, [-75.0, -75.0, 50.0])
+    assert np.allclose(legs.iv, [0.13, 0.15, 0.14])
+    assert np.allclose(legs.t, year_fractions(np.array(["2026-10-22", "2026-10-22", "2026-11-26"]), NOW))
+    assert len(legs_from_trades(trades, 24000.0, NOW, RATE, open_only=False)) == 4
+
+
+def test_legs_without_iv_back_it_out_of_their_price():
+    t = float(year_fractions("2026-10-22", NOW))
+    price = float(black76_price(forward_from_spot(24000.0, t, RATE), 24200.0, t, 0.16, True, RATE))
+    legs = legs_from_trades([_trade("A", [_leg("K1", 24200, "CE", -75, 0.0, price)])], 24000.0, NOW, RATE)
+    assert abs(legs.iv[0] - 0.16) < 1e-4
+
+
+def test_grid_cell_matches_scalar_reprice():
+    """One (spot, vol, day) cell equals a leg-by-leg scalar Black-76 reprice."""
+    spot = 24000.0
+    legs = BookLegs(["A", "B", "C"], np.array([23800.0, 24300.0, 24000.0]), np.array([False, True, True]),
+                    np.array([-75.0, -75.0, 50.0]), np.array([6 / 365, 6 / 365, 41 / 365]),
+                    np.array([0.15, 0.13, 0.14]))
+    res = scenario_grid(legs, spot, rate=RATE)
+    i, j, k = 5, 8, 2
+    ds, dv, dd = res.spot_shocks[i], res.vol_shocks[j], res.days[k]
+    expected = 0.0
+    for n in range(len(legs)):
+        t0, t1 = float(legs.t[n]), float(legs.t[n]) - dd / 365.0
+        before = black76_price(forward_from_spot(spot, t0, RATE), legs.strike[n], t0, legs.iv[n],
+                               legs.is_call[n], RATE)
+        after = black76_price(forward_from_spot(spot * (1 + ds), t1, RATE), legs.strike[n], t1, legs.iv[n] + dv,
+                              legs.is_call[n], RATE)
+        expected += float(after - before) * legs.qty[n]
+    assert res.pnl.shape == (41, 11, 3)
+    assert abs(res.pnl[i, j, k] - expected) < 1e-6
+    assert abs(scenario_grid(legs, spot, [0.0], [0.0], [0.0], RATE).pnl[0, 0, 0]) < 1e-9   # no shock, no P&L
+    assert res.worst_loss == res.worst_cells(1)[0][3]
@@ -0,0 +1,16 @@
+import pytest
+
+from trading.staleness import StalenessIndex
+
+
+def test_arrays_are_never_swapped_while_keys_are_added():
+    """The feed thread may hold a reference to _last; watching new keys must not replace it."""
+    s = StalenessIndex(capacity=8, clock=lambda: 100.0)
+    last = s._last
+    s.touch_keys(["A", "B"], watch=True)
+    s.watch([f"K{i}" for i in range(6)])
+    assert s._last is last and len(s.registry) == 8
+    assert s.stale(5.0, now=104.0) == [f"K{i}" for i in range(6)]
+    assert s.stale(5.0, ["A", "UNKNOWN"], now=104.0) == ["UNKNOWN"]
+    with pytest.raises(RuntimeError):
+        s.watch(["ONE_TOO_MANY"])
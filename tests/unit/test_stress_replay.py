@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from analytics.pricing import black76_price, forward_from_spot
+from analytics.scenarios import BookLegs
+from analytics.stress_replay import historical_moves, replay
+
+RATE = 0.065
+
+
+def _history(days=8, seed=7):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2026-01-01", periods=days, freq="D")
+    close = 24000.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, days))
+    nifty = pd.DataFrame({"open": close, "high": close * 1.006, "low": close * 0.992, "close": close}, index=idx)
+    vix = 14.0 + rng.normal(0.0, 0.5, days)
+    vix = pd.DataFrame({"open": vix, "high": vix + 0.8, "low": vix - 0.5, "close": vix}, index=idx)
+    return nifty, vix
+
+
+def test_historical_moves_align_windows_with_the_prior_close():
+    """Window i runs over days i+1..i+h and is measured from day i's close (NIFTY and VIX)."""
+    nifty, vix = _history()
+    for h in (1, 5):
+        moves = historical_moves(nifty, vix, h)
+        assert len(moves) == len(nifty) - h and moves.horizon == h
+        for i in range(len(moves)):
+            w = slice(i + 1, i + 1 + h)
+            base, base_vix = nifty["close"].iloc[i], vix["close"].iloc[i]
+            end, vix_end = nifty["close"].iloc[i + h], vix["close"].iloc[i + h]
+            expected = np.array([nifty["low"].iloc[w].min(), end, nifty["high"].iloc[w].max()]) / base - 1.0
+            assert np.allclose(moves.spot_move[i], expected)
+            assert np.allclose(moves.vix_ratio[i], np.array([vix["high"].iloc[w].max(), vix_end, vix_end]) / base_vix)
+            assert moves.dates[i] == np.datetime64(nifty.index[i + h].date(), "D")
+    assert len(historical_moves(nifty.iloc[:3], vix, 5)) == 0
+
+
+def test_replay_cell_matches_scalar_reprice():
+    """One (window, path) cell equals a leg-by-leg scalar Black-76 reprice of the book."""
+    spot = 24000.0
+    legs = BookLegs(["A", "B", "C"], np.array([23800.0, 24000.0, 24300.0]), np.array([False, True, True]),
+                    np.array([-75.0, -75.0, 150.0]), np.array([7 / 365, 7 / 365, 35 / 365]),
+                    np.array([0.15, 0.13, 0.14]))
+    nifty, vix = _history()
+    moves = historical_moves(nifty, vix, 1)
+    res = replay(legs, spot, moves, RATE)
+    assert res.pnl.shape == (len(moves), 3)
+
+    i, p = 2, 0
+    ratio = float(np.clip(moves.vix_ratio[i, p], 0.5, 3.0))
+    shocked_spot = spot * (1.0 + moves.spot_move[i, p])
+    expected = 0.0
+    for k in range(len(legs)):
+        t0, t1 = float(legs.t[k]), float(legs.t[k]) - 1 / 365
+        before = black76_price(forward_from_spot(spot, t0, RATE), legs.strike[k], t0, legs.iv[k],
+                               legs.is_call[k], RATE)
+        after = black76_price(forward_from_spot(shocked_spot, t1, RATE), legs.strike[k], t1, legs.iv[k] * ratio,
+                              legs.is_call[k], RATE)
+        expected += float(after - before) * legs.qty[k]
+    assert abs(res.pnl[i, p] - expected) < 1e-6
+    assert res.ranked(1)[0]["pnl"] == res.worst_loss
@@ -0,0 +1,56 @@
+from datetime import date
+
+import numpy as np
+
+from core.config import settings
+from trading.subscription_manager import ATMWindowManager
+
+EXPIRY = date(2030, 1, 3)
+STRIKES = np.arange(23500.0, 24550.0, 50.0)
+
+
+class Master:
+    def get_all_expiries(self, symbol):
+        return [EXPIRY]
+
+    def strike_index(self, symbol, expiry):
+        return STRIKES, [f"{k:.0f}CE" for k in STRIKES], [f"{k:.0f}PE" for k in STRIKES]
+
+
+class Feed:
+    def __init__(self):
+        self.sub_list = set()
+        self.batches = []
+
+    def update_subscriptions(self, add, remove):
+        self.batches.append((set(add), set(remove)))
+        self.sub_list = (self.sub_list | add) - remove
+
+
+def _keys(*strikes):
+    return {f"{k}{side}" for k in strikes for side in ("CE", "PE")}
+
+
+def test_recentre_sends_one_diffed_batch_and_keeps_pinned_legs():
+    feed = Feed()
+    mgr = ATMWindowManager(Master(), feed, width=1, n_expiries=1)
+    add, remove = mgr.update(24010.0)
+    assert feed.batches == [(add, remove)] and not remove
+    assert add == _keys(23950, 24000, 24050) | {settings.MARKET_KEY_INDEX, settings.MARKET_KEY_VIX}
+    assert mgr.update(24020.0) == (set(), set()) and len(feed.batches) == 1   # ATM unchanged
+
+    # An open leg inside the window stays subscribed when ATM moves away from it
+    mgr.sync_legs(["23950PE"])
+    assert len(feed.batches) == 1
+    add, remove = mgr.update(24190.0)
+    assert len(feed.batches) == 2 and feed.batches[-1] == (add, remove)
+    assert add == _keys(24150, 24200, 24250)
+    assert remove == _keys(23950, 24000, 24050) - {"23950PE"}
+    assert "23950PE" in feed.sub_list
+
+    # Closing the leg unpins it and drops it from the feed in one batch
+    add, remove = mgr.sync_legs(["24200CE", "23500CE"])
+    assert (add, remove) == ({"23500CE"}, {"23950PE"}) and feed.batches[-1] == (add, remove)
+    assert "23950PE" not in mgr.pinned and "23950PE" not in feed.sub_list
+    add, remove = mgr.sync_legs([])
+    assert remove == {"23500CE"} and "24200CE" in feed.sub_list      # still inside the window
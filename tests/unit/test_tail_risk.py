@@ -0,0 +1,64 @@
+import numpy as np
+
+from analytics.scenarios import BookLegs
+from analytics.tail_risk import GarchParams, TailRiskEngine, simulate_paths, var_es
+
+PARAMS = GarchParams(mu=0.0, omega=0.02, alpha=0.08, beta=0.9, nu=6.0, sigma2_next=1.0, version=1)
+
+def _legs(qty, strike=24000.0, is_call=False):
+    return BookLegs(["NSE_FO|P"], np.array([strike]), np.array([is_call]), np.array([float(qty)]),
+                    np.array([7 / 365]), np.array([0.15]))
+
+def test_var_es_on_a_known_sample():
+    pnl = -np.arange(1000, dtype=float)                  # losses 0..999
+    var, es = var_es(pnl, 0.99)
+    assert abs(var - 989.01) < 1e-6
+    assert es >= var and abs(es - np.mean(np.arange(990, 1000))) < 1e-6
+    assert var_es(np.array([]), 0.99) == (0.0, 0.0)
+
+def test_paths_match_the_garch_variance_and_are_reproducible():
+    a = simulate_paths(PARAMS, 2, 40_000, chunks=2)
+    b = simulate_paths(PARAMS, 2, 40_000, chunks=2)
+    assert np.array_equal(a[0], b[0])
+    assert abs(a[0][:, 0].std() * 100.0 - 1.0) < 0.03    # day-1 sd = sqrt(sigma2_next) %
+
+def test_short_put_tail_is_cached_until_refit():
+    engine = TailRiskEngine(n_paths=20_000, confidence=0.99, max_workers=1, max_horizon=10, rate=0.0)
+    assert engine.evaluate(_legs(-75), 24000.0) is None
+    assert engine.refresh(PARAMS) and not engine.refresh(PARAMS)
+
+    short = engine.evaluate(_legs(-75), 24000.0)
+    assert 0 < short.var_1d <= short.es_1d
+    assert short.var_expiry > short.var_1d and short.horizon_days == 7
+    assert engine.evaluate(_legs(-75), 24000.0) is short           # cached
+    # Long the same put: losses capped at the premium, far below the short side
+    assert engine.evaluate(_legs(75), 24000.0).es_1d < short.es_1d / 2
+
+    hedged = engine.evaluate_with(_legs(-75), _legs(75, strike=23800.0), 24000.0)
+    assert hedged.es_1d < short.es_1d
+
+    assert engine.refresh(PARAMS._replace(version=2))
+    assert engine.evaluate(_legs(-75), 24000.0).fit_version == 2
+
+def test_garch_refit_refreshes_the_risk_manager_tail_model(monkeypatch):
+    """Each refit stored by HybridVolatilityAnalytics reaches AdvancedRiskManager.update_tail_model."""
+    from types import SimpleNamespace
+
+    import pandas as pd
+
+    from analytics.volatility import HybridVolatilityAnalytics
+    from trading.risk_manager import AdvancedRiskManager
+    rm = AdvancedRiskManager(None, None)
+    rm.tail_risk = TailRiskEngine(n_paths=2_000, confidence=0.99, max_workers=1, max_horizon=5, rate=0.0)
+    vol = HybridVolatilityAnalytics(None)
+    rm.attach_vol_analytics(vol)
+    assert not rm.tail_risk.ready
+
+    fit = SimpleNamespace(
+        params=pd.Series({"mu": 0.0, "omega": 0.02, "alpha[1]": 0.08, "beta[1]": 0.9, "nu": 6.0}),
+        resid=pd.Series([0.5]), conditional_volatility=pd.Series([1.0]),
+    )
+    vol._store_garch_fit(fit)
+    assert rm.tail_risk.ready and rm.tail_risk.params.version == 1
+    vol._store_garch_fit(fit)
+    assert rm.tail_risk.params.version == 2
@@ -0,0 +1,106 @@
+import pytest
+
+from trading.bar_aggregator import BarAggregator
+from trading.staleness import StalenessIndex
+from trading.tick_buffer import InstrumentRegistry, TickRingBuffer
+
+
+def test_released_ids_are_recycled_after_the_grace_period():
+    clock = {"t": 0.0}
+    reg = InstrumentRegistry(capacity=2, recycle_sec=30.0, clock=lambda: clock["t"])
+    ticks = TickRingBuffer(depth=4, capacity=2, registry=reg)
+    staleness = StalenessIndex(reg, clock=lambda: clock["t"])
+    bars = BarAggregator(reg)
+
+    a = ticks.append_key("A", 60.0, 100.0)
+    staleness.touch_keys(["A", "B"], watch=True)
+    bars.on_tick(a, 60.0, 100.0)
+    reg.release("A")
+    clock["t"] = 10.0
+    assert ticks.append_key("A", 61.0, 101.0) == a       # late tick: still A's slot
+    with pytest.raises(RuntimeError):
+        reg.add("C")                                      # A is still retiring
+
+    clock["t"] = 31.0
+    c = reg.add("C")
+    assert c == a and reg.keys[c] == "C" and "A" not in reg and reg.reused == 1
+    assert ticks.count(c) == 0 and staleness.age("C", now=31.0) == float("inf")
+    assert [b[0] for b in bars._completed] == ["A", "A", "A"]   # A's open bars closed under its name
+
+    reg.release("C")
+    assert reg.add("C") == c                              # re-subscribed within the grace period
+    clock["t"] = 100.0
+    with pytest.raises(RuntimeError):
+        reg.add("D")
+
+def test_failed_bar_flush_requeues_with_a_bound():
+    import asyncio
+    from contextlib import asynccontextmanager
+
+    class Db:
+        def __init__(self):
+            self.fail, self.rows = True, []
+
+        @asynccontextmanager
+        async def get_session(self):
+            db = self
+            class Session:
+                async def execute(self, stmt, rows):
+                    if db.fail:
+                        raise RuntimeError("db down")
+                    db.rows.extend(rows)
+            yield Session()
+
+        async def safe_commit(self, session):
+            pass
+
+    bars = BarAggregator(intervals=(1,), max_pending=4)
+    db = Db()
+    for minute in range(4):                      # completes minutes 0..2
+        bars.on_tick_key("A", 60.0 * minute, 100.0 + minute)
+    assert asyncio.run(bars.flush(None)) == 0 and bars.pending() == 3   # no DB yet: bars wait
+    assert asyncio.run(bars.flush(db)) == 0
+    assert bars.pending() == 3 and bars.bars_dropped == 0
+
+    for minute in range(4, 6):                   # completes 3..4: one over the cap
+        bars.on_tick_key("A", 60.0 * minute, 100.0 + minute)
+    assert asyncio.run(bars.flush(db)) == 0
+    assert bars.pending() == 4 and bars.bars_dropped == 1
+
+    db.fail = False
+    assert asyncio.run(bars.flush(db)) == 4
+    assert [r["close"] for r in db.rows] == [101.0, 102.0, 103.0, 104.0]   # oldest went first, order kept
+    assert bars.pending() == 0 and bars.bars_flushed == 4
+
+def test_buffers_are_allocated_at_registry_capacity_and_never_swapped():
+    """Registering keys on the event loop must not replace arrays the feed thread writes into."""
+    reg = InstrumentRegistry(capacity=8)
+    ticks = TickRingBuffer(depth=4, registry=reg)
+    bars = BarAggregator(reg, intervals=(1,))
+    data, bucket = ticks._data, bars._bucket
+    assert len(data) == len(bucket) == 8
+    for i in range(8):
+        bars.on_tick(ticks.append_key(f"K{i}", 60.0, 100.0 + i), 60.0, 100.0 + i)
+    assert ticks._data is data and bars._bucket is bucket
+    assert ticks.latest_ltp().tolist() == [100.0 + i for i in range(8)]
+    with pytest.raises(RuntimeError):
+        ticks.register("ONE_TOO_MANY")
+
+def test_realized_vol_and_trend_from_completed_bars():
+    import numpy as np
+
+    from analytics.volatility import HybridVolatilityAnalytics
+    from trading.bar_aggregator import TRADING_MINUTES_PER_YEAR
+    bars = BarAggregator(intervals=(5, 15))
+    closes = 24000.0 * np.exp(np.cumsum(np.tile([0.001, -0.0005], 40)))
+    for i, c in enumerate(closes):
+        bars.on_tick_key("IDX", 300.0 * i, float(c))
+    c = bars.closes("IDX", 5, 76)
+    expected = np.diff(np.log(c)).std(ddof=1) * np.sqrt(TRADING_MINUTES_PER_YEAR / 5) * 100.0
+    assert abs(bars.realized_vol("IDX", 5, 75) - expected) < 1e-9
+    assert bars.trend("IDX") == "BULLISH"                   # steady drift up
+    assert bars.realized_vol("NONE") == 0.0 and bars.trend("NONE") == "NEUTRAL"
+
+    vol = HybridVolatilityAnalytics(None, bars=bars)
+    assert vol.get_intraday_metrics("IDX") == (bars.realized_vol("IDX"), "BULLISH")
+    assert HybridVolatilityAnalytics(None).get_intraday_metrics() == (0.0, "NEUTRAL")
@@ -0,0 +1,26 @@
+import numpy as np
+
+from infra.tick_recorder import RECORD_DTYPE, TickFile, TickRecorder, recorded_days
+
+T0 = 1_760_000_000.0   # a fixed session instant; the day file follows from it
+
+def _record(directory, start, n):
+    rec = TickRecorder(str(directory), batch_size=4, flush_sec=0.05)
+    rec.start()
+    for i in range(start, start + n):
+        rec.record("NSE_FO|1", T0 + i, 100.0 + i)
+    rec.stop()
+
+def test_restart_after_torn_record_stays_aligned(tmp_path):
+    _record(tmp_path, 0, 5)
+    day = recorded_days(str(tmp_path))[0]
+    path = tmp_path / f"ticks_{day}.bin"
+    with open(path, "ab") as f:           # crash mid-write: part of a record
+        f.write(b"\x01" * 17)
+
+    _record(tmp_path, 5, 5)               # same-day restart
+    assert path.stat().st_size == 10 * RECORD_DTYPE.itemsize
+    data = TickFile(str(path)).data
+    assert np.array_equal(data["ltp"], 100.0 + np.arange(10))
+    assert np.all(np.diff(data["ts"]) > 0)
+    assert len(TickFile(str(path)).between(T0 + 2, T0 + 7)) == 5
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from infra.tick_recorder import TickRecorder, open_days, recorded_days
+from infra.tick_replay import TickReplayer
+
+T0 = 1_760_000_000.0
+
+class _Feed:
+    """Stands in for LiveDataFeed: swallows its own errors and counts them."""
+    def __init__(self):
+        self.clock = None
+        self.staleness = SimpleNamespace(clock=None)
+        self.message_errors = 0
+        self.last_error = ""
+
+    def _on_message(self, message, *args):
+        try:
+            for feed in message["feeds"].values():
+                if feed["ltpc"]["ltp"] > 102:
+                    raise ValueError("bad tick")
+        except Exception as e:
+            self.message_errors += 1
+            self.last_error = str(e)
+
+def test_feed_errors_reach_the_report(tmp_path):
+    rec = TickRecorder(str(tmp_path), batch_size=4, flush_sec=0.05)
+    rec.start()
+    for i in range(5):
+        rec.record("NSE_FO|1", T0 + i, 100.0 + i)
+    rec.stop()
+    day = recorded_days(str(tmp_path))[0]
+    report = TickReplayer(feed=_Feed()).replay(open_days(day, day, str(tmp_path)))
+    assert report.messages == 5
+    assert report.as_dict()["stages"]["feed"]["errors"] == 2
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+
+from analytics.sabr import SmileSlice
+from analytics.vol_surface import VolSurface
+
+F = 24000.0
+STRIKES = np.arange(22000, 26050, 50, dtype=float)
+NOW = datetime(2026, 10, 16, 10, 0)
+
+def _flat(t, vol, skew=0.0):
+    k = np.log(STRIKES / F)
+    return SmileSlice(F, t, STRIKES, vol - skew * k)
+
+def test_surface_updates_rows_in_place_and_interpolates_variance():
+    vs = VolSurface(capacity=1)  # forces a grow on the second expiry
+    vs.update({"2026-10-20": _flat(4 / 365, 0.12, skew=0.3), "2026-11-24": _flat(39 / 365, 0.15)})
+    assert vs.expiries == ["2026-10-20", "2026-11-24"]
+    assert abs(vs.atm_iv() - 0.12) < 1e-9
+    assert abs(vs.skew() - 3.0) < 1e-6  # 0.3 * 2 * 5% in vol points
+    # Between expiries total variance is linear in time, so vol lies strictly between
+    mid = float(vs.iv_at(20, 0.0, NOW))
+    assert 0.12 < mid < 0.15
+    rows, version = dict(vs._rows), vs.version
+    vs.update({"2026-10-20": _flat(4 / 365, 0.10)})
+    assert vs._rows == rows and vs.version == version + 1
+    assert abs(vs.atm_iv() - 0.10) < 1e-9 and abs(vs.atm_iv("2026-11-24") - 0.15) < 1e-9
+    assert vs.drop_expired(datetime(2026, 10, 21, 10, 0)) == 1 and vs.expiries == ["2026-11-24"]
+    assert vs.version == version + 2 and abs(vs.atm_iv() - 0.15) < 1e-9
+
+def test_underlyings_sharing_an_expiry_keep_separate_rows():
+    """BANKNIFTY's smile on the NIFTY expiry must not overwrite NIFTY's row."""
+    from core.models import AdvancedMetrics
+    nifty, bank = "NSE_INDEX|Nifty 50", "NSE_INDEX|Nifty Bank"
+    vs = VolSurface(underlying_key=nifty)
+    vs.update({(nifty, "2026-10-20"): _flat(4 / 365, 0.12), (bank, "2026-10-20"): _flat(4 / 365, 0.18)})
+    assert len(vs) == 2 and vs.underlyings == [nifty, bank]
+    assert abs(vs.atm_iv() - 0.12) < 1e-9 and abs(vs.atm_iv("2026-10-20", underlying_key=bank) - 0.18) < 1e-9
+    assert vs.expiries == vs.expiries_for(bank) == ["2026-10-20"]
+    m = AdvancedMetrics(vix=14.0).with_surface(vs, underlying_key=bank)
+    assert abs(m.atm_iv - 0.18) < 1e-9 and m.vix == 14.0 and m.sabr_alpha == 0.0
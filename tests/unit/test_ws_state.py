@@ -0,0 +1,24 @@
+from websocket.ws_state import WebSocketState
+
+
+def test_snapshot_views_are_immutable_and_reused():
+    """A published view never changes under a reader; an untouched side keeps its view."""
+    s = WebSocketState()
+    s.update_market({"A": 1.0, "B": 2.0})
+    s.update_positions({"P": {"qty": 50}})
+    snap = s.snapshot()
+    assert s.snapshot() is snap
+
+    s.update_market({"A": 1.5})
+    new = s.snapshot()
+    assert snap["market"]["A"] == 1.0 and new["market"]["A"] == 1.5
+    assert new["positions"] is snap["positions"]
+    assert s.market_value("A") == 1.5 and s.market_value("Z") is None
+
+def test_changes_since_seq():
+    s = WebSocketState()
+    s.update_market({"A": 1.0, "B": 2.0})
+    _, seq = s.market_changes(0)
+    s.update_market({"B": 2.5})
+    assert s.market_changes(seq) == ({"B": 2.5}, seq + 1)
+    assert s.market_changes(seq + 1) == ({}, seq + 1)
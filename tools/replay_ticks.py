@@ -0,0 +1,72 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings
+from infra.tick_recorder import open_days, recorded_days
+from infra.tick_replay import TickReplayer
+from trading.live_data_feed import LiveDataFeed
+from websocket.ws_state import WebSocketState
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+logger = logging.getLogger("ReplayCLI")
+
+
+def risk_stage(trades_path: str, feed: LiveDataFeed):
+    """Scenario grid + limit check on every index tick, against the given book (leg prices from the feed)."""
+    from tools.stress_replay import load_trades
+    from trading.risk_manager import AdvancedRiskManager
+
+    trades = load_trades(trades_path)
+    rm = AdvancedRiskManager(None, None).attach_feed(feed)
+    state = {"synced": False}
+
+    def stage(ts, keys, ltps, msg):
+        if settings.MARKET_KEY_INDEX not in keys:
+            return
+        spot = ltps[keys.index(settings.MARKET_KEY_INDEX)]
+        if not state["synced"]:
+            rm.update_portfolio_state(trades, 0.0, spot)
+            state["synced"] = True
+        rm.run_scenarios(spot)
+        rm.check_portfolio_limits()
+    return stage
+
+
+def main(args):
+    print("\n⏪ VOLGUARD TICK REPLAY")
+    print("====================================")
+    days = recorded_days(args.dir)
+    if not days:
+        logger.error(f"❌ No recorded tick files in {args.dir or settings.TICK_RECORD_DIR}")
+        return
+    start, end = args.start or days[0], args.end or args.start or days[-1]
+    files = list(open_days(start, end, args.dir))
+    logger.info(f"Days {start}..{end}: {len(files)} files, {sum(len(f) for f in files):,} ticks @ "
+                f"{'max' if not args.speed else f'{args.speed:g}x'} speed")
+
+    feed = LiveDataFeed({}, {}, None)
+    ws_state = WebSocketState()
+    replayer = TickReplayer(args.speed, feed=feed, ws_state=ws_state)
+    if args.trades:
+        replayer.add_stage("risk", risk_stage(args.trades, feed))
+
+    report = replayer.replay(files, limit=args.limit)
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay recorded ticks through the live pipeline (no Upstox connection).")
+    parser.add_argument("--start", help="First day (YYYYMMDD); default: oldest recorded")
+    parser.add_argument("--end", help="Last day (YYYYMMDD); default: --start, else newest recorded")
+    parser.add_argument("--dir", default=None, help="Tick directory (default: TICK_RECORD_DIR)")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, 10 = 10x, 0 = max")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many ticks")
+    parser.add_argument("--trades", default=None, help="JSON MultiLegTrade list: adds a risk stage on index ticks")
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.scenarios import legs_from_trades
+from analytics.stress_replay import replay_book
+from core.config import settings
+from core.models import MultiLegTrade
+from utils.data_fetcher import DashboardDataFetcher
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+logger = logging.getLogger("StressReplayCLI")
+
+
+def load_trades(path: str):
+    """JSON list of MultiLegTrade dicts (e.g. [t.model_dump(mode='json') for t in open_trades])."""
+    with open(path) as f:
+        raw = json.load(f)
+    return [MultiLegTrade.model_validate(t) for t in (raw if isinstance(raw, list) else [raw])]
+
+
+async def main(args):
+    print("\n🧨 VOLGUARD HISTORICAL STRESS REPLAY")
+    print("====================================")
+
+    trades = load_trades(args.trades)
+    fetcher = DashboardDataFetcher(api_client=None)
+    # DB only: history is whatever the fetcher already persisted
+    nifty = await fetcher._load_from_db(settings.MARKET_KEY_INDEX, args.days)
+    vix = await fetcher._load_from_db(settings.MARKET_KEY_VIX, args.days)
+    if nifty.empty or vix.empty:
+        logger.error("❌ No NIFTY/VIX history in historical_candles. Run the engine (or a backtest) once first.")
+        return
+
+    spot = args.spot or float(nifty["close"].iloc[-1])
+    legs = legs_from_trades(trades, spot)
+    logger.info(f"Book: {len(trades)} trades, {len(legs)} legs @ spot {spot:,.2f} | history {len(nifty)} days")
+
+    results = replay_book(legs, spot, nifty, vix, horizons=args.horizons)
+    for horizon, res in results.items():
+        print(f"\n--- Worst {args.top} windows ({horizon}d horizon, {len(res.moves)} windows) ---")
+        print(f"{'Date':<12}{'P&L':>14}{'Path':>8}{'NIFTY %':>10}{'VIX %':>10}")
+        for row in res.ranked(args.top):
+            print(f"{row['date']:<12}{row['pnl']:>14,.0f}{row['path']:>8}"
+                  f"{row['spot_move_pct']:>10.2f}{row['vix_change_pct']:>10.1f}")
+        if args.csv:
+            out = args.csv.replace(".csv", f"_{horizon}d.csv")
+            res.to_frame().to_csv(out)
+            logger.info(f"💾 Saved {out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the open book through historical NIFTY/VIX days.")
+    parser.add_argument("trades", help="JSON file with the open MultiLegTrade list")
+    parser.add_argument("--spot", type=float, default=None, help="Spot to shock from (default: last close)")
+    parser.add_argument("--days", type=int, default=3650, help="History lookback in calendar days")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5], help="Window lengths in trading days")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--csv", default=None, help="Optional CSV path for the full per-day table")
+    asyncio.run(main(parser.parse_args()))
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 EnhancedUpstoxAPI 20.3 (V3 POWERED) - FIXED RETURN TYPE
+- quotes (QuoteService): chunked, singleflight LTPs for every caller.
+- get_option_chains: every chain of a refresh cycle concurrently, through the
+  shared RateLimiter, as one ChainBatch stamped with per-call fetch times.
 """
 from __future__ import annotations
 import asyncio
@@ -9,12 +12,14 @@ import time
 import random
 import json
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Tuple, Any
 from urllib.parse import quote
 import aiohttp
 from core.config import settings, UPSTOX_API_ENDPOINTS
 from core.models import Order
+from trading.quote_service import QuoteService
 
 logger = logging.getLogger("UpstoxAPI")
 
@@ -49,6 +54,46 @@ def _dummy_funds_margin() -> Dict[str, Any]:
 class TokenExpiredError(RuntimeError): pass
 class MarginInsaneError(RuntimeError): pass
 
+# ------------------------------------------------------
+# Chain batch
+# ------------------------------------------------------
+@dataclass
+class ChainFetch:
+    instrument_key: str
+    expiry_date: str
+    data: List[Dict[str, Any]]          # chain rows; [] when the call failed
+    fetched_at: datetime                # IST, when the response arrived
+    latency_ms: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@dataclass
+class ChainBatch:
+    started_at: datetime
+    finished_at: datetime
+    fetches: Dict[Tuple[str, str], ChainFetch] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return all(f.ok for f in self.fetches.values())
+
+    @property
+    def failed(self) -> List[ChainFetch]:
+        return [f for f in self.fetches.values() if not f.ok]
+
+    @property
+    def spread_ms(self) -> float:
+        """Time between the first and last successful response (how 'same-moment' the set is)."""
+        times = [f.fetched_at for f in self.fetches.values() if f.ok]
+        return (max(times) - min(times)).total_seconds() * 1000 if len(times) > 1 else 0.0
+
+    def get(self, instrument_key: str, expiry_date: str) -> List[Dict[str, Any]]:
+        f = self.fetches.get((instrument_key, expiry_date))
+        return f.data if f is not None else []
+
 # ------------------------------------------------------
 # Rate limiter
 # ------------------------------------------------------
@@ -88,6 +133,7 @@ class EnhancedUpstoxAPI:
         self._session_lock = asyncio.Lock()
         self._limiter = RateLimiter()
         self.instrument_master = None
+        self.quotes = QuoteService(self)
 
     async def update_token(self, new_token: str) -> None:
         async with self._session_lock:
@@ -227,6 +273,39 @@ class EnhancedUpstoxAPI:
     async def get_option_chain(self, instrument_key: str, expiry_date: str) -> Dict[str, Any]:
         return await self._request("GET", "option_chain", params={"instrument_key": instrument_key, "expiry_date": expiry_date})
 
+    async def _fetch_chain(self, instrument_key: str, expiry_date: str) -> ChainFetch:
+        started = time.perf_counter()
+        try:
+            res = await self.get_option_chain(instrument_key, expiry_date)
+            error = None if res.get("status") == "success" else str(res.get("message") or "error")
+            data = (res.get("data") or []) if error is None else []
+        except TokenExpiredError: raise
+        except Exception as e:
+            error, data = str(e), []
+        return ChainFetch(instrument_key, expiry_date, data, _ist_now(),
+                          (time.perf_counter() - started) * 1000, error)
+
+    async def get_option_chains(self, requests: Iterable[Tuple[str, str]]) -> ChainBatch:
+        """
+        All (instrument_key, expiry_date) chains at once: weekly + monthly,
+        NIFTY + BANKNIFTY. Each call still waits on the shared RateLimiter, so a
+        cycle costs roughly the slowest call, not the sum. A failed chain comes
+        back with `error` set; the rest of the batch is unaffected.
+        """
+        wanted = list(dict.fromkeys(requests))
+        batch = ChainBatch(_ist_now(), _ist_now())
+        results = await asyncio.gather(*(self._fetch_chain(k, e) for k, e in wanted), return_exceptions=True)
+        for (key, expiry), res in zip(wanted, results):
+            if isinstance(res, TokenExpiredError): raise res
+            if isinstance(res, BaseException):
+                res = ChainFetch(key, expiry, [], _ist_now(), 0.0, str(res))
+            batch.fetches[(key, expiry)] = res
+        batch.finished_at = _ist_now()
+        if batch.failed:
+            logger.warning(f"⚠️ Chain batch: {len(batch.failed)}/{len(wanted)} failed "
+                           f"({', '.join(f'{f.instrument_key}@{f.expiry_date}' for f in batch.failed)})")
+        return batch
+
     async def get_short_term_positions(self) -> List[Dict[str, Any]]:
         res = await self._request("GET", "positions")
         return res.get("data", []) if res.get("status") == "success" else []
@@ -253,5 +332,9 @@ class EnhancedUpstoxAPI:
         url = f"{settings.API_BASE_URL}/v3/historical-candle/intraday/{encoded}/{interval}"
         return await self._request("GET", dynamic_url=url)
 
+    async def get_market_quote_ltp(self, instrument_key: str) -> Dict[str, Any]:
+        """Raw LTP call (comma-joined keys); prefer self.quotes.ltp(), which chunks and coalesces."""
+        return await self._request("GET", "market_quote_ltp", params={"instrument_key": instrument_key})
+
     async def get_market_quote_ohlc(self, instrument_key: str, interval: str) -> Dict[str, Any]:
         return await self._request("GET", "market_quote_ohlc", params={"instrument_key": instrument_key, "interval": interval})
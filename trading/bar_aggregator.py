@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Tick-to-Bar Aggregator
+- Builds 1m/5m/15m OHLCV bars from the live feed (ids shared with TickRingBuffer).
+- Constant memory per instrument: one open bar per interval plus a ring of the
+  last BAR_HISTORY completed closes (realized vol / trend inputs), allocated once at the registry's capacity
+  (never regrown, so a key added on the event loop cannot race a feed write).
+- Completed bars queue up and are written to intraday_candles in one bulk
+  INSERT per flush; the feed thread never touches the DB. A bar split by a
+  restart is merged on conflict (high/low extremes, summed volume).
+- A failed flush puts its bars back at the head of the queue for the next one;
+  while the DB stays down the queue is capped at BAR_PENDING_MAX, oldest dropped.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from database.models import DbIntradayCandle
+from trading.tick_buffer import InstrumentRegistry
+
+logger = logging.getLogger("BarAggregator")
+
+DEFAULT_INTERVALS = (1, 5, 15)     # minutes; 330-minute IST offset keeps 5m/15m on IST boundaries
+BAR_HISTORY = 128
+TRADING_MINUTES_PER_YEAR = 375 * 252
+
+# open-bar columns
+_O, _H, _L, _C, _V0, _V, _OI, _N = range(8)
+
+
+class BarAggregator:
+    def __init__(self, registry: Optional[InstrumentRegistry] = None,
+                 intervals: Sequence[int] = DEFAULT_INTERVALS, capacity: Optional[int] = None,
+                 history: int = BAR_HISTORY, max_pending: Optional[int] = None):
+        self.registry = registry if registry is not None else InstrumentRegistry(capacity)
+        self.registry.on_reuse.append(self._reset)
+        capacity = self.registry.capacity
+        self.intervals = tuple(intervals)
+        self._secs = [60 * m for m in self.intervals]
+        self.history = history
+        self._bucket = np.full((capacity, len(self.intervals)), -1, dtype=np.int64)
+        self._bar = np.zeros((capacity, len(self.intervals), 8))
+        self._closes = np.full((capacity, len(self.intervals), history), np.nan)
+        self._ring_head = np.zeros((capacity, len(self.intervals)), dtype=np.int64)
+        self._completed: Deque[Tuple] = deque()
+        self.max_pending = settings.BAR_PENDING_MAX if max_pending is None else max_pending
+        self.bars_flushed = 0
+        self.bars_dropped = 0
+
+    # --- Storage ---
+    def _reset(self, iid: int):
+        # Recycled id: close the old key's open bars under its own name, then clear the slot
+        for j in np.flatnonzero(self._bucket[iid] >= 0):
+            self._complete(iid, int(j))
+        self._bucket[iid] = -1
+        self._bar[iid] = 0.0
+        self._closes[iid] = np.nan
+        self._ring_head[iid] = 0
+
+    # --- Writer (feed thread) ---
+    def on_tick(self, iid: int, ts: float, ltp: float, volume: float = 0.0, oi: float = 0.0):
+        """`volume` is the feed's cumulative day volume (vtt); bar volume is its change."""
+        buckets = self._bucket[iid]
+        bars = self._bar[iid]
+        for j, secs in enumerate(self._secs):
+            b = int(ts // secs)
+            bar = bars[j]
+            if b == buckets[j]:
+                if ltp > bar[_H]: bar[_H] = ltp
+                if ltp < bar[_L]: bar[_L] = ltp
+                bar[_C] = ltp
+                bar[_V] = volume
+                bar[_OI] = oi
+                bar[_N] += 1
+                continue
+            if buckets[j] >= 0:
+                self._complete(iid, j)
+            buckets[j] = b
+            # New bar's volume baseline is the last cumulative volume seen
+            v0 = bar[_V] if bar[_N] else volume
+            bar[:] = (ltp, ltp, ltp, ltp, v0, volume, oi, 1)
+
+    def on_tick_key(self, key: str, ts: float, ltp: float, volume: float = 0.0, oi: float = 0.0) -> int:
+        iid = self.registry.add(key)
+        self.on_tick(iid, ts, ltp, volume, oi)
+        return iid
+
+    def _complete(self, iid: int, j: int):
+        bar = self._bar[iid, j]
+        h = self._ring_head[iid, j]
+        self._closes[iid, j, h] = bar[_C]
+        self._ring_head[iid, j] = (h + 1) % self.history
+        self._completed.append((
+            self.registry.keys[iid], self.intervals[j], int(self._bucket[iid, j]) * self._secs[j],
+            float(bar[_O]), float(bar[_H]), float(bar[_L]), float(bar[_C]),
+            float(max(bar[_V] - bar[_V0], 0.0)), float(bar[_OI]), int(bar[_N]),
+        ))
+
+    def close_all(self):
+        """Completes every open bar (end of session)."""
+        for iid, j in zip(*np.nonzero(self._bucket >= 0)):
+            self._complete(int(iid), int(j))
+            self._bucket[iid, j] = -1
+            self._bar[iid, j] = 0.0
+
+    # --- Readers ---
+    def _col(self, interval: int) -> int:
+        return self.intervals.index(interval)
+
+    def closes(self, key: str, interval: int, n: Optional[int] = None) -> np.ndarray:
+        """Completed closes, oldest first (copy; at most `history`)."""
+        iid = self.registry.id_of(key)
+        if iid is None:
+            return np.empty(0)
+        j = self._col(interval)
+        ring = np.roll(self._closes[iid, j], -self._ring_head[iid, j])
+        ring = ring[~np.isnan(ring)]
+        return ring if n is None else ring[-n:]
+
+    def current_bar(self, key: str, interval: int) -> Optional[Dict[str, float]]:
+        iid = self.registry.id_of(key)
+        if iid is None:
+            return None
+        j = self._col(interval)
+        if self._bucket[iid, j] < 0:
+            return None
+        bar = self._bar[iid, j]
+        return {"start": float(self._bucket[iid, j] * self._secs[j]), "open": bar[_O], "high": bar[_H],
+                "low": bar[_L], "close": bar[_C], "volume": max(bar[_V] - bar[_V0], 0.0)}
+
+    def realized_vol(self, key: str, interval: int = 5, n: int = 75) -> float:
+        """Annualized close-to-close RV (%) over the last n completed bars; 0.0 below 3 closes."""
+        c = self.closes(key, interval, n + 1)
+        if len(c) < 3:
+            return 0.0
+        r = np.diff(np.log(c))
+        return float(r.std(ddof=1) * np.sqrt(TRADING_MINUTES_PER_YEAR / interval) * 100.0)
+
+    def trend(self, key: str, interval: int = 15, window: int = 20) -> str:
+        """Last close vs the mean of the last `window` completed closes (AnalyticsEngine labels)."""
+        c = self.closes(key, interval, window)
+        if len(c) < window:
+            return "NEUTRAL"
+        ma = c.mean()
+        if c[-1] > ma * 1.002: return "BULLISH"
+        if c[-1] < ma * 0.998: return "BEARISH"
+        return "NEUTRAL"
+
+    # --- Persistence ---
+    def pending(self) -> int:
+        return len(self._completed)
+
+    @staticmethod
+    def _row(bar: Tuple) -> Dict:
+        key, interval, start, o, h, l, c, v, oi, n = bar
+        return {
+            "instrument_key": key, "interval_min": interval,
+            "bar_start": datetime.fromtimestamp(start, tz=timezone.utc).astimezone(settings.IST).replace(tzinfo=None),
+            "open": o, "high": h, "low": l, "close": c, "volume": v, "oi": oi, "ticks": n,
+        }
+
+    def _take(self) -> List[Tuple]:
+        bars = []
+        while self._completed:
+            bars.append(self._completed.popleft())
+        return bars
+
+    def drain(self) -> List[Dict]:
+        return [self._row(b) for b in self._take()]
+
+    def _requeue(self, bars: List[Tuple]) -> int:
+        """Unwritten bars go back ahead of anything completed meanwhile; returns how many were dropped."""
+        self._completed.extendleft(reversed(bars))
+        dropped = 0
+        while len(self._completed) > self.max_pending:
+            self._completed.popleft()
+            dropped += 1
+        self.bars_dropped += dropped
+        return dropped
+
+    async def flush(self, db) -> int:
+        """One bulk INSERT for everything completed since the last flush."""
+        if db is None:
+            return 0            # no DB yet: completed bars stay queued for the next flush
+        bars = self._take()
+        if not bars:
+            return 0
+        rows = [self._row(b) for b in bars]
+        try:
+            stmt = insert(DbIntradayCandle)
+            t, new = DbIntradayCandle.__table__.c, stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_intraday_bar",
+                set_={
+                    "high": func.greatest(t.high, new.high), "low": func.least(t.low, new.low),
+                    "close": new.close, "volume": t.volume + new.volume, "oi": new.oi,
+                    "ticks": t.ticks + new.ticks,
+                },
+            )
+            async with db.get_session() as session:
+                await session.execute(stmt, rows)
+                await db.safe_commit(session)
+            self.bars_flushed += len(rows)
+            return len(rows)
+        except Exception as e:
+            dropped = self._requeue(bars)
+            logger.error(f"Bar flush failed ({len(rows)} bars re-queued, {dropped} oldest dropped): {e}")
+            return 0
+
+    async def flush_loop(self, db, interval: Optional[float] = None, stop_event=None):
+        period = settings.BAR_FLUSH_SEC if interval is None else interval
+        while stop_event is None or not stop_event.is_set():
+            await asyncio.sleep(period)
+            await self.flush(db)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Option Chain Snapshot Store
+- Each `get_option_chain` result becomes a ChainFrame: a fixed contract
+  universe (key, strike, expiry, side) plus one float64 row of FIELDS per contract.
+- Every CHAIN_KEYFRAME_EVERY fetches (or when the universe changes) a keyframe
+  stores the universe and the full matrix; in between, a delta stores only the
+  bitwise XOR against the previous fetch. Unchanged cells XOR to zero and
+  changed ones share sign/exponent bytes, so after a byte-plane shuffle zlib
+  shrinks a delta to a small fraction of the chain JSON. Lossless.
+- Rows queue on the caller's thread and are written in one bulk INSERT per
+  flush; reconstruct = latest keyframe <= t, then XOR forward.
+- A delta is only applied on top of seq - 1. A gap (lost flush) skips rows
+  until the next keyframe, and a failed flush drops the queued deltas that
+  chain off the lost rows.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, insert, select
+
+from analytics.pricing import ChainArrays, normalize_iv
+from core.config import settings
+from database.models import DbChainSnapshot
+
+logger = logging.getLogger("ChainStore")
+
+# (section, field) per contract; "row" fields live on the strike row of the payload
+FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("market_data", "ltp"), ("market_data", "close_price"), ("market_data", "volume"),
+    ("market_data", "oi"), ("market_data", "prev_oi"), ("market_data", "bid_price"),
+    ("market_data", "bid_qty"), ("market_data", "ask_price"), ("market_data", "ask_qty"),
+    ("option_greeks", "iv"), ("option_greeks", "delta"), ("option_greeks", "gamma"),
+    ("option_greeks", "theta"), ("option_greeks", "vega"), ("option_greeks", "pop"),
+    ("row", "underlying_spot_price"), ("row", "pcr"),
+)
+_COL = {f: j for j, f in enumerate(FIELDS)}
+ZLIB_LEVEL = 6
+
+Contract = Tuple[str, float, str, bool]   # instrument_key, strike, expiry, is_call
+
+
+def _pack(words: np.ndarray) -> bytes:
+    """uint64/float64 matrix -> byte-plane shuffled zlib blob."""
+    planes = np.ascontiguousarray(words).view(np.uint8).reshape(-1, 8).T
+    return zlib.compress(planes.tobytes(), ZLIB_LEVEL)
+
+
+def _unpack(blob: bytes, shape: Tuple[int, int]) -> np.ndarray:
+    planes = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(8, -1)
+    return np.ascontiguousarray(planes.T).view("<u8").reshape(shape)
+
+
+@dataclass
+class ChainFrame:
+    """One decoded chain: `values[i, j]` is FIELDS[j] of contract i (NaN = absent)."""
+    underlying_key: str
+    contracts: List[Contract]
+    values: np.ndarray
+
+    @classmethod
+    def from_chain(cls, chain_data: List[Dict], expiry: Optional[str] = None,
+                   underlying_key: Optional[str] = None) -> "ChainFrame":
+        rows: List[Tuple[Contract, List[float]]] = []
+        for item in chain_data:
+            strike = float(item.get("strike_price") or 0.0)
+            row_expiry = str(item.get("expiry") or expiry or "")
+            underlying_key = underlying_key or item.get("underlying_key")
+            for side, is_call in (("call_options", True), ("put_options", False)):
+                opt = item.get(side) or {}
+                key = opt.get("instrument_key")
+                if not key:
+                    continue
+                vals = []
+                for section, name in FIELDS:
+                    v = (item if section == "row" else opt.get(section) or {}).get(name)
+                    try:
+                        vals.append(np.nan if v is None else float(v))
+                    except (TypeError, ValueError):
+                        vals.append(np.nan)
+                rows.append(((key, strike, row_expiry, is_call), vals))
+        # Canonical order, so the same chain always diffs cell-for-cell
+        rows.sort(key=lambda r: (r[0][2], r[0][1], not r[0][3]))
+        values = np.array([v for _, v in rows], dtype="<f8").reshape(len(rows), len(FIELDS))
+        return cls(underlying_key or settings.MARKET_KEY_INDEX, [c for c, _ in rows], values)
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    @property
+    def spot(self) -> float:
+        col = self.values[:, _COL[("row", "underlying_spot_price")]]
+        col = col[~np.isnan(col)]
+        return float(col[0]) if len(col) else 0.0
+
+    def to_chain(self) -> List[Dict]:
+        """Back to the `get_option_chain` row shape (absent fields stay absent)."""
+        out: Dict[Tuple[str, float], Dict] = {}
+        for (key, strike, expiry, is_call), vals in zip(self.contracts, self.values.tolist()):
+            row = out.get((expiry, strike))
+            if row is None:
+                row = out[(expiry, strike)] = {"expiry": expiry, "strike_price": strike,
+                                               "underlying_key": self.underlying_key}
+            opt = {"instrument_key": key, "market_data": {}, "option_greeks": {}}
+            for (section, name), v in zip(FIELDS, vals):
+                if v != v:          # NaN
+                    continue
+                if section == "row":
+                    row[name] = v
+                else:
+                    opt[section][name] = v
+            row["call_options" if is_call else "put_options"] = opt
+        return list(out.values())
+
+    def to_arrays(self) -> ChainArrays:
+        """Straight to the pricing layer's arrays, without rebuilding dicts."""
+        def col(name):
+            return np.nan_to_num(self.values[:, _COL[name]])
+
+        return ChainArrays(
+            keys=[c[0] for c in self.contracts],
+            strike=np.array([c[1] for c in self.contracts], dtype=np.float64),
+            is_call=np.array([c[3] for c in self.contracts], dtype=bool),
+            expiry=np.array([c[2] for c in self.contracts], dtype="datetime64[D]"),
+            spot=col(("row", "underlying_spot_price")),
+            ltp=col(("market_data", "ltp")),
+            oi=col(("market_data", "oi")),
+            iv=normalize_iv(col(("option_greeks", "iv"))),
+            delta=col(("option_greeks", "delta")),
+            gamma=col(("option_greeks", "gamma")),
+            theta=col(("option_greeks", "theta")),
+            vega=col(("option_greeks", "vega")),
+        )
+
+
+def _universe_json(frame: ChainFrame) -> Dict:
+    return {"fields": [f"{s}.{n}" for s, n in FIELDS], "contracts": [list(c) for c in frame.contracts]}
+
+
+def _universe_from_json(universe: Dict) -> List[Contract]:
+    if universe.get("fields") != [f"{s}.{n}" for s, n in FIELDS]:
+        raise ValueError("Chain snapshot written with a different field layout")
+    return [(k, float(strike), exp, bool(call)) for k, strike, exp, call in universe["contracts"]]
+
+
+class ChainSnapshotStore:
+    def __init__(self, keyframe_every: Optional[int] = None):
+        self.keyframe_every = settings.CHAIN_KEYFRAME_EVERY if keyframe_every is None else keyframe_every
+        self._last: Dict[Tuple[str, str], Tuple[ChainFrame, int]] = {}   # stream -> (frame, seq)
+        self._pending: Deque[Dict] = deque()
+        self.bytes_raw = 0
+        self.bytes_written = 0
+        self.snapshots_flushed = 0
+
+    # --- Encoding (caller's thread) ---
+    def encode(self, frame: ChainFrame, expiry: str, ts: Optional[datetime] = None) -> Dict:
+        """Diffs `frame` against the stream's previous fetch; returns the queued row."""
+        stream = (frame.underlying_key, expiry)
+        prev = self._last.get(stream)
+        seq = 0
+        if prev is not None and prev[1] + 1 < self.keyframe_every and prev[0].contracts == frame.contracts:
+            seq = prev[1] + 1
+            payload = _pack(frame.values.view("<u8") ^ prev[0].values.view("<u8"))
+        else:
+            payload = _pack(frame.values)
+        self._last[stream] = (frame, seq)
+        row = {
+            "underlying_key": frame.underlying_key, "expiry": expiry,
+            "timestamp": ts or datetime.now(settings.IST).replace(tzinfo=None),
+            "seq": seq, "is_keyframe": seq == 0, "spot_price": frame.spot, "n_contracts": len(frame),
+            "universe": _universe_json(frame) if seq == 0 else None, "payload": payload,
+        }
+        self.bytes_raw += frame.values.nbytes
+        self.bytes_written += len(payload)
+        self._pending.append(row)
+        return row
+
+    def add(self, chain_data: List[Dict], expiry: str, ts: Optional[datetime] = None,
+            underlying_key: Optional[str] = None) -> Optional[Dict]:
+        if not chain_data:
+            return None
+        frame = ChainFrame.from_chain(chain_data, expiry, underlying_key)
+        return self.encode(frame, expiry, ts) if len(frame) else None
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.bytes_raw / self.bytes_written if self.bytes_written else 0.0
+
+    # --- Decoding ---
+    @staticmethod
+    def decode(rows: List) -> List[Tuple[datetime, ChainFrame]]:
+        """Rows of one stream in insert order; deltas without their base are skipped."""
+        out: List[Tuple[datetime, ChainFrame]] = []
+        frame: Optional[ChainFrame] = None
+        seq = -1
+        for r in rows:
+            shape = (r.n_contracts, len(FIELDS))
+            if r.is_keyframe:
+                contracts = _universe_from_json(r.universe)
+                frame = ChainFrame(r.underlying_key, contracts, _unpack(r.payload, shape).view("<f8"))
+            elif frame is None or r.seq != seq + 1 or r.n_contracts != len(frame):
+                # Mid-stream start or a missing row: XOR onto the wrong base would
+                # return a corrupt chain, so wait for the next keyframe
+                frame = None
+                continue
+            else:
+                words = frame.values.view("<u8") ^ _unpack(r.payload, shape)
+                frame = ChainFrame(frame.underlying_key, frame.contracts, words.view("<f8"))
+            seq = r.seq
+            out.append((r.timestamp, frame))
+        return out
+
+    # --- Persistence ---
+    async def flush(self, db) -> int:
+        """One bulk INSERT for every snapshot queued since the last flush."""
+        rows = list(self._pending)
+        self._pending.clear()
+        if not rows or db is None:
+            return 0
+        try:
+            async with db.get_session() as session:
+                await session.execute(insert(DbChainSnapshot), rows)
+                await db.safe_commit(session)
+            self.snapshots_flushed += len(rows)
+            return len(rows)
+        except Exception as e:
+            orphans = self._drop_orphans({(r["underlying_key"], r["expiry"]) for r in rows})
+            logger.error(f"Chain snapshot flush failed ({len(rows)} snapshots dropped, "
+                         f"{orphans} queued deltas discarded): {e}")
+            return 0
+
+    def _drop_orphans(self, broken: set) -> int:
+        """
+        After a lost batch: queued deltas of the affected streams chain off lost
+        rows (they were encoded while the INSERT was awaiting) and are dropped up
+        to the stream's next keyframe; streams left without one re-keyframe.
+        """
+        kept: Deque[Dict] = deque()
+        dropped = 0
+        rooted = set()
+        while self._pending:
+            row = self._pending.popleft()
+            stream = (row["underlying_key"], row["expiry"])
+            if stream in broken and stream not in rooted:
+                if not row["is_keyframe"]:
+                    dropped += 1
+                    continue
+                rooted.add(stream)
+            kept.append(row)
+        self._pending.extendleft(reversed(kept))
+        for stream in broken - rooted:
+            self._last.pop(stream, None)
+        return dropped
+
+    async def flush_loop(self, db, interval: Optional[float] = None, stop_event=None):
+        period = settings.BAR_FLUSH_SEC if interval is None else interval
+        while stop_event is None or not stop_event.is_set():
+            await asyncio.sleep(period)
+            await self.flush(db)
+
+    @staticmethod
+    async def _keyframe_at(session, underlying_key: str, expiry: str, at: datetime) -> Optional[datetime]:
+        t = DbChainSnapshot
+        res = await session.execute(
+            select(t.timestamp).where(and_(t.underlying_key == underlying_key, t.expiry == expiry,
+                                           t.is_keyframe.is_(True), t.timestamp <= at))
+            .order_by(t.timestamp.desc()).limit(1)
+        )
+        return res.scalar()
+
+    async def history(self, db, underlying_key: str, expiry: str, start: datetime,
+                      end: datetime) -> List[Tuple[datetime, ChainFrame]]:
+        """Every fetch in [start, end], rebuilt from the keyframe preceding `start`."""
+        t = DbChainSnapshot
+        async with db.get_session() as session:
+            origin = await self._keyframe_at(session, underlying_key, expiry, start) or start
+            res = await session.execute(
+                select(t).where(and_(t.underlying_key == underlying_key, t.expiry == expiry,
+                                     t.timestamp >= origin, t.timestamp <= end))
+                .order_by(t.timestamp, t.id)
+            )
+            rows = res.scalars().all()
+        return [(ts, f) for ts, f in self.decode(rows) if ts >= start]
+
+    async def reconstruct(self, db, underlying_key: str, expiry: str,
+                          at: Optional[datetime] = None) -> Optional[ChainFrame]:
+        """The chain as of `at` (default: latest stored)."""
+        at = at or datetime.now(settings.IST).replace(tzinfo=None)
+        t = DbChainSnapshot
+        async with db.get_session() as session:
+            origin = await self._keyframe_at(session, underlying_key, expiry, at)
+            if origin is None:
+                return None
+            res = await session.execute(
+                select(t).where(and_(t.underlying_key == underlying_key, t.expiry == expiry,
+                                     t.timestamp >= origin, t.timestamp <= at))
+                .order_by(t.timestamp, t.id)
+            )
+            frames = self.decode(res.scalars().all())
+        return frames[-1][1] if frames else None
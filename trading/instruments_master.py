@@ -6,7 +6,8 @@ import aiohttp
 import pandas as pd
 from datetime import datetime, date
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+import numpy as np
 import pytz
 
 # Configure Logging
@@ -35,6 +36,8 @@ class InstrumentMaster:
         self.last_updated: Optional[datetime] = None
         self._cache_index_fut: Dict[str, str] = {}
         self._cache_options: Dict[str, str] = {}
+        self._chain_index: Dict[Tuple[str, date], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._expiry_index: Dict[Tuple[str, date], List[date]] = {}
         
         # Ensure data dir exists
         DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -181,6 +184,8 @@ class InstrumentMaster:
         self.df["expiry"] = pd.to_datetime(self.df["expiry"], errors='coerce').dt.date
         self.last_updated = datetime.now()
         self._cache_options.clear()
+        self._chain_index.clear()
+        self._expiry_index.clear()
         
         # Verify Data Integrity
         exps = self.get_all_expiries("NIFTY")
@@ -190,8 +195,12 @@ class InstrumentMaster:
             logger.info(f"✅ Data Ready: NIFTY Weekly={exps[0]}, Monthly={exps[-1]}")
 
     def get_all_expiries(self, symbol: str = "NIFTY") -> List[date]:
+        """Listed expiries from today on; scanned once per (symbol, trading day) and cached."""
         if self.df is None: return []
         today = date.today()
+        cache_key = (symbol, today)
+        cached = self._expiry_index.get(cache_key)
+        if cached is not None: return list(cached)
         # Precise Matching
         opts = self.df[
             (self.df["name"] == symbol) | 
@@ -199,7 +208,11 @@ class InstrumentMaster:
             (self.df["trading_symbol"].str.startswith(symbol))
         ]
         valid_expiries = opts[opts["expiry"] >= today]["expiry"].unique()
-        return sorted([d for d in valid_expiries if pd.notnull(d)])
+        expiries = sorted([d for d in valid_expiries if pd.notnull(d)])
+        # Yesterday's entries can never be hit again
+        for key in [k for k in self._expiry_index if k[1] != today]: del self._expiry_index[key]
+        self._expiry_index[cache_key] = expiries
+        return list(expiries)
 
     def get_option_token(self, symbol: str, strike: float, option_type: str, expiry_date: date) -> Optional[str]:
         if self.df is None: return None
@@ -217,3 +230,33 @@ class InstrumentMaster:
             self._cache_options[cache_key] = token
             return token
         return None
+
+    def strike_index(self, symbol: str, expiry_date: date) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sorted strikes with the CE / PE instrument keys per strike (None where a
+        side is not listed). Built once per (symbol, expiry) and cached.
+        """
+        cache_key = (symbol, expiry_date)
+        cached = self._chain_index.get(cache_key)
+        if cached is not None: return cached
+        empty = (np.empty(0), np.empty(0, dtype=object), np.empty(0, dtype=object))
+        if self.df is None: return empty
+
+        opts = self.df[
+            ((self.df["name"] == symbol) | (self.df["underlying_symbol"] == symbol)) &
+            (self.df["expiry"] == expiry_date) &
+            (self.df["instrument_type"].isin(["CE", "PE"]))
+        ]
+        if opts.empty: return empty
+        table = opts.pivot_table(index="strike_price", columns="instrument_type",
+                                 values="instrument_key", aggfunc="first").sort_index()
+        strikes = table.index.to_numpy(dtype=np.float64)
+
+        def side(t):
+            if t not in table:
+                return np.full(len(strikes), None, dtype=object)
+            return table[t].astype(object).where(table[t].notna(), None).to_numpy()
+
+        index = (strikes, side("CE"), side("PE"))
+        self._chain_index[cache_key] = index
+        return index
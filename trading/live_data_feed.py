@@ -2,10 +2,17 @@ import asyncio
 import time
 import logging
 from threading import Thread, Event
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set
 import upstox_client
 from upstox_client import MarketDataStreamerV3
 from core.config import settings
+from analytics.pricing import GreeksEngine, chain_to_arrays
+from analytics.sabr import smile_from_chain
+from trading.tick_buffer import TickRingBuffer
+from trading.bar_aggregator import BarAggregator
+from trading.staleness import StalenessIndex
+from trading.chain_store import ChainSnapshotStore
+from core.metrics import get_metrics
 
 logger = logging.getLogger("LiveFeed")
 
@@ -15,24 +22,157 @@ class LiveDataFeed:
     - Uses 'MarketDataStreamerV3'
     - Auto-reconnect enabled via SDK.
     - Timestamps data for Engine safety.
+    - Ticks land in a preallocated TickRingBuffer (short per-instrument history);
+      rt_quotes entries are updated in place, not re-created per tick.
+    - BarAggregator builds 1m/5m/15m bars from the same ticks (flushed to DB
+      every BAR_FLUSH_SEC when a db_manager is given).
+    - Optional ATMWindowManager keeps the subscription set to a moving strike
+      window; changes go out as one subscribe/unsubscribe batch, and the ids of
+      dropped keys are recycled (InstrumentRegistry.release).
+    - With a db_manager, every refreshed chain is also kept as a keyframe/delta
+      snapshot (ChainSnapshotStore), flushed with the bars.
+    - StalenessIndex stamps every tick on the monotonic clock; the supervisor
+      publishes stale/watched counts, and the index's intraday RV/trend from
+      the bars, to SystemMetrics once per cycle.
+    - Greeks listeners get (keys, greeks_cache) after each chain reprice; tick
+      listeners get (keys, ltps) per message on the feed thread, so they must
+      be cheap (AdvancedRiskManager.attach_feed uses both).
+    - A message that fails to process is counted in `message_errors` and logged
+      (first, then every 1000th); the SDK callback thread never sees the raise.
     """
-    def __init__(self, rt_quotes: Dict[str, Dict], greeks_cache: Dict, sabr_model):
+    def __init__(self, rt_quotes: Dict[str, Dict], greeks_cache: Dict, sabr_model, greek_scorer=None, vol_surface=None,
+                 db_manager=None, atm_window=None, recorder=None):
         self.rt_quotes = rt_quotes
         self.greeks_cache = greeks_cache
+        self.greeks_engine = GreeksEngine(greeks_cache)
+        self.sabr_model = sabr_model
+        self.greek_scorer = greek_scorer
+        self.vol_surface = vol_surface
+        self.ticks = TickRingBuffer(depth=settings.TICK_HISTORY_DEPTH)
+        self.bars = BarAggregator(self.ticks.registry)
+        self.staleness = StalenessIndex(self.ticks.registry)
+        self.chains = ChainSnapshotStore()
+        self.db = db_manager
+        self.atm_window = atm_window  # ATMWindowManager; re-centred from the supervisor loop
+        self.recorder = recorder      # infra.tick_recorder.TickRecorder (optional)
+        self.clock = time.time        # replaced by the replay harness' simulated clock
         self.token = settings.UPSTOX_ACCESS_TOKEN
         self.sub_list: Set[str] = {settings.MARKET_KEY_INDEX, settings.MARKET_KEY_VIX}
+        for key in sorted(self.sub_list): self.ticks.register(key)
+        self.staleness.watch(self.sub_list)
         self.streamer = None
         self.stop_event = Event()
         self.is_connected = False
+        self.message_errors = 0       # messages _on_message could not process (logged, not raised)
+        self.last_error = ""
+        self._greeks_listeners = []
+        self._tick_listeners = []
+
+    def add_greeks_listener(self, callback):
+        self._greeks_listeners.append(callback)
+
+    def add_tick_listener(self, callback):
+        self._tick_listeners.append(callback)
 
     def subscribe_instrument(self, key: str):
-        if not key or key in self.sub_list: return
-        self.sub_list.add(key)
+        if not key: return
+        # Explicit subscriptions (open legs) must survive ATM window moves
+        if self.atm_window is not None: self.atm_window.pin([key])
+        if key in self.sub_list: return
+        self.update_subscriptions({key}, set())
+        logger.info(f"📡 Subscribed: {key}")
+
+    def update_subscriptions(self, add: Set[str], remove: Set[str]):
+        """One diffed batch: a single subscribe and a single unsubscribe call."""
+        add = set(add) - self.sub_list
+        remove = set(remove) & self.sub_list
+        for key in add: self.ticks.register(key)
+        self.staleness.watch(add)
+        self.staleness.unwatch(remove)
+        self.sub_list |= add
+        self.sub_list -= remove
         if self.is_connected and self.streamer:
             try:
-                self.streamer.subscribe([key], "ltpc")
-                logger.info(f"📡 Subscribed: {key}")
-            except Exception: pass
+                if remove: self.streamer.unsubscribe(list(remove))
+                if add: self.streamer.subscribe(list(add), "ltpc")
+            except Exception as e:
+                logger.warning(f"Subscription batch failed (+{len(add)}/-{len(remove)}): {e}")
+        # Dropped keys give their ids back (reused after INSTRUMENT_RECYCLE_SEC)
+        for key in remove: self.ticks.registry.release(key)
+
+    @staticmethod
+    def _underlying(chain_data: List[Dict], underlying_key: Optional[str] = None) -> str:
+        if underlying_key: return underlying_key
+        first = chain_data[0] if chain_data else {}
+        return first.get("underlying_key") or settings.MARKET_KEY_INDEX
+
+    def refresh_greeks(self, chain_data: List[Dict], expiry: str, fetched_at=None,
+                       underlying_key: Optional[str] = None) -> int:
+        """
+        Reprices a fetched chain (one expiry) into the shared greeks_cache.
+        Slices are (underlying_key, expiry): NIFTY and BANKNIFTY chains of one
+        expiry keep separate tables and never evict each other's keys.
+        """
+        underlying = self._underlying(chain_data, underlying_key)
+        slice_id = (underlying, expiry)
+        chain = chain_to_arrays(chain_data, expiry)
+        count = self.greeks_engine.refresh(chain, slice_id)
+        for callback in self._greeks_listeners:
+            try: callback(chain.keys, self.greeks_cache)
+            except Exception as e: logger.error(f"Greeks listener failed: {e}")
+        if self.db is not None:
+            ts = fetched_at.replace(tzinfo=None) if fetched_at is not None else None
+            try: self.chains.add(chain_data, expiry, ts, underlying)
+            except Exception as e: logger.warning(f"Chain snapshot skipped: {e}")
+        if self.greek_scorer is not None and len(chain):
+            model_iv = None
+            if self.sabr_model is not None and slice_id in self.sabr_model.surface:
+                model_iv = self.sabr_model.vol(slice_id, chain.strike)
+            self.greek_scorer.load_chain(chain, model_iv, fetched_at, underlying)
+        return count
+
+    def refresh_chains(self, batch) -> int:
+        """
+        Applies every chain that arrived in an EnhancedUpstoxAPI.get_option_chains batch.
+        Greeks go out chain by chain; the smiles of the whole batch are then fitted
+        in one SABR call, so every expiry of every underlying runs in the pool at once.
+        """
+        count = 0
+        smiles = {}
+        for f in batch.fetches.values():
+            if not f.ok or not f.data: continue
+            count += self.refresh_greeks(f.data, f.expiry_date, f.fetched_at, f.instrument_key)
+            if self.sabr_model is not None or self.vol_surface is not None:
+                smiles.update(self._smiles(f.data, f.expiry_date, f.instrument_key))
+        self._publish_surface(smiles)
+        return count
+
+    def _smiles(self, chain_data: List[Dict], expiry: str, underlying_key: Optional[str] = None) -> Dict:
+        """{(underlying_key, expiry): SmileSlice} for one fetched chain."""
+        underlying = self._underlying(chain_data, underlying_key)
+        return smile_from_chain(chain_to_arrays(chain_data, expiry), underlying_key=underlying)
+
+    def refresh_surface(self, chain_data: List[Dict], expiry: str, underlying_key: Optional[str] = None) -> int:
+        """
+        Parses the chain into smiles once, then updates the cached VolSurface
+        in place and recalibrates SABR (keyed by (underlying_key, expiry)).
+        Returns slices on the SABR surface.
+        """
+        if self.sabr_model is None and self.vol_surface is None: return 0
+        return self._publish_surface(self._smiles(chain_data, expiry, underlying_key))
+
+    def _publish_surface(self, smiles: Dict) -> int:
+        if not smiles: return 0
+        if self.vol_surface is not None:
+            # Expired fronts go first, so atm_iv/skew/metrics read the live front slice
+            self.vol_surface.drop_expired()
+            self.vol_surface.update(smiles)
+        if self.sabr_model is None: return 0
+        try:
+            return len(self.sabr_model.calibrate(smiles))
+        except Exception as e:
+            logger.error(f"SABR Calibration Failed: {e}")
+            return 0
 
     def update_token(self, new_token: str):
         self.token = new_token
@@ -46,21 +186,68 @@ class LiveDataFeed:
                 self.streamer.subscribe(list(self.sub_list), "ltpc")
         except Exception: pass
 
+    @staticmethod
+    def _parse_feed(feed: Dict):
+        """(ltpc, volume, oi) from either an 'ltpc' or a 'fullFeed' entry."""
+        if "ltpc" in feed:
+            return feed["ltpc"], 0, 0.0
+        full = feed.get("fullFeed")
+        if not full: return None, 0, 0.0
+        ff = full.get("marketFF") or full.get("indexFF") or {}
+        return ff.get("ltpc"), int(ff.get("vtt") or 0), float(ff.get("oi") or 0.0)
+
     def _on_message(self, message, *args):
         try:
             if "feeds" not in message: return
-            now = time.time()
+            now = self.clock()
+            mono = self.staleness.clock()
+            ticked: List[str] = []
+            prices: List[float] = []
             for key, feed in message["feeds"].items():
-                if "ltpc" in feed:
-                    ltp = feed["ltpc"].get("ltp")
-                    if ltp:
-                        # CRITICAL: TIMESTAMP FOR ENGINE
-                        # Stores both price and timestamp for stale checks
-                        self.rt_quotes[key] = {
-                            "ltp": float(ltp),
-                            "last_updated": now
-                        }
-        except Exception: pass
+                ltpc, volume, oi = self._parse_feed(feed)
+                if not ltpc: continue
+                ltp = ltpc.get("ltp")
+                if ltp:
+                    ltp = float(ltp)
+                    ltt = int(ltpc.get("ltt") or 0)
+                    iid = self.ticks.append_key(key, now, ltp, ltt, volume, oi)
+                    self.staleness.touch(iid, mono)
+                    self.bars.on_tick(iid, ltt / 1000.0 if ltt else now, ltp, volume, oi)
+                    if self.recorder is not None:
+                        self.recorder.record(key, now, ltp, ltt, volume, oi)
+                    # CRITICAL: TIMESTAMP FOR ENGINE
+                    # Stores both price and timestamp for stale checks
+                    quote = self.rt_quotes.get(key)
+                    if quote is None:
+                        self.rt_quotes[key] = {"ltp": ltp, "last_updated": now}
+                    else:
+                        quote["ltp"] = ltp
+                        quote["last_updated"] = now
+                    ticked.append(key)
+                    prices.append(ltp)
+            if ticked:
+                self._dispatch_ticks(ticked, prices)
+        except Exception as e:
+            # Never let one bad message kill the SDK thread, but never hide it either
+            self.message_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.message_errors == 1 or self.message_errors % 1000 == 0:
+                logger.error(f"Feed message failed ({self.message_errors} so far): {self.last_error}", exc_info=True)
+
+    def _dispatch_ticks(self, keys: List[str], prices: List[float]):
+        if self.greek_scorer is not None:
+            self._score_ticks(keys, prices)
+        for callback in self._tick_listeners:
+            try: callback(keys, prices)
+            except Exception as e: logger.error(f"Tick listener failed: {e}")
+
+    def _score_ticks(self, keys: List[str], prices: List[float]):
+        # Only the contracts in this message are re-scored; each underlying moves its own spot
+        scorer = self.greek_scorer
+        underlyings = scorer.underlyings
+        for key, price in zip(keys, prices):
+            if key in underlyings: scorer.on_underlying(price, key)
+        scorer.on_ticks(keys, prices)
 
     def _on_error(self, error, *args):
         logger.warning(f"WS Error: {error}")
@@ -91,6 +278,11 @@ class LiveDataFeed:
 
     async def start(self):
         logger.info("🚀 Feed Supervisor Started")
+        if self.recorder is not None:
+            self.recorder.start()
+        if self.db is not None:
+            asyncio.create_task(self.bars.flush_loop(self.db, stop_event=self.stop_event))
+            asyncio.create_task(self.chains.flush_loop(self.db, stop_event=self.stop_event))
         while not self.stop_event.is_set():
             if not self.is_connected:
                 # Launch thread if dead
@@ -98,11 +290,25 @@ class LiveDataFeed:
                 t.start()
                 # Wait before checking again
                 await asyncio.sleep(5) 
+            if self.atm_window is not None and self.is_connected:
+                spot = self.rt_quotes.get(settings.MARKET_KEY_INDEX, {}).get("ltp")
+                if spot:
+                    try: self.atm_window.update(spot)
+                    except Exception as e: logger.error(f"ATM window update failed: {e}")
+            metrics = get_metrics()
+            metrics.update_staleness(*self.staleness.counts(settings.STALE_DATA_SEC))
+            index = settings.MARKET_KEY_INDEX
+            metrics.update_intraday(self.bars.realized_vol(index), self.bars.trend(index))
             await asyncio.sleep(1)
 
     async def stop(self):
         self.stop_event.set()
         self.disconnect()
+        self.bars.close_all()
+        await self.bars.flush(self.db)
+        await self.chains.flush(self.db)
+        if self.recorder is not None:
+            self.recorder.stop()
 
     def disconnect(self):
         if self.streamer:
@@ -5,6 +5,9 @@ LiveOrderExecutor 20.1 – Production Hardened & Bug Fixed
 - Correct Freeze Slicing (Shares vs Shares)
 - Max-slippage guard with market-fallback
 - Rollback state-machine – never leave naked risk
+- Quotes from the websocket QuoteCache first; REST (the API's QuoteService)
+  only for stale / unsubscribed keys. Pass the LiveDataFeed and/or
+  WebSocketState and the executor builds the cache over them.
 """
 from __future__ import annotations
 import asyncio
@@ -15,6 +18,7 @@ from typing import List, Tuple, Dict, Optional, Any
 from core.models import MultiLegTrade, Position
 from core.config import settings
 from core.metrics import get_metrics            # NEW
+from trading.quote_cache import QuoteCache
 
 logger = logging.getLogger("LiveExecutor")
 
@@ -26,9 +30,13 @@ class RollbackFailure(RuntimeError):
     """Raised when rollback itself fails – engine must shut down."""
 
 class LiveOrderExecutor:
-    def __init__(self, api_client, order_manager) -> None:
+    def __init__(self, api_client, order_manager, quote_cache: Optional[QuoteCache] = None,
+                 feed=None, ws_state=None) -> None:
         self.api = api_client
         self.om = order_manager
+        if quote_cache is None:
+            quote_cache = QuoteCache.from_sources(feed, ws_state)
+        self.quote_cache = quote_cache
         self.metrics = get_metrics()            # NEW
 
     async def execute_with_hedge_priority(
@@ -113,19 +121,19 @@ class LiveOrderExecutor:
     async def _fetch_quotes(self, tokens: List[str]) -> Dict[str, float]:
         if not tokens:
             return {}
+        quotes: Dict[str, float] = {}
+        if self.quote_cache is not None:
+            quotes, tokens = self.quote_cache.fresh(tokens)
+            if not tokens:
+                return quotes
+            logger.info(f"Quote cache: {len(quotes)} fresh, {len(tokens)} via REST")
         try:
-            res = await self.api.get_market_quote_ohlc(",".join(tokens), "1d")
-            if res.get("status") != "success":
-                return {}
-            quotes = {}
-            for tok, val in res.get("data", {}).items():
-                ltp = val.get("last_price") or (val.get("ohlc") or {}).get("close")
-                if ltp:
-                    quotes[tok] = float(ltp)
+            # Shared, chunked, coalesced with any other caller quoting the same keys
+            quotes.update(await self.api.quotes.ltp(tokens))
             return quotes
         except Exception:
             logger.error("Quote fetch failed silently")
-            return {}
+            return quotes
 
     def _slice_quantity(self, qty: int) -> List[int]:
         freeze_limit = getattr(settings, "NIFTY_FREEZE_QTY", DEFAULT_FREEZE_QTY)
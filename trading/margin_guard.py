@@ -1,7 +1,8 @@
 import aiohttp
 import asyncio
+import time
 from datetime import datetime
-from typing import Tuple, Optional, Dict, List, Any
+from typing import Tuple, Optional, Dict, List, Any, Set
 from sqlalchemy import select, desc
 from core.models import MultiLegTrade
 from core.config import settings
@@ -9,6 +10,7 @@ from utils.logger import setup_logger
 from trading.api_client import EnhancedUpstoxAPI
 from database.manager import HybridDatabaseManager
 from database.models import DbMarginHistory
+from trading.margin_estimator import MarginEstimator
 
 logger = setup_logger("MarginGuard")
 
@@ -18,6 +20,10 @@ class MarginGuard:
     - Fixed Sanity Check Math (Per-Lot Comparison).
     - VIX-aware fallback with historical sanity checks.
     - Records real margin data to DB.
+    - Local SPAN-like estimator answers checks; the broker API only verifies
+      it every MARGIN_VERIFY_SEC and feeds the calibration.
+    - Available funds are refreshed every MARGIN_REFRESH_SEC, awaited before the
+      decision; the first check also seeds the estimator from DbMarginHistory.
     """
     def __init__(self, api_client: EnhancedUpstoxAPI, db_manager: Optional[HybridDatabaseManager] = None):
         self.api = api_client
@@ -34,27 +40,91 @@ class MarginGuard:
             "BULL_PUT_SPREAD": 45000,
             "BEAR_CALL_SPREAD": 45000,
         }
+        self.estimator = MarginEstimator()
+        self.last_verified = 0.0
+        self.last_funds_refresh = 0.0
+        self.history_loaded = False
+        self._refresh_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()  # strong refs: the loop only keeps weak ones
 
-    async def is_margin_ok(self, trade: MultiLegTrade, current_vix: Optional[float] = None) -> Tuple[bool, float]:
+    async def is_margin_ok(
+        self, trade: MultiLegTrade, current_vix: Optional[float] = None, spot: Optional[float] = None
+    ) -> Tuple[bool, float]:
         # GUARD: zero legs or zero lot size
         if not trade.legs or settings.LOT_SIZE <= 0:
             logger.error("Margin check aborted: empty legs or LOT_SIZE=0")
             return False, float('inf')
-        return await self._live_mode_check(trade, current_vix)
+        if not spot:
+            return await self._live_mode_check(trade, current_vix)
+        return await self._local_check(trade, current_vix, spot)
+
+    async def _local_check(
+        self, trade: MultiLegTrade, current_vix: Optional[float], spot: float
+    ) -> Tuple[bool, float]:
+        if not await self._ensure_fresh_state():
+            # Funds could not be refreshed: decide straight from the broker, as before
+            return await self._live_mode_check(trade, current_vix)
+        vix = current_vix if current_vix is not None else self.default_vix_safety
+        required, raw = self.estimator.estimate(trade, spot, vix)
+        if time.time() - self.last_verified >= settings.MARGIN_VERIFY_SEC:
+            self.last_verified = time.time()
+            self._spawn(self._verify_estimate(trade, current_vix, raw))
+        available = self.available_margin
+        required_with_buffer = required * 1.10
+        is_sufficient = available >= required_with_buffer
+        if not is_sufficient:
+            logger.warning(
+                f"❌ Margin Shortfall (est): Req=₹{required_with_buffer:,.0f}, Avail=₹{available:,.0f}"
+            )
+        return is_sufficient, required
+
+    def estimate_margins(self, trades: List[MultiLegTrade], spot: float, vix: float):
+        """Calibrated margin for many candidates at once (strategy search); no API calls."""
+        return self.estimator.estimate_many(trades, spot, vix)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _verify_estimate(self, trade: MultiLegTrade, current_vix: Optional[float], raw_estimate: float):
+        """Periodic broker check: records the pair to DbMarginHistory and recalibrates."""
+        try:
+            res_margin = await self.api._request_with_retry(
+                "POST", "margin_calc", json={"instruments": self._margin_payload(trade)}
+            )
+            if res_margin.get("status") != "success":
+                return
+            required = res_margin.get("data", {}).get("required_margin", 0.0)
+            if required <= 0:
+                return
+            before = self.estimator.scale_for(trade.strategy_type.value) * raw_estimate
+            self.estimator.calibrate(trade.strategy_type.value, required, raw_estimate)
+            logger.info(
+                f"📏 Margin verify {trade.strategy_type.value}: broker ₹{required:,.0f} vs est ₹{before:,.0f} "
+                f"({(before / required - 1) * 100:+.1f}%)"
+            )
+            if self.db:
+                await self._record_margin_history(trade, required, current_vix, raw_estimate)
+        except Exception as e:
+            logger.warning(f"Margin verification failed: {e}")
+
+    @staticmethod
+    def _margin_payload(trade: MultiLegTrade) -> List[Dict[str, Any]]:
+        return [{
+            "instrument_key": leg.instrument_key,
+            "quantity": abs(leg.quantity),
+            "transaction_type": "BUY" if leg.quantity > 0 else "SELL",
+            "product": "I",
+            "price": float(leg.entry_price) if leg.entry_price > 0 else 0.0,
+        } for leg in trade.legs]
 
     async def _live_mode_check(
         self, trade: MultiLegTrade, current_vix: Optional[float]
     ) -> Tuple[bool, float]:
         try:
-            instruments_payload = []
-            for leg in trade.legs:
-                instruments_payload.append({
-                    "instrument_key": leg.instrument_key,
-                    "quantity": abs(leg.quantity),
-                    "transaction_type": "BUY" if leg.quantity > 0 else "SELL",
-                    "product": "I",
-                    "price": float(leg.entry_price) if leg.entry_price > 0 else 0.0,
-                })
+            instruments_payload = self._margin_payload(trade)
             res_margin = await self.api._request_with_retry(
                 "POST", "margin_calc", json={"instruments": instruments_payload}
             )
@@ -68,7 +138,7 @@ class MarginGuard:
             required_margin = margin_data.get("required_margin", 0.0)
             if self.db and required_margin > 0:
                 try:
-                    asyncio.create_task(self._record_margin_history(trade, required_margin, current_vix))
+                    self._spawn(self._record_margin_history(trade, required_margin, current_vix))
                 except Exception as e:
                     logger.error(f"Failed to record margin history: {e}")
             funds = await self.api._request_with_retry("GET", "funds_margin")
@@ -164,7 +234,9 @@ class MarginGuard:
             logger.critical(f"Fallback margin check crashed: {e}", exc_info=True)
             return False, float('inf')
 
-    async def _record_margin_history(self, trade: MultiLegTrade, margin: float, vix: Optional[float]):
+    async def _record_margin_history(
+        self, trade: MultiLegTrade, margin: float, vix: Optional[float], estimated: Optional[float] = None
+    ):
         if not self.db:
             return
         try:
@@ -177,6 +249,7 @@ class MarginGuard:
                     strategy_type=trade.strategy_type.value,
                     lots=total_lots,
                     required_margin=margin_per_lot,
+                    estimated_margin=(estimated / total_lots) if estimated else None,
                     vix_at_calc=vix if vix else 0.0,
                     timestamp=datetime.utcnow(),
                 )
@@ -201,7 +274,48 @@ class MarginGuard:
         except Exception:
             return None
 
-    async def refresh_available_margin(self):
+    async def calibrate_from_history(self, limit: int = 500) -> int:
+        """Seeds the local estimator from recorded broker vs estimate pairs."""
+        if not self.db:
+            return 0
+        try:
+            async with self.db.get_session() as session:
+                stmt = (
+                    select(DbMarginHistory.strategy_type, DbMarginHistory.required_margin,
+                           DbMarginHistory.estimated_margin)
+                    .where(DbMarginHistory.estimated_margin.is_not(None))
+                    .order_by(desc(DbMarginHistory.timestamp))
+                    .limit(limit)
+                )
+                rows = (await session.execute(stmt)).all()
+            return self.estimator.load_history(reversed(rows))
+        except Exception as e:
+            logger.warning(f"Margin calibration load failed: {e}")
+            return 0
+
+    def _funds_fresh(self) -> bool:
+        return time.time() - self.last_funds_refresh < settings.MARGIN_REFRESH_SEC
+
+    async def _ensure_fresh_state(self) -> bool:
+        """
+        True once funds are no older than MARGIN_REFRESH_SEC. The stored
+        calibration is loaded before the first decision.
+        """
+        if self._funds_fresh():
+            return True
+        async with self._refresh_lock:
+            # Concurrent checks share one refresh
+            if self._funds_fresh():
+                return True
+            if not self.history_loaded and self.db:
+                self.history_loaded = True
+                await self.calibrate_from_history()
+            if await self.refresh_available_margin():
+                self.last_funds_refresh = time.time()
+                return True
+            return False
+
+    async def refresh_available_margin(self) -> bool:
         try:
             funds = await self.api._request_with_retry("GET", "funds_margin")
             if funds.get("status") == "success":
@@ -212,5 +326,7 @@ class MarginGuard:
                     if val is not None:
                         self.available_margin = val
                         logger.debug(f"Available margin refreshed: ₹{self.available_margin:,.0f}")
+                        return True
         except Exception as e:
             logger.warning(f"Margin refresh failed: {e}")
+        return False
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Position Book
+- Every open leg owns a slot in flat NumPy columns (qty + Greeks + contract terms).
+- Portfolio Delta/Gamma/Theta/Vega are running totals: a tick applies
+  (new - old) * qty for the legs it touches instead of re-walking every trade.
+- Totals are re-summed from the columns every RESUM_EVERY updates to shed float drift.
+- Non-finite Greeks (NaN from a contract without a usable IV) never reach the
+  columns: the leg keeps its last finite values, so one bad row cannot turn
+  the totals to NaN and silently disable every limit compared against them.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from analytics.scenarios import BookLegs, make_legs
+from core.models import MultiLegTrade, Position, TradeStatus
+
+logger = logging.getLogger("PositionBook")
+
+GREEKS = ("delta", "gamma", "theta", "vega")
+RESUM_EVERY = 10_000
+
+
+class PositionBook:
+    """
+    Slot store keyed by (trade_id, instrument_key). The same instrument can sit
+    in several trades, so Greek ticks fan out through `_by_instrument`.
+    """
+    def __init__(self, capacity: int = 64):
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._by_instrument: Dict[str, List[int]] = {}
+        self._by_trade: Dict[str, List[int]] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._updates = 0
+        self.rejected = 0  # ticks dropped for non-finite Greeks
+        self.totals = np.zeros(len(GREEKS))
+        self._alloc(capacity)
+
+    # --- Storage ---
+    def _alloc(self, capacity: int):
+        def grow(name: str, fill, dtype=np.float64, shape=()):
+            old = getattr(self, name, None)
+            arr = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old is not None:
+                arr[:len(old)] = old
+            setattr(self, name, arr)
+        grow("greeks", 0.0, shape=(len(GREEKS),))
+        grow("qty", 0.0)
+        grow("strike", 0.0)
+        grow("iv", 0.0)
+        grow("ltp", 0.0)
+        grow("is_call", False, bool)
+        grow("expiry", np.datetime64("NaT"), "datetime64[D]")
+        grow("active", False, bool)
+        keys: List[Optional[str]] = getattr(self, "keys", [])
+        self.keys = keys + [None] * (capacity - len(keys))
+        self._capacity = capacity
+
+    def _take_slot(self, trade_id: str, key: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == self._capacity:
+                self._alloc(self._capacity * 2)
+            slot = self._size
+            self._size += 1
+        self._slots[(trade_id, key)] = slot
+        self._by_instrument.setdefault(key, []).append(slot)
+        self._by_trade.setdefault(trade_id, []).append(slot)
+        self.keys[slot] = key
+        self.active[slot] = True
+        return slot
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, trade_id: str) -> bool:
+        return trade_id in self._by_trade
+
+    @property
+    def instruments(self):
+        """Instrument keys held by at least one leg (live view)."""
+        return self._by_instrument.keys()
+
+    # --- Totals ---
+    @property
+    def delta(self) -> float:
+        return float(self.totals[0])
+
+    @property
+    def gamma(self) -> float:
+        return float(self.totals[1])
+
+    @property
+    def theta(self) -> float:
+        return float(self.totals[2])
+
+    @property
+    def vega(self) -> float:
+        return float(self.totals[3])
+
+    def _apply(self, slot: int, qty: float, greeks: np.ndarray):
+        # Running totals move by the change in this slot's contribution only
+        self.totals += qty * greeks - self.qty[slot] * self.greeks[slot]
+        self.qty[slot] = qty
+        self.greeks[slot] = greeks
+        self._updates += 1
+        if self._updates >= RESUM_EVERY:
+            self.resum()
+
+    def resum(self):
+        live = self.active[:self._size]
+        self.totals = (self.greeks[:self._size][live] * self.qty[:self._size][live, None]).sum(axis=0)
+        self._updates = 0
+
+    # --- Writers ---
+    def upsert_leg(self, trade: MultiLegTrade, leg: Position):
+        slot = self._slots.get((trade.id, leg.instrument_key))
+        if slot is None:
+            slot = self._take_slot(trade.id, leg.instrument_key)
+        self.strike[slot] = leg.strike
+        self.is_call[slot] = leg.option_type.upper() in ("CE", "CALL")
+        self.expiry[slot] = np.datetime64(trade.expiry_date, "D")
+        self.ltp[slot] = leg.current_price
+        g = leg.current_greeks
+        if np.isfinite(g.iv):
+            self.iv[slot] = g.iv
+        new = np.array((g.delta, g.gamma, g.theta, g.vega), dtype=np.float64)
+        self._apply(slot, float(leg.quantity), np.where(np.isfinite(new), new, self.greeks[slot]))
+
+    def update_greeks(self, instrument_key: str, delta: float, gamma: float, theta: float, vega: float,
+                      iv: Optional[float] = None) -> int:
+        """O(1) per leg holding this instrument (usually one); a non-finite tick is dropped."""
+        slots = self._by_instrument.get(instrument_key)
+        if not slots:
+            return 0
+        g = np.array((delta, gamma, theta, vega), dtype=np.float64)
+        if not np.isfinite(g).all():
+            self.rejected += 1
+            logger.debug(f"Non-finite Greeks for {instrument_key} dropped: {g}")
+            return 0
+        if iv is not None and not np.isfinite(iv):
+            iv = None
+        for slot in slots:
+            self._apply(slot, self.qty[slot], g)
+            if iv is not None:
+                self.iv[slot] = iv
+        return len(slots)
+
+    def update_price(self, instrument_key: str, ltp: float):
+        for slot in self._by_instrument.get(instrument_key, ()):
+            self.ltp[slot] = ltp
+
+    def update_quantity(self, trade_id: str, instrument_key: str, qty: float) -> bool:
+        slot = self._slots.get((trade_id, instrument_key))
+        if slot is None:
+            return False
+        self._apply(slot, float(qty), self.greeks[slot].copy())
+        return True
+
+    def _release(self, trade_id: str, slot: int):
+        self._apply(slot, 0.0, np.zeros(len(GREEKS)))
+        key = self.keys[slot]
+        self._slots.pop((trade_id, key), None)
+        held = self._by_instrument.get(key)
+        if held is not None:
+            held.remove(slot)
+            if not held:
+                del self._by_instrument[key]
+        self.keys[slot] = None
+        self.active[slot] = False
+        self._free.append(slot)
+
+    def remove_trade(self, trade_id: str) -> int:
+        slots = self._by_trade.pop(trade_id, [])
+        for slot in slots:
+            self._release(trade_id, slot)
+        return len(slots)
+
+    def _reconcile_legs(self, trade: MultiLegTrade):
+        """Diffs a held trade's (instrument_key, quantity) legs against its slots."""
+        held = {self.keys[slot]: slot for slot in self._by_trade[trade.id]}
+        for leg in trade.legs:
+            if not leg.quantity:
+                continue
+            slot = held.pop(leg.instrument_key, None)
+            if slot is None:
+                self.upsert_leg(trade, leg)           # rolled / added leg
+            elif self.qty[slot] != leg.quantity:
+                self.update_quantity(trade.id, leg.instrument_key, leg.quantity)
+        for slot in held.values():                    # closed / rolled-out legs
+            self._by_trade[trade.id].remove(slot)
+            self._release(trade.id, slot)
+
+    def sync(self, trades: Iterable[MultiLegTrade]):
+        """
+        Reconciles trade membership and leg quantities: adds open trades the book
+        does not hold yet, drops the ones no longer open, and for held trades
+        upserts or releases the legs whose (instrument_key, quantity) changed
+        (partial exits, rolls). Greeks of unchanged legs are left alone; they
+        move through update_greeks / update_price.
+        """
+        open_ids = set()
+        for trade in trades:
+            if trade.status != TradeStatus.OPEN:
+                continue
+            open_ids.add(trade.id)
+            if trade.id in self._by_trade:
+                self._reconcile_legs(trade)
+                continue
+            for leg in trade.legs:
+                self.upsert_leg(trade, leg)
+        for trade_id in [t for t in self._by_trade if t not in open_ids]:
+            self.remove_trade(trade_id)
+
+    # --- Readers ---
+    def legs(self, spot: float, now: Optional[datetime] = None, rate: Optional[float] = None) -> BookLegs:
+        """Live slots as scenario-grid columns (no trade/leg walk)."""
+        live = np.flatnonzero(self.active[:self._size] & (self.qty[:self._size] != 0))
+        return make_legs([self.keys[i] for i in live], self.strike[live], self.is_call[live],
+                         self.qty[live], self.expiry[live], self.iv[live], self.ltp[live], spot, now, rate)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Websocket-Fed Quote Cache
+- Serves LTPs straight from the live feed (LiveDataFeed.rt_quotes) and/or
+  WebSocketState.market, each vouched for by its own StalenessIndex.
+- A key is served only if its source ticked within QUOTE_MAX_AGE_SEC
+  (one vectorized freshness check per source); stale or never-subscribed keys
+  are handed back as "missing" for a REST fallback (QuoteService).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger("QuoteCache")
+
+PriceFn = Callable[[str], Optional[float]]
+
+
+def _as_price(value) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("ltp", value.get("last_price"))
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+
+class QuoteCache:
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = settings.QUOTE_MAX_AGE_SEC if max_age is None else max_age
+        self._sources: List[Tuple[str, object, PriceFn]] = []   # (name, StalenessIndex, price_of)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_sources(cls, feed=None, ws_state=None, max_age: Optional[float] = None) -> Optional["QuoteCache"]:
+        """Cache over whichever live sources exist (feed first); None when there are none."""
+        if feed is None and ws_state is None:
+            return None
+        cache = cls(max_age)
+        if feed is not None:
+            cache.add_feed(feed)
+        if ws_state is not None:
+            cache.add_ws_state(ws_state)
+        return cache
+
+    # --- Sources ---
+    def add_source(self, name: str, staleness, price_of: PriceFn) -> "QuoteCache":
+        self._sources.append((name, staleness, price_of))
+        return self
+
+    def add_feed(self, feed) -> "QuoteCache":
+        quotes = feed.rt_quotes
+        return self.add_source("feed", feed.staleness, lambda k: _as_price(quotes.get(k)))
+
+    def add_ws_state(self, ws_state) -> "QuoteCache":
+        # Point lookups on the live book: no snapshot copy per quote
+        return self.add_source("ws_state", ws_state.staleness, lambda k: _as_price(ws_state.market_value(k)))
+
+    # --- Reads ---
+    def fresh(self, keys: Iterable[str], max_age: Optional[float] = None) -> Tuple[Dict[str, float], List[str]]:
+        """({key: ltp} for keys some source ticked within max_age, [keys it could not vouch for])."""
+        max_age = self.max_age if max_age is None else max_age
+        missing = [k for k in dict.fromkeys(keys) if k]
+        quotes: Dict[str, float] = {}
+        for _, staleness, price_of in self._sources:
+            if not missing:
+                break
+            stale = set(staleness.stale(max_age, missing))
+            still = []
+            for key in missing:
+                price = None if key in stale else price_of(key)
+                if price is None:
+                    still.append(key)
+                else:
+                    quotes[key] = price
+            missing = still
+        self.hits += len(quotes)
+        self.misses += len(missing)
+        return quotes, missing
+
+    async def ltp(self, keys: Iterable[str], rest=None, max_age: Optional[float] = None) -> Dict[str, float]:
+        """Cached where fresh, `rest.ltp(missing)` (a QuoteService) for the rest."""
+        quotes, missing = self.fresh(keys, max_age)
+        if missing and rest is not None:
+            quotes.update(await rest.ltp(missing))
+        return quotes
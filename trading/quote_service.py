@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Batched Quote Service
+- One entry point for REST LTPs: any number of keys, split into chunks of
+  QUOTE_BATCH_MAX (the broker's per-request limit) fired concurrently.
+- Singleflight: a key already in flight is never requested twice; callers
+  arriving within QUOTE_COALESCE_MS share one request for the union of their keys.
+- Results are keyed by instrument_key ("NSE_FO|43919"); the broker answers
+  with "NSE_FO:NIFTY..." keys and the token inside each value.
+- A key with no quote (failed chunk, unknown key, cancelled flush) is simply
+  absent; TokenExpiredError reaches every caller waiting on the chunk.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger("QuoteService")
+
+
+class QuoteService:
+    def __init__(self, api, batch_max: Optional[int] = None, coalesce_ms: Optional[float] = None):
+        self.api = api
+        self.batch_max = settings.QUOTE_BATCH_MAX if batch_max is None else batch_max
+        self.coalesce_sec = (settings.QUOTE_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self.requests_sent = 0
+        self.keys_requested = 0
+        self.keys_shared = 0
+
+    async def ltp(self, keys: Iterable[str]) -> Dict[str, float]:
+        keys = [k for k in dict.fromkeys(keys) if k]
+        if not keys:
+            return {}
+        loop = asyncio.get_running_loop()
+        futures: Dict[str, asyncio.Future] = {}
+        for key in keys:
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._inflight[key] = loop.create_future()
+                self._pending.append(key)
+            else:
+                self.keys_shared += 1
+            futures[key] = fut
+        if self._pending and self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush())
+        # shield: one caller giving up must not cancel the request for everyone else
+        prices = await asyncio.gather(*(asyncio.shield(f) for f in futures.values()))
+        return {k: p for k, p in zip(futures, prices) if p is not None}
+
+    async def _flush(self):
+        keys: List[str] = []
+        try:
+            await asyncio.sleep(self.coalesce_sec)
+            keys, self._pending, self._flusher = self._pending, [], None
+            chunks = [keys[i:i + self.batch_max] for i in range(0, len(keys), self.batch_max)]
+            await asyncio.gather(*(self._fetch_chunk(c) for c in chunks))
+        finally:
+            if not keys:
+                # Cancelled while coalescing: the batch never went out
+                keys, self._pending, self._flusher = self._pending, [], None
+            # Nobody waiting on these keys may hang, whatever interrupted the flush
+            self._resolve(keys, {})
+
+    async def _fetch_chunk(self, keys: List[str]):
+        from trading.api_client import TokenExpiredError  # api_client imports this module
+        quotes: Dict[str, float] = {}
+        error: Optional[BaseException] = None
+        try:
+            self.requests_sent += 1
+            self.keys_requested += len(keys)
+            res = await self.api.get_market_quote_ltp(",".join(keys))
+            if res.get("status") == "success":
+                quotes = self._parse(res.get("data") or {})
+            else:
+                logger.warning(f"Quote chunk failed ({len(keys)} keys): {res.get('message')}")
+        except TokenExpiredError as e:
+            error = e  # re-raised in every waiting caller, as _fetch_chain does for chains
+        except Exception as e:
+            logger.error(f"Quote chunk exception ({len(keys)} keys): {e}")
+        finally:
+            self._resolve(keys, quotes, error)
+
+    def _resolve(self, keys: List[str], quotes: Dict[str, float], error: Optional[BaseException] = None):
+        for key in keys:
+            fut = self._inflight.pop(key, None)
+            if fut is None or fut.done():
+                continue
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(quotes.get(key))
+
+    @staticmethod
+    def _parse(data: Dict) -> Dict[str, float]:
+        quotes: Dict[str, float] = {}
+        for name, val in data.items():
+            ltp = val.get("last_price") or (val.get("ohlc") or {}).get("close")
+            if not ltp:
+                continue
+            key = val.get("instrument_token") or name.replace(":", "|", 1)
+            quotes[key] = float(ltp)
+        return quotes
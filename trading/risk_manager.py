@@ -1,9 +1,12 @@
 import logging
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Mapping, Tuple
 from datetime import datetime
 from core.config import settings
 from core.models import MultiLegTrade, TradeStatus
 from core.enums import ExitReason
+from analytics.scenarios import ScenarioResult, scenario_grid, legs_from_trades
+from analytics.tail_risk import GarchParams, TailRiskEngine, TailRiskResult
+from trading.position_book import PositionBook
 
 logger = logging.getLogger("RiskManager")
 
@@ -11,22 +14,89 @@ class AdvancedRiskManager:
     def __init__(self, db_manager, alert_system):
         self.db = db_manager
         self.alerts = alert_system
-        self.portfolio_delta = 0.0
-        self.portfolio_vega = 0.0
-        self.portfolio_gamma = 0.0
+        self.book = PositionBook()
         self.daily_pnl = 0.0
         self.peak_equity = 0.0
         self.is_halted = False
+        self.scenario: Optional[ScenarioResult] = None
+        self.tail_risk = TailRiskEngine()
+        self.worst_case_loss = 0.0
+        self._feed = None
 
-    def update_portfolio_state(self, trades: List[MultiLegTrade], total_pnl: float):
+    def update_portfolio_state(self, trades: List[MultiLegTrade], total_pnl: float, spot: Optional[float] = None):
         self.daily_pnl = total_pnl
         self.peak_equity = max(self.peak_equity, total_pnl)
         
-        self.portfolio_delta = sum(t.trade_delta for t in trades if t.status == TradeStatus.OPEN)
-        self.portfolio_vega = sum(t.trade_vega for t in trades if t.status == TradeStatus.OPEN)
-        self.portfolio_gamma = sum(t.trade_gamma for t in trades if t.status == TradeStatus.OPEN)
+        # Membership only (new trades in, closed trades out); held legs are
+        # kept current by the feed listeners registered in attach_feed()
+        self.book.sync(trades)
+        window = getattr(self._feed, "atm_window", None)
+        if window is not None:
+            # Open legs stay subscribed across ATM moves; closed ones are released
+            window.sync_legs(self.book.instruments)
 
-    def check_portfolio_limits(self) -> bool:
+        if spot:
+            self.run_scenarios(spot)
+
+    # --- Portfolio Greeks (running totals, O(1) reads) ---
+    @property
+    def portfolio_delta(self) -> float:
+        return self.book.delta
+
+    @property
+    def portfolio_vega(self) -> float:
+        return self.book.vega
+
+    @property
+    def portfolio_gamma(self) -> float:
+        return self.book.gamma
+
+    @property
+    def portfolio_theta(self) -> float:
+        return self.book.theta
+
+    def on_greeks_tick(self, instrument_key: str, greeks: Mapping) -> int:
+        """
+        Applies one instrument's fresh Greeks (e.g. a greeks_cache row) to the totals.
+        Rows without a usable IV read back as NaN; the book drops those and returns 0.
+        """
+        return self.book.update_greeks(
+            instrument_key, greeks.get("delta", 0.0), greeks.get("gamma", 0.0),
+            greeks.get("theta", 0.0), greeks.get("vega", 0.0), greeks.get("iv"),
+        )
+
+    def on_greeks_refresh(self, keys: Iterable[str], greeks_cache: Mapping) -> int:
+        """LiveDataFeed greeks listener: applies the repriced rows of held instruments only."""
+        held = self.book.instruments & set(keys)
+        return sum(self.on_greeks_tick(key, greeks_cache[key]) for key in held if key in greeks_cache)
+
+    def on_price_ticks(self, keys: List[str], prices: List[float]):
+        """LiveDataFeed tick listener (feed thread): LTPs of held legs, dict lookups only."""
+        held = self.book.instruments
+        for key, price in zip(keys, prices):
+            if key in held:
+                self.book.update_price(key, price)
+
+    def attach_feed(self, feed) -> "AdvancedRiskManager":
+        """
+        Keeps the book's Greeks and prices current from a LiveDataFeed, and its
+        ATM window's leg pins in step with the book on every update_portfolio_state.
+        """
+        feed.add_greeks_listener(self.on_greeks_refresh)
+        feed.add_tick_listener(self.on_price_ticks)
+        self._feed = feed
+        return self
+
+    def run_scenarios(self, spot: float) -> Optional[ScenarioResult]:
+        """Full-revaluation spot x vol x time grid over the open book."""
+        try:
+            self.scenario = scenario_grid(self.book.legs(spot), spot)
+            self.worst_case_loss = self.scenario.worst_loss
+        except Exception as e:
+            logger.error(f"Scenario grid failed: {e}")
+        return self.scenario
+
+    def check_portfolio_limits(self, scenario_set: Optional[Tuple[float, float, float]] = None) -> bool:
         if self.is_halted: return True
 
         max_loss = settings.ACCOUNT_SIZE * settings.DAILY_LOSS_LIMIT_PCT
@@ -35,6 +105,21 @@ class AdvancedRiskManager:
             self.is_halted = True
             return True
 
+        # Convexity: worst full-revaluation cell within the gated scenario set
+        # (|spot|, +vol, days). Re-evaluated on every check, never latched: a
+        # hedge or a closed leg clears it with the next run_scenarios().
+        if self.scenario is not None:
+            spot_lim, vol_lim, days_lim = scenario_set or (
+                settings.SCENARIO_LIMIT_SPOT_PCT, settings.SCENARIO_LIMIT_VOL_PTS, settings.SCENARIO_LIMIT_DAYS)
+            loss, (spot_shock, vol_shock, days) = self.scenario.worst_within(spot_lim, vol_lim, days_lim)
+            max_scenario_loss = settings.ACCOUNT_SIZE * settings.SCENARIO_MAX_LOSS_PCT
+            if loss < -max_scenario_loss:
+                logger.critical(
+                    f"🛑 SCENARIO LOSS BREACHED: {loss:.2f} < -{max_scenario_loss:.2f} "
+                    f"(spot {spot_shock*100:+.1f}%, vol {vol_shock*100:+.0f}pts, +{days:.0f}d)"
+                )
+                return True
+
         if abs(self.portfolio_vega) > settings.MAX_PORTFOLIO_VEGA:
             logger.warning(f"⚠️ VEGA LIMIT EXCEEDED: {self.portfolio_vega:.2f}")
             return False 
@@ -50,3 +135,36 @@ class AdvancedRiskManager:
             return False
             
         return True
+
+    # --- Tail Risk (Monte Carlo on the GARCH-t fit) ---
+    def update_tail_model(self, params: Optional[GarchParams]) -> bool:
+        """Re-simulates paths only when HybridVolatilityAnalytics has refitted."""
+        if params is None: return False
+        try:
+            return self.tail_risk.refresh(params)
+        except Exception as e:
+            logger.error(f"Tail model refresh failed: {e}")
+            return False
+
+    def attach_vol_analytics(self, vol_analytics) -> "AdvancedRiskManager":
+        """Refreshes the tail model after every HybridVolatilityAnalytics GARCH refit."""
+        vol_analytics.add_fit_listener(self.update_tail_model)
+        self.update_tail_model(vol_analytics.garch_params)
+        return self
+
+    def tail_risk_report(self, spot: float) -> Optional[TailRiskResult]:
+        if not self.tail_risk.ready: return None
+        return self.tail_risk.evaluate(self.book.legs(spot), spot)
+
+    def check_tail_risk(self, proposed_trade: MultiLegTrade, spot: float) -> Tuple[bool, str]:
+        """1-day ES of book + proposed trade against MAX_TAIL_LOSS_PCT (cached paths, no re-simulation)."""
+        if not self.tail_risk.ready or not spot:
+            return True, "Tail model not ready"
+        proposed = legs_from_trades([proposed_trade], spot, open_only=False)
+        res = self.tail_risk.evaluate_with(self.book.legs(spot), proposed, spot)
+        limit = settings.ACCOUNT_SIZE * settings.MAX_TAIL_LOSS_PCT
+        if res is not None and res.es_1d > limit:
+            logger.warning(f"🚫 Trade Rejected: 1D ES {res.es_1d:,.0f} > {limit:,.0f}")
+            return False, f"1D ES {res.es_1d:,.0f} > limit {limit:,.0f}"
+        return True, "OK"
+
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Per-Instrument Staleness Index
+- One float64 last-update time per instrument id (InstrumentRegistry ids, so
+  the feed's ring buffer, bar aggregator and this index share numbering).
+- Times come from the monotonic clock: a wall-clock step (NTP, DST bugs) can
+  neither fake freshness nor mark the whole book stale.
+- "Which instruments are stale?" is one vectorized comparison against a scalar
+  cutoff, instead of a per-key dict lookup + datetime subtraction.
+- Only watched ids (subscribed keys) count; a key dropped from the ATM window
+  stops being reported, and its id is recycled once the registry releases it.
+- Arrays are allocated once at the registry's capacity: the feed thread writes
+  while the event loop watches new keys, so they must never be regrown and
+  swapped (a write into the old array would be lost).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from trading.tick_buffer import InstrumentRegistry
+
+logger = logging.getLogger("Staleness")
+
+
+class StalenessIndex:
+    def __init__(self, registry: Optional[InstrumentRegistry] = None, capacity: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.registry = registry if registry is not None else InstrumentRegistry(capacity)
+        self.clock = clock            # replay harness points this at its simulated clock
+        self._last = np.full(self.registry.capacity, -np.inf)
+        self._watched = np.zeros(self.registry.capacity, dtype=bool)
+        self.registry.on_reuse.append(self._reset)
+
+    # --- Storage ---
+    def _reset(self, iid: int):
+        self._last[iid] = -np.inf
+        self._watched[iid] = False
+
+    def watch(self, keys: Iterable[str]):
+        for key in keys:
+            self._watched[self.registry.add(key)] = True
+
+    def unwatch(self, keys: Iterable[str]):
+        for key in keys:
+            iid = self.registry.id_of(key)
+            if iid is not None:
+                self._watched[iid] = False
+
+    # --- Writers (feed thread) ---
+    def touch(self, iid: int, now: Optional[float] = None):
+        self._last[iid] = self.clock() if now is None else now
+
+    def touch_keys(self, keys: Iterable[str], now: Optional[float] = None, watch: bool = False):
+        """Stamps a whole message with one clock read; `watch` also marks the keys watched."""
+        # Scalar stores: a message carries a handful of keys, too few for fancy indexing to pay
+        stamp = self.clock() if now is None else now
+        last, watched, add = self._last, self._watched, self.registry.add
+        for key in keys:
+            iid = add(key)
+            last[iid] = stamp
+            if watch:
+                watched[iid] = True
+
+    # --- Readers ---
+    def _ids(self, keys: Iterable[str]) -> np.ndarray:
+        # Unknown keys map to -1: never updated, always stale
+        ids = [self.registry.id_of(k) for k in keys]
+        return np.array([-1 if i is None else i for i in ids], dtype=np.int64)
+
+    def ages(self, now: Optional[float] = None) -> np.ndarray:
+        """Seconds since the last update, indexed by id (inf = never updated)."""
+        now = self.clock() if now is None else now
+        return now - self._last[:len(self.registry)]
+
+    def age(self, key: str, now: Optional[float] = None) -> float:
+        iid = self.registry.id_of(key)
+        if iid is None:
+            return float("inf")
+        return (self.clock() if now is None else now) - float(self._last[iid])
+
+    def stale_ids(self, threshold: float, now: Optional[float] = None) -> np.ndarray:
+        """Watched ids not updated within `threshold` seconds."""
+        cutoff = (self.clock() if now is None else now) - threshold
+        n = len(self.registry)
+        last, watched = self._last[:n], self._watched[:n]
+        return np.flatnonzero((last < cutoff) & watched)
+
+    def stale(self, threshold: float, keys: Optional[Iterable[str]] = None,
+              now: Optional[float] = None) -> List[str]:
+        """Stale keys among `keys` (watched or not), else among every watched key."""
+        if keys is None:
+            return [self.registry.keys[i] for i in self.stale_ids(threshold, now)]
+        keys = list(keys)
+        ids = self._ids(keys)
+        known = ids >= 0
+        stamps = np.full(len(ids), -np.inf)
+        stamps[known] = self._last[ids[known]]
+        cutoff = (self.clock() if now is None else now) - threshold
+        return [keys[i] for i in np.flatnonzero(stamps < cutoff)]
+
+    def counts(self, threshold: float, now: Optional[float] = None) -> Tuple[int, int]:
+        """(stale, watched) across the whole book."""
+        n = len(self.registry)
+        return len(self.stale_ids(threshold, now)), int(self._watched[:n].sum())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – ATM Window Subscription Manager
+- Keeps +/- N strikes (CE + PE) around ATM live for the nearest expiries,
+  using InstrumentMaster.strike_index (sorted strikes per expiry).
+- Recomputes only when the ATM strike of some expiry changes, then sends ONE
+  diffed subscribe/unsubscribe batch to LiveDataFeed.
+- Pinned keys (index, VIX, open legs) are never unsubscribed. sync_legs()
+  re-pins the open legs each cycle, so closed legs are released instead of
+  growing the subscription set over a session.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger("SubscriptionMgr")
+
+
+class ATMWindowManager:
+    def __init__(self, instrument_master, feed, symbol: str = "NIFTY", width: Optional[int] = None,
+                 n_expiries: Optional[int] = None):
+        self.master = instrument_master
+        self.feed = feed
+        self.symbol = symbol
+        self.width = settings.ATM_WINDOW_STRIKES if width is None else width
+        self.n_expiries = settings.ATM_WINDOW_EXPIRIES if n_expiries is None else n_expiries
+        self.pinned: Set[str] = {settings.MARKET_KEY_INDEX, settings.MARKET_KEY_VIX}
+        self.window: Set[str] = set()
+        self.legs: Set[str] = set()
+        self._atm: Dict[date, int] = {}
+        self.batches_sent = 0
+
+    def pin(self, keys: Iterable[str]):
+        self.pinned.update(k for k in keys if k)
+
+    def unpin(self, keys: Iterable[str]):
+        self.pinned.difference_update(keys)
+
+    def sync_legs(self, keys: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        """
+        Pins exactly the open legs' keys: new legs are subscribed and closed legs
+        outside the window are dropped, in one diffed batch.
+        """
+        keys = {k for k in keys if k}
+        closed = self.legs - keys
+        self.pin(keys)
+        self.unpin(closed)
+        self.legs = keys
+        add = keys - self.feed.sub_list
+        remove = (closed - self.window - self.pinned) & self.feed.sub_list
+        if add or remove:
+            self.feed.update_subscriptions(add, remove)
+            self.batches_sent += 1
+        return add, remove
+
+    def expiries(self) -> List[date]:
+        # Called every cycle: InstrumentMaster caches the list per trading day
+        return self.master.get_all_expiries(self.symbol)[:self.n_expiries]
+
+    def atm_positions(self, spot: float, expiries: Optional[List[date]] = None) -> Dict[date, int]:
+        """Index of the strike nearest to spot, per expiry."""
+        atm: Dict[date, int] = {}
+        for expiry in (self.expiries() if expiries is None else expiries):
+            strikes = self.master.strike_index(self.symbol, expiry)[0]
+            if not len(strikes):
+                continue
+            i = int(np.clip(np.searchsorted(strikes, spot), 1, len(strikes) - 1)) if len(strikes) > 1 else 0
+            if i and spot - strikes[i - 1] < strikes[i] - spot:
+                i -= 1
+            atm[expiry] = i
+        return atm
+
+    def window_keys(self, atm: Dict[date, int]) -> Set[str]:
+        keys: Set[str] = set()
+        for expiry, i in atm.items():
+            strikes, ce, pe = self.master.strike_index(self.symbol, expiry)
+            lo, hi = max(0, i - self.width), min(len(strikes), i + self.width + 1)
+            keys.update(k for k in ce[lo:hi] if k)
+            keys.update(k for k in pe[lo:hi] if k)
+        return keys
+
+    def update(self, spot: float, expiries: Optional[List[date]] = None) -> Tuple[Set[str], Set[str]]:
+        """Re-centres the window if ATM moved; returns the (added, removed) batch sent."""
+        if not spot or spot <= 0:
+            return set(), set()
+        atm = self.atm_positions(spot, expiries)
+        if atm == self._atm:
+            return set(), set()
+        new_window = self.window_keys(atm)
+        add = (new_window | self.pinned) - self.feed.sub_list
+        remove = self.window - new_window - self.pinned
+        self.window, self._atm = new_window, atm
+        if add or remove:
+            self.feed.update_subscriptions(add, remove)
+            self.batches_sent += 1
+            logger.info(f"🎯 ATM window @ {spot:,.0f}: +{len(add)} / -{len(remove)} "
+                        f"(window {len(new_window)}, pinned {len(self.pinned)})")
+        return add, remove
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+VolGuard 20.0 – Tick Ring Buffer
+- InstrumentRegistry maps instrument keys to compact integer ids (0, 1, 2, ...);
+  ids of unsubscribed keys are recycled, so ATM-window churn stays within
+  INSTRUMENT_CAPACITY.
+- TickRingBuffer keeps the last `depth` ticks per id in one preallocated
+  structured array: (ts, ltp, ltt, volume, oi).
+- Mirrored layout: every tick is written at i and i + depth, so the last n
+  ticks are always one contiguous zero-copy view. Append is O(1), no allocation.
+- The buffer is allocated once at the registry's capacity (np.zeros, so pages
+  are only committed for ids that tick): the event loop registers keys while
+  the feed thread appends, and a regrow-and-swap would lose those writes.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger("TickBuffer")
+
+TICK_DTYPE = np.dtype([
+    ("ts", "f8"),        # local receive time (epoch seconds)
+    ("ltp", "f8"),
+    ("ltt", "i8"),       # exchange last-trade time (epoch ms)
+    ("volume", "i8"),
+    ("oi", "f8"),
+])
+
+
+class InstrumentRegistry:
+    """
+    Key <-> id map holding at most `capacity` ids (INSTRUMENT_CAPACITY), so
+    per-id arrays shared across threads can be allocated once and never swapped.
+    - release(key) retires an unsubscribed key. For `recycle_sec` it keeps its id
+      (ticks already in flight land in its own slot; add() revives it); after
+      that add() may hand the id to a new key, first calling every on_reuse(iid)
+      hook so owners of per-id state (ring buffer, bars, staleness) reset the
+      slot. keys[iid] still names the old key during the hooks.
+    - len() is the id high-water mark (array extent), not the live key count.
+    - add() raises RuntimeError only when every id is live or still retiring.
+    """
+    def __init__(self, capacity: Optional[int] = None, recycle_sec: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = settings.INSTRUMENT_CAPACITY if capacity is None else capacity
+        self.recycle_sec = settings.INSTRUMENT_RECYCLE_SEC if recycle_sec is None else recycle_sec
+        self.clock = clock
+        self._ids: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self._retiring: Dict[str, int] = {}
+        self._retired: Deque[Tuple[float, str, int]] = deque()   # (released at, key, id), oldest first
+        self._lock = Lock()   # the feed thread and the event loop both add keys
+        self.on_reuse: List[Callable[[int], None]] = []
+        self.reused = 0
+
+    def id_of(self, key: str) -> Optional[int]:
+        return self._ids.get(key)
+
+    def add(self, key: str) -> int:
+        iid = self._ids.get(key)
+        if iid is not None and not self._retiring:
+            return iid
+        with self._lock:
+            iid = self._ids.get(key)
+            if iid is not None:
+                self._retiring.pop(key, None)   # re-subscribed before its id was reused
+                return iid
+            iid = self._recycle()
+            if iid is None:
+                if len(self.keys) >= self.capacity:
+                    raise RuntimeError(f"InstrumentRegistry full ({self.capacity} ids, "
+                                       f"{len(self._retiring)} retiring)")
+                iid = len(self.keys)
+                self.keys.append(key)
+            else:
+                self.keys[iid] = key
+            self._ids[key] = iid
+        return iid
+
+    def _recycle(self) -> Optional[int]:
+        retired, cutoff = self._retired, self.clock() - self.recycle_sec
+        while retired and retired[0][0] <= cutoff:
+            _, key, iid = retired.popleft()
+            if self._retiring.get(key) != iid:
+                continue        # revived meanwhile
+            del self._retiring[key]
+            del self._ids[key]
+            for hook in self.on_reuse:
+                hook(iid)
+            self.reused += 1
+            return iid
+        return None
+
+    def release(self, key: str) -> Optional[int]:
+        """Retires `key`; its id is reusable after `recycle_sec`. None if unknown."""
+        with self._lock:
+            iid = self._ids.get(key)
+            if iid is not None and key not in self._retiring:
+                self._retiring[key] = iid
+                self._retired.append((self.clock(), key, iid))
+        return iid
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+
+class TickRingBuffer:
+    """
+    Per-instrument ring of the last `depth` ticks. Readers get views into the
+    live buffer: copy them if they must survive further appends.
+    """
+    def __init__(self, depth: int = 512, capacity: Optional[int] = None,
+                 registry: Optional[InstrumentRegistry] = None):
+        self.depth = depth
+        self.registry = registry if registry is not None else InstrumentRegistry(capacity)
+        self.registry.on_reuse.append(self._reset)
+        capacity = self.registry.capacity
+        self._data = np.zeros((capacity, 2 * depth), dtype=TICK_DTYPE)
+        self._head = np.zeros(capacity, dtype=np.int64)     # next write slot in [0, depth)
+        self._count = np.zeros(capacity, dtype=np.int64)
+
+    # --- Storage ---
+    def _reset(self, iid: int):
+        # Recycled id: the old key's ticks must not show up as the new key's history
+        self._head[iid] = self._count[iid] = 0
+
+    def register(self, key: str) -> int:
+        return self.registry.add(key)
+
+    # --- Writers ---
+    def append(self, iid: int, ts: float, ltp: float, ltt: int = 0, volume: int = 0, oi: float = 0.0):
+        h = self._head[iid]
+        row = self._data[iid]
+        row[h] = row[h + self.depth] = (ts, ltp, ltt, volume, oi)
+        self._head[iid] = h + 1 if h + 1 < self.depth else 0
+        if self._count[iid] < self.depth:
+            self._count[iid] += 1
+
+    def append_key(self, key: str, ts: float, ltp: float, ltt: int = 0, volume: int = 0, oi: float = 0.0) -> int:
+        iid = self.registry.id_of(key)
+        if iid is None:
+            iid = self.register(key)
+        self.append(iid, ts, ltp, ltt, volume, oi)
+        return iid
+
+    # --- Readers (zero-copy) ---
+    def count(self, iid: int) -> int:
+        return int(self._count[iid])
+
+    def last(self, iid: int, n: Optional[int] = None) -> np.ndarray:
+        """Last n ticks, oldest first, as a view of the mirrored buffer."""
+        n = self._count[iid] if n is None else min(n, self._count[iid])
+        end = self._head[iid] + self.depth
+        return self._data[iid, end - n:end]
+
+    def latest(self, iid: int) -> Optional[np.void]:
+        if not self._count[iid]:
+            return None
+        return self._data[iid, self._head[iid] + self.depth - 1]
+
+    def history(self, key: str, n: Optional[int] = None) -> np.ndarray:
+        iid = self.registry.id_of(key)
+        return np.empty(0, dtype=TICK_DTYPE) if iid is None else self.last(iid, n)
+
+    def latest_ltp(self) -> np.ndarray:
+        """LTP of every registered id (NaN before the first tick), indexed by id."""
+        n = len(self.registry)
+        ids = np.arange(n)
+        out = self._data["ltp"][ids, self._head[:n] + self.depth - 1].copy()
+        out[self._count[:n] == 0] = np.nan
+        return out
@@ -2,8 +2,9 @@ import upstox_client
 import threading
 
 class MarketWebSocket:
-    def __init__(self, access_token: str, instrument_keys: list, ws_state):
+    def __init__(self, access_token: str, instrument_keys: list, ws_state, recorder=None):
         self.state = ws_state
+        self.recorder = recorder
         config = upstox_client.Configuration()
         config.access_token = access_token
         self.client = upstox_client.ApiClient(config)
@@ -14,7 +15,11 @@ class MarketWebSocket:
     def _on_message(self, message):
         if "ltp" in message:
             self.state.update_market(message["ltp"])
+            if self.recorder:
+                self.recorder.record_many(message["ltp"])
 
     def start(self):
+        if self.recorder:
+            self.recorder.start()
         t = threading.Thread(target=self.streamer.connect, daemon=True)
         t.start()
@@ -1,33 +1,123 @@
 from threading import Lock
 from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple
+from trading.staleness import StalenessIndex
+
+class _View(NamedTuple):
+    """One immutable, published version of a side (market or positions)."""
+    data: MappingProxyType
+    versions: MappingProxyType   # key -> seq of the update that last touched it
+    seq: int
+    last_tick: datetime
+
+    def next(self, data: dict) -> "_View":
+        seq = self.seq + 1
+        # Plain dict copies (~4 us at 600 keys); the published dicts are never mutated again
+        values = self.data.copy()
+        values.update(data)
+        versions = self.versions.copy()
+        versions.update(dict.fromkeys(data, seq))
+        # Fix 5: Update timestamp for health check
+        return _View(MappingProxyType(values), MappingProxyType(versions), seq, datetime.utcnow())
+
+    def changes(self, since_seq: int) -> dict:
+        return {k: self.data[k] for k, v in self.versions.items() if v > since_seq}
+
+_EMPTY = _View(MappingProxyType({}), MappingProxyType({}), 0, datetime.min)
 
 class WebSocketState:
+    """
+    Copy-on-write state. A writer builds the next immutable version of its side
+    and publishes it with a single reference assignment; readers take that
+    reference without the lock, so they never block the feed thread.
+    snapshot() only wraps the two published views (no copy) and is reused until
+    either side publishes; a market tick leaves the positions view untouched.
+    `staleness` keeps a monotonic last-update time per market key.
+    """
     def __init__(self):
+        # Serialises writers only (feed thread vs portfolio thread)
         self._lock = Lock()
-        self.market = {}
-        self.positions = {}
-        
-        # Health Timestamps
-        self.last_market_tick = datetime.min
-        self.last_portfolio_tick = datetime.min
+        self._market = _EMPTY
+        self._positions = _EMPTY
+        self._cached = (None, None)   # ((market view, positions view), snapshot)
+        self.staleness = StalenessIndex()
+
+        # Tick listeners: called on the feed thread with each market update,
+        # so they must be cheap (flag + wake a worker, never block)
+        self._market_listeners = []
+
+    def add_market_listener(self, callback):
+        self._market_listeners.append(callback)
+
+    def remove_market_listener(self, callback):
+        if callback in self._market_listeners:
+            self._market_listeners.remove(callback)
 
     def update_market(self, data: dict):
         with self._lock:
-            self.market.update(data)
-            # Fix 5: Update timestamp for health check
-            self.last_market_tick = datetime.utcnow()
+            self._market = self._market.next(data)
+            self.staleness.touch_keys(data, watch=True)
+        for callback in self._market_listeners:
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"⚠️ [WebSocketState] Market listener error: {e}")
 
     def update_positions(self, data: dict):
         with self._lock:
             # Assuming data is a dictionary of positions keyed by token
-            self.positions.update(data)
-            self.last_portfolio_tick = datetime.utcnow()
+            self._positions = self._positions.next(data)
 
-    def snapshot(self) -> dict:
-        with self._lock:
-            return {
-                "market": dict(self.market),
-                "positions": dict(self.positions),
-                "last_market_tick": self.last_market_tick,
-                "last_portfolio_tick": self.last_portfolio_tick
-            }
+    # ==========================================
+    # READERS (lock-free)
+    # ==========================================
+    @property
+    def market(self) -> MappingProxyType:
+        return self._market.data
+
+    @property
+    def positions(self) -> MappingProxyType:
+        return self._positions.data
+
+    def market_value(self, key: str):
+        """Point lookup on the published market view; None if never seen."""
+        return self._market.data.get(key)
+
+    @property
+    def last_market_tick(self) -> datetime:
+        return self._market.last_tick
+
+    @property
+    def last_portfolio_tick(self) -> datetime:
+        return self._positions.last_tick
+
+    def snapshot(self) -> MappingProxyType:
+        market, positions = self._market, self._positions
+        cached_views, snap = self._cached
+        if cached_views is not None and cached_views[0] is market and cached_views[1] is positions:
+            return snap
+        snap = MappingProxyType({
+            "market": market.data,
+            "positions": positions.data,
+            "last_market_tick": market.last_tick,
+            "last_portfolio_tick": positions.last_tick,
+            "market_seq": market.seq,
+            "positions_seq": positions.seq
+        })
+        # Single reference swap; concurrent readers may both build it, either is valid
+        self._cached = ((market, positions), snap)
+        return snap
+
+    def market_changes(self, since_seq: int):
+        """({key: value} for keys updated after `since_seq`, current seq)."""
+        view = self._market
+        if since_seq >= view.seq:
+            return {}, view.seq
+        return view.changes(since_seq), view.seq
+
+    def position_changes(self, since_seq: int):
+        view = self._positions
+        if since_seq >= view.seq:
+            return {}, view.seq
+        return view.changes(since_seq), view.seq
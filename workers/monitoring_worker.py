@@ -1,95 +1,245 @@
+import math
 import time
+import threading
 from datetime import datetime
-from logic_core.pnl import pnl_attribution
+from typing import Optional
+from core.metrics import get_metrics
+from logic_core.pnl import IntradayAttribution, LegState
 from logic_core.risk import evaluate_trade_risk
 
 class MonitoringWorker:
+    """
+    Event-driven risk monitor.
+    - WebSocketState calls `on_market_tick` on the feed thread; it only compares
+      the tick to the price at the last evaluation and sets a wake event.
+    - A burst of ticks collapses into one evaluation (the event is cleared
+      before evaluating, so ticks arriving mid-evaluation cause exactly one rerun).
+    - `poll_interval` is now just the heartbeat / safety-net cadence.
+    - Market health is the index's age in ws_state.staleness (monotonic clock);
+      stale/watched counts go to SystemMetrics on every heartbeat.
+    - Each heartbeat snapshots the active trade's legs (LegState) into an
+      IntradayAttribution; Greeks come from the shared greeks_cache when given
+      (without it every move lands in the residual).
+    """
     def __init__(
         self,
         ws_state,
         execution_orchestrator,
         capital_manager,
-        poll_interval: int = 5
+        poll_interval: int = 5,
+        leg_trigger_pct: float = 0.02,
+        index_trigger_pct: float = 0.001,
+        index_key: Optional[str] = None,
+        stale_after: float = 5.0,
+        greeks_cache=None
     ):
         self.ws_state = ws_state
         self.exec = execution_orchestrator
         self.capital = capital_manager
         self.poll_interval = poll_interval
+        self.leg_trigger_pct = leg_trigger_pct
+        self.index_trigger_pct = index_trigger_pct
+        self.index_key = index_key or capital_manager.settings.MARKET_KEY_INDEX
+        self.stale_after = stale_after
+        self.greeks_cache = greeks_cache if greeks_cache is not None else {}
+        self.attribution = IntradayAttribution()
+        self._attributed_trade = None
+
+        # Prices at the last evaluation for the watched keys; swapped whole,
+        # never mutated, so the feed thread can read it without a lock
+        self._ref_prices = {}
+        self._armed_trade = None
+        self._wake = threading.Event()
+        self._first_trigger = None
+        self.last_latency_ms = 0.0
+        self.evaluations = 0
+        self.ticks_conflated = 0
+        self._stopped = False
+
+        ws_state.add_market_listener(self.on_market_tick)
+
+    # ==========================================
+    # FEED THREAD (must stay cheap)
+    # ==========================================
+    @staticmethod
+    def _price(value):
+        if isinstance(value, dict):
+            value = value.get("ltp", value.get("last_price"))
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _trigger(self):
+        if self._wake.is_set():
+            self.ticks_conflated += 1
+        else:
+            self._first_trigger = time.perf_counter()
+            self._wake.set()
+
+    def on_market_tick(self, data: dict):
+        if self.capital.active_trade is not self._armed_trade:
+            # Trade opened/closed since the last pass: re-arm on its legs
+            self._trigger()
+            return
+        refs = self._ref_prices
+        for key, value in data.items():
+            ref = refs.get(key)
+            if ref is None:
+                continue
+            price = self._price(value)
+            if price is None:
+                continue
+            limit = self.index_trigger_pct if key == self.index_key else self.leg_trigger_pct
+            if ref <= 0 or abs(price - ref) >= limit * ref:
+                self._trigger()
+                return
+
+    # ==========================================
+    # WORKER THREAD
+    # ==========================================
+    @staticmethod
+    def _leg_key(leg):
+        if isinstance(leg, dict):
+            return leg.get("instrument_key") or leg.get("instrument_token")
+        return getattr(leg, "instrument_key", None)
+
+    @classmethod
+    def _leg_keys(cls, trade):
+        return [key for key in map(cls._leg_key, getattr(trade, "legs", None) or []) if key]
+
+    @staticmethod
+    def _signed_qty(leg) -> float:
+        if not isinstance(leg, dict):
+            return float(getattr(leg, "quantity", 0) or 0)
+        qty = abs(float(leg.get("quantity", 0) or 0))
+        return -qty if leg.get("transaction_type") == "SELL" else qty
+
+    def _rearm(self, trade, market: dict):
+        """New reference prices: the index always, plus the live trade's legs."""
+        refs = {}
+        for key in [self.index_key] + self._leg_keys(trade):
+            price = self._price(market.get(key))
+            refs[key] = price if price is not None else 0.0
+        self._ref_prices = refs
+        self._armed_trade = trade
+
+    def _heartbeat(self, snapshot: dict):
+        # We update this every cycle so Sheriff knows if data is stale
+        now = datetime.utcnow()
+
+        # Check Market Data Latency (index age; never-ticked is capped to a day so health stays JSON-safe)
+        staleness = self.ws_state.staleness
+        market_lag = min(staleness.age(self.index_key), 86400.0)
+        stale, watched = staleness.counts(self.stale_after)
+        get_metrics().update_staleness(stale, watched)
+
+        # Update Capital/Sheriff State
+        # Considered "Healthy" if the index ticked within stale_after seconds
+        self.capital.update_health("ws_market", market_lag < self.stale_after)
+        self.capital.update_health("latency_ms", market_lag * 1000)
+        self.capital.update_health("stale_instruments", stale)
+        self.capital.update_health("last_tick_time", now.isoformat())
+        self.capital.update_health("risk_latency_ms", self.last_latency_ms)
+
+    def evaluate(self, snapshot: dict) -> bool:
+        """One risk pass over the active trade. Returns True if it was force-exited."""
+        trade = self.capital.current_trade()
+        self._rearm(trade, snapshot.get("market", {}))
+        if not trade:
+            return False
+
+        # Live position update
+        self.capital.update_trade_from_positions(snapshot.get("positions", {}))
+
+        # Logic Core evaluates the updated trade state
+        risk_violation = evaluate_trade_risk(
+            self.capital.current_trade(),
+            max_loss=self.capital.settings.MAX_TRADE_LOSS
+        )
+        self.evaluations += 1
+        if not risk_violation:
+            return False
+
+        print(f"🚨 RISK BREACH DETECTED: {risk_violation}")
+        # 1. Force Exit via Execution Layer
+        self.exec.exit_engine.force_exit(
+            self.exec.algo_tag,
+            reason=risk_violation
+        )
+        # 2. Close Internal State
+        self.capital.close_trade(f"RISK_STOP: {risk_violation}")
+        self._rearm(None, snapshot.get("market", {}))
+        return True
+
+    def _leg_state(self, trade, market):
+        """Columns for the trade's legs; None while a leg or the index has no price."""
+        legs = [leg for leg in getattr(trade, "legs", None) or [] if self._leg_key(leg)]
+        keys = [self._leg_key(leg) for leg in legs]
+        prices = [self._price(market.get(key)) for key in keys]
+        spot = self._price(market.get(self.index_key))
+        if not keys or spot is None or None in prices:
+            return None
+        rows = [self.greeks_cache.get(key) or {} for key in keys]
+
+        def greek(name):
+            # NaN rows (no usable IV) contribute nothing rather than poisoning the totals
+            values = [float(row.get(name, 0.0) or 0.0) for row in rows]
+            return [v if math.isfinite(v) else 0.0 for v in values]
+
+        return LegState.from_arrays(
+            [self._signed_qty(leg) for leg in legs], prices, greek("iv"), greek("delta"), greek("gamma"),
+            greek("vega"), greek("theta"), spot, time.time(), keys
+        )
+
+    def _record_pnl(self, snapshot: dict):
+        # Capture metrics for post-trade analysis (heartbeat cadence, off the tick path)
+        trade = self.capital.current_trade()
+        if trade is not self._attributed_trade:
+            # New (or no) trade: its session series starts from its first snapshot
+            self.attribution.reset()
+            self._attributed_trade = trade
+        if not trade:
+            return
+        try:
+            state = self._leg_state(trade, snapshot.get("market", {}))
+            if state is None:
+                return
+            self.attribution.step(state)
+            self.capital.update_health("pnl_attribution", self.attribution.summary())
+        except Exception as pnl_err:
+            # Don't crash worker on PnL calc error, just log it
+            print(f"⚠️ PnL Calculation Warning: {pnl_err}")
+
+    def stop(self):
+        self._stopped = True
+        self.ws_state.remove_market_listener(self.on_market_tick)
+        self._wake.set()
 
     def run(self):
-        print("👁️ Monitoring Worker: STARTED")
-        while True:
+        print("👁️ Monitoring Worker: STARTED (event-driven)")
+        next_heartbeat = 0.0
+        self._wake.set()  # first pass arms the reference prices
+        while not self._stopped:
             try:
-                # ==========================================
-                # 1. SYSTEM HEALTH HEARTBEAT (CRITICAL)
-                # ==========================================
-                # We update this every cycle so Sheriff knows if data is stale
+                triggered = self._wake.wait(timeout=self.poll_interval)
+                # Clear before evaluating: ticks that land during the pass re-arm one more pass
+                self._wake.clear()
+                started = self._first_trigger
+                self._first_trigger = None
+
                 snapshot = self.ws_state.snapshot()
-                now = datetime.utcnow()
-                
-                # Check Market Data Latency
-                last_market = snapshot.get("last_market_tick", datetime.min)
-                market_lag = (now - last_market).total_seconds()
-                
-                # Check Portfolio Data Latency
-                last_portfolio = snapshot.get("last_portfolio_tick", datetime.min)
-                
-                # Update Capital/Sheriff State
-                # Considered "Healthy" if data is less than 5 seconds old
-                self.capital.update_health("ws_market", market_lag < 5)
-                self.capital.update_health("latency_ms", market_lag * 1000)
-                self.capital.update_health("last_tick_time", now.isoformat())
-
-                # ==========================================
-                # 2. CHECK ACTIVE TRADE
-                # ==========================================
-                trade = self.capital.current_trade()
-                
-                if not trade:
-                    # Even if no trade, we keep looping to update health stats
-                    time.sleep(self.poll_interval)
-                    continue
-
-                # ==========================================
-                # 3. LIVE POSITION UPDATE
-                # ==========================================
-                positions = snapshot.get("positions", {})
-                self.capital.update_trade_from_positions(positions)
-
-                # ==========================================
-                # 4. CONTINUOUS RISK EVALUATION
-                # ==========================================
-                # Logic Core evaluates the updated trade state
-                risk_violation = evaluate_trade_risk(self.capital.trade_state())
-                
-                if risk_violation:
-                    print(f"🚨 RISK BREACH DETECTED: {risk_violation}")
-                    
-                    # 1. Force Exit via Execution Layer
-                    self.exec.exit_engine.force_exit(
-                        self.exec.algo_tag,
-                        reason=risk_violation
-                    )
-                    
-                    # 2. Close Internal State
-                    self.capital.close_trade(f"RISK_STOP: {risk_violation}")
-                    continue
-
-                # ==========================================
-                # 5. PNL SNAPSHOT & ATTRIBUTION
-                # ==========================================
-                # Capture metrics for post-trade analysis
-                try:
-                    prev, curr, greeks = self.capital.pnl_inputs()
-                    pnl_breakdown = pnl_attribution(prev, curr, greeks)
-                    self.capital.record_pnl(pnl_breakdown)
-                except Exception as pnl_err:
-                    # Don't crash worker on PnL calc error, just log it
-                    print(f"⚠️ PnL Calculation Warning: {pnl_err}")
+                exited = self.evaluate(snapshot)
+                if triggered and started is not None:
+                    self.last_latency_ms = (time.perf_counter() - started) * 1000
+
+                if exited or time.monotonic() >= next_heartbeat:
+                    self._heartbeat(snapshot)
+                    if not exited:
+                        self._record_pnl(snapshot)
+                    next_heartbeat = time.monotonic() + self.poll_interval
 
             except Exception as e:
                 print(f"❌ [MonitoringWorker] CRITICAL LOOP ERROR: {e}")
                 # Prevent CPU spin loop if error is persistent
                 time.sleep(1)
-
-            time.sleep(self.poll_interval)